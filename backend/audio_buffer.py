@@ -0,0 +1,61 @@
+import numpy as np
+import tempfile
+import threading
+
+class SpillBuffer:
+    """Append-only float32 sample buffer with flat memory use.
+
+    Samples land in one preallocated in-memory chunk; every time it fills up
+    it is written to an anonymous temp file and reused. Reads of older audio
+    go through a read-only memmap of that file, so a multi-hour meeting costs
+    a few MB of RAM instead of a Python list of per-block NumPy arrays.
+    """
+
+    def __init__(self, chunk_samples=441000, spill_dir=None):
+        self._chunk = np.empty(chunk_samples, dtype=np.float32)
+        self._fill = 0
+        self._flushed = 0
+        # Deleted automatically once the buffer is garbage collected
+        self._file = tempfile.TemporaryFile(prefix="meeting_", suffix=".f32", dir=spill_dir)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._flushed + self._fill
+
+    def append(self, data):
+        data = np.asarray(data, dtype=np.float32).ravel()
+        with self._lock:
+            while len(data):
+                n = min(len(data), len(self._chunk) - self._fill)
+                self._chunk[self._fill:self._fill + n] = data[:n]
+                self._fill += n
+                data = data[n:]
+                if self._fill == len(self._chunk):
+                    self._spill()
+
+    def _spill(self):
+        self._chunk[:self._fill].tofile(self._file)
+        self._file.flush()
+        self._flushed += self._fill
+        self._fill = 0
+
+    def read(self, start, end):
+        """Returns a copy of samples [start, end), clipped to what exists."""
+        with self._lock:
+            end = min(end, len(self))
+            if end <= start:
+                return np.zeros(0, dtype=np.float32)
+
+            out = np.empty(end - start, dtype=np.float32)
+            disk_end = min(end, self._flushed)
+            if start < disk_end:
+                disk = np.memmap(self._file, dtype=np.float32, mode="r", shape=(self._flushed,))
+                out[:disk_end - start] = disk[start:disk_end]
+                del disk
+            mem_start = max(start, self._flushed)
+            if mem_start < end:
+                out[mem_start - start:] = self._chunk[mem_start - self._flushed:end - self._flushed]
+            return out
+
+    def close(self):
+        self._file.close()
@@ -0,0 +1,117 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from math import gcd
+
+# Whisper always works on 16kHz mono float32
+WHISPER_SAMPLE_RATE = 16000
+
+_filter_cache = {}
+
+def _polyphase_filter(up, down, half_taps=8):
+    """Builds (and caches) the low-pass filter split into `up` phases."""
+    key = (up, down, half_taps)
+    if key in _filter_cache:
+        return _filter_cache[key]
+
+    max_rate = max(up, down)
+    half_len = half_taps * max_rate
+    n = np.arange(-half_len, half_len + 1)
+    cutoff = 1.0 / max_rate
+    # Windowed sinc, scaled by `up` to keep unity gain after zero-stuffing
+    h = np.sinc(n * cutoff) * cutoff * np.kaiser(len(n), 5.0) * up
+
+    # Phase p uses taps h[p], h[p + up], h[p + 2*up], ...
+    taps_per_phase = -(-len(h) // up)
+    h = np.pad(h, (0, taps_per_phase * up - len(h)))
+    phases = h.reshape(taps_per_phase, up).T.astype(np.float32)
+
+    _filter_cache[key] = (phases, half_len)
+    return phases, half_len
+
+def resample(audio, orig_sr, target_sr=WHISPER_SAMPLE_RATE):
+    """Polyphase resampling (e.g. 44.1kHz -> 16kHz) with plain NumPy.
+
+    Output sample n only depends on one filter phase, and that phase repeats
+    every `up` outputs, so each phase is a single strided mat-vec over a
+    sliding-window view of the input (no per-sample Python work, no copies
+    of the upsampled signal).
+    """
+    audio = np.asarray(audio, dtype=np.float32)
+    if orig_sr == target_sr or len(audio) == 0:
+        return audio
+
+    g = gcd(int(orig_sr), int(target_sr))
+    up, down = int(target_sr) // g, int(orig_sr) // g
+    phases, half_len = _polyphase_filter(up, down)
+    taps = phases.shape[1]
+
+    out_len = -(-len(audio) * up // down)
+    # Zero padding on both sides so every window is valid
+    padded = np.concatenate([np.zeros(taps, np.float32), audio, np.zeros(2 * taps, np.float32)])
+    windows = sliding_window_view(padded, taps)
+    out = np.empty(out_len, dtype=np.float32)
+
+    for r in range(min(up, out_len)):
+        pos = r * down + half_len
+        phase, newest = pos % up, pos // up
+        count = len(range(r, out_len, up))
+        # windows[i] = padded[i:i+taps]; reversed taps line up with x[newest - m]
+        out[r::up] = windows[newest + 1:newest + 1 + count * down:down] @ phases[phase][::-1]
+
+    return out
+
+class StreamingResampler:
+    """Resamples a signal that is still growing, e.g. a live recording.
+
+    process() is fed the number of samples available so far and returns the
+    output for every whole block it can finish; blocks start on multiples of
+    the decimation factor and are read with a little context on each side,
+    so the concatenated output matches resampling the whole signal at once.
+    """
+
+    def __init__(self, orig_sr, target_sr=WHISPER_SAMPLE_RATE, block_seconds=30):
+        self.orig_sr, self.target_sr = int(orig_sr), int(target_sr)
+        g = gcd(self.orig_sr, self.target_sr)
+        self.up, self.down = self.target_sr // g, self.orig_sr // g
+        taps = _polyphase_filter(self.up, self.down)[0].shape[1]
+        self.context = self.down * -(-taps // self.down)
+        self.block = self.down * max(1, int(self.orig_sr * block_seconds) // self.down)
+        self.position = 0  # input samples already consumed
+
+    def process(self, read, available, final=False):
+        """Output for samples read through read(start, end) up to `available`.
+
+        Without `final`, a block is only processed once the context after it
+        has arrived; with `final`, `available` is the total length.
+        """
+        if self.orig_sr == self.target_sr:
+            end = available
+            start, self.position = self.position, max(self.position, end)
+            return read(start, end).astype(np.float32) if end > start else np.zeros(0, np.float32)
+
+        up, down = self.up, self.down
+        pieces = []
+        while self.position < available:
+            start = self.position
+            end = min(start + self.block, available) if final else start + self.block
+            if not final and end + self.context > available:
+                break
+            read_start, read_end = max(0, start - self.context), min(available, end + self.context)
+            chunk = resample(read(read_start, read_end), self.orig_sr, self.target_sr)
+            skip = (start - read_start) // down * up
+            out_start = start // down * up
+            out_end = end // down * up if end < available else -(-available * up // down)
+            pieces.append(chunk[skip:skip + out_end - out_start])
+            self.position = end
+        return np.concatenate(pieces) if pieces else np.zeros(0, np.float32)
+
+def resample_range(read, total, orig_sr, target_sr=WHISPER_SAMPLE_RATE, block_seconds=30):
+    """Resamples `total` samples fetched through read(start, end) in blocks,
+    without ever holding the whole signal at the original rate."""
+    return StreamingResampler(orig_sr, target_sr, block_seconds).process(read, total, final=True)
+
+def load_audio(file_path):
+    """Reads an audio file into a 16kHz mono float32 array without FFmpeg."""
+    import soundfile as sf
+    audio, sr = sf.read(file_path, dtype="float32", always_2d=True)
+    return resample(audio.mean(axis=1), sr, WHISPER_SAMPLE_RATE)
@@ -0,0 +1,48 @@
+"""Action-item extraction throughput: old per-keyword scan vs. compiled matcher.
+
+Usage: python bench_actions.py --words 10000 100000 1000000
+"""
+import argparse
+import re
+import time
+from bench_intelligence import synthetic_transcript
+from intelligence import ActionItemMatcher, DEFAULT_ACTION_KEYWORDS
+
+def extract_substring_scan(text):
+    # The previous implementation: split, lowercase, `in` test per keyword
+    items = []
+    for sentence in re.split(r'(?<=[.!?]) +', text):
+        sentence_lower = sentence.lower()
+        if any(keyword in sentence_lower for keyword in DEFAULT_ACTION_KEYWORDS):
+            clean_sentence = sentence.strip()
+            if 10 < len(clean_sentence) < 200:
+                items.append(clean_sentence)
+    return items
+
+def timed(fn, runs):
+    best = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark action-item extraction")
+    parser.add_argument("--words", nargs="+", type=int, default=[10000, 100000, 1000000])
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    matcher = ActionItemMatcher()
+    print(f"{'words':>9}{'old MB/s':>10}{'new MB/s':>10}{'old items':>11}{'new items':>11}")
+    for words in args.words:
+        text = synthetic_transcript(words)
+        mb = len(text.encode("utf-8")) / 1e6
+        old_time, old_items = timed(lambda: extract_substring_scan(text), args.runs)
+        new_time, new_items = timed(lambda: matcher.find(text), args.runs)
+        # Item counts differ where the old scan matched inside other words
+        print(f"{words:>9}{mb / old_time:>10.1f}{mb / new_time:>10.1f}{len(old_items):>11}{len(new_items):>11}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Archive formats: file size, write volume and stop latency per format.
+
+Drives AudioRecorder with simulated devices (no sound card needed) that
+deliver speech-like audio faster than real time, so the encoder sees the
+same block pattern as a live capture. "stop ms" is how long stop_recording
+blocks; "archive ms" is until the file is complete on disk. Keep --speed
+below what the Opus encoder manages (roughly 30x on one core) or the
+archive time measures encoder backlog instead of the tail.
+
+Usage: python bench_archive.py --minutes 10 --speed 10 --formats wav flac opus
+"""
+import argparse
+import os
+import tempfile
+import time
+import numpy as np
+from recorder import AudioRecorder, resolve_archive_format
+
+def speech_like(n, sample_rate, rng):
+    """Noise shaped by a syllable-rate envelope, with pauses between phrases."""
+    t = np.arange(n) / sample_rate
+    syllables = 0.5 * (1 + np.sin(2 * np.pi * 4 * t + rng.uniform(0, 6)))
+    phrases = (np.sin(2 * np.pi * 0.2 * t + rng.uniform(0, 6)) > -0.3).astype(np.float32)
+    voice = np.sin(2 * np.pi * 140 * t) + 0.5 * np.sin(2 * np.pi * 280 * t)
+    noise = rng.standard_normal(n)
+    return (0.1 * (voice + 0.3 * noise) * syllables * phrases + 0.002 * noise).astype(np.float32)
+
+class FakeDevice:
+    """Stands in for a soundcard microphone/loopback."""
+
+    def __init__(self, name, seconds, sample_rate, speed, seed, audio=None):
+        self.name = name
+        self.speed = speed
+        if audio is None:
+            audio = speech_like(int(seconds * sample_rate), sample_rate, np.random.default_rng(seed))
+        self.audio = audio
+        self.sample_rate = sample_rate
+        self.position = 0
+
+    def recorder(self, samplerate):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def record(self, numframes):
+        time.sleep(numframes / self.sample_rate / self.speed)
+        block = self.audio[self.position:self.position + numframes]
+        self.position += len(block)
+        if len(block) < numframes:
+            block = np.pad(block, (0, numframes - len(block)))
+        # Stereo like a real device, so the downmix is exercised too
+        return np.repeat(block[:, None], 2, axis=1)
+
+def run(archive_format, seconds, speed, output_dir):
+    recorder = AudioRecorder(output_dir=output_dir, archive_format=archive_format,
+                             encode_interval=max(0.5, 5.0 / speed))
+    system = FakeDevice("Fake Loopback", seconds, recorder.sample_rate, speed, seed=1)
+    mic = FakeDevice("Fake Mic", seconds, recorder.sample_rate, speed, seed=2)
+    recorder._get_loopback_mic = lambda: system
+    recorder._get_user_mic = lambda: mic
+
+    recorder.start_recording()
+    while system.position < len(system.audio) or mic.position < len(mic.audio):
+        time.sleep(0.05)
+
+    start = time.perf_counter()
+    filename = recorder.stop_recording()
+    stop_latency = time.perf_counter() - start
+    recorder.archive_thread.join()
+    # Time until the archive is complete on disk
+    archive_latency = time.perf_counter() - start
+
+    size = os.path.getsize(os.path.join(output_dir, filename))
+    return {"size": size, "stop": stop_latency, "archive": archive_latency}
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark archive formats")
+    parser.add_argument("--minutes", type=float, default=10)
+    parser.add_argument("--speed", type=float, default=10, help="Capture speed relative to real time")
+    parser.add_argument("--formats", nargs="+", default=["wav", "flac", "opus"])
+    args = parser.parse_args()
+
+    seconds = args.minutes * 60
+    # What the old float64 np.concatenate + sf.write path kept in memory before writing
+    print(f"{args.minutes:g} min recording; float64 mix in memory: {seconds * 44100 * 8 / 1e6:.0f} MB")
+    print(f"{'format':>8}{'size MB':>10}{'MB/hour':>10}{'vs wav':>8}{'stop ms':>10}{'archive ms':>12}")
+    wav_size = None
+    for name in args.formats:
+        resolved = resolve_archive_format(name)
+        with tempfile.TemporaryDirectory() as output_dir:
+            result = run(resolved, seconds, args.speed, output_dir)
+        if resolved == "wav":
+            wav_size = result["size"]
+        ratio = f"{wav_size / result['size']:.1f}x" if wav_size else "-"
+        print(f"{resolved:>8}{result['size'] / 1e6:>10.2f}{result['size'] / 1e6 * 3600 / seconds:>10.1f}"
+              f"{ratio:>8}{result['stop'] * 1000:>10.1f}{result['archive'] * 1000:>12.1f}")
+
+if __name__ == "__main__":
+    main()
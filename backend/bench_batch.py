@@ -0,0 +1,58 @@
+"""Batched vs one-by-one transcription: audio-hours per CPU-hour.
+
+Transcribes the same set of recordings twice with one loaded model: first
+each file with Transcriber.transcribe (windows decoded one at a time), then
+all of them with Transcriber.transcribe_batch (windows from every file
+stacked into batches). CPU time is this process's user+system time, so
+it covers every PyTorch thread.
+
+Synthetic meetings exercise the full decode path without real speech;
+pass --audio to measure on actual recordings.
+
+Usage: python bench_batch.py --model tiny --files 4 --minutes 3 --batch-size 8
+       python bench_batch.py --model base --audio ../recordings/*.flac
+"""
+import argparse
+import time
+import numpy as np
+from audio_utils import load_audio, WHISPER_SAMPLE_RATE
+from bench_pipeline import synthetic_meeting
+from transcriber import Transcriber
+
+def measure(fn):
+    wall, cpu = time.perf_counter(), time.process_time()
+    results = fn()
+    return results, time.perf_counter() - wall, time.process_time() - cpu
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark batched transcription across recordings")
+    parser.add_argument("--model", default="tiny")
+    parser.add_argument("--files", type=int, default=4)
+    parser.add_argument("--minutes", type=float, default=3)
+    parser.add_argument("--audio", nargs="+", help="Recordings to use instead of synthetic meetings")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--vad", action="store_true")
+    args = parser.parse_args()
+
+    if args.audio:
+        audios = [load_audio(path) for path in args.audio]
+    else:
+        audios = [np.add(*synthetic_meeting(args.minutes * 60, WHISPER_SAMPLE_RATE, seed)) for seed in range(args.files)]
+    audio_hours = sum(len(a) for a in audios) / WHISPER_SAMPLE_RATE / 3600
+
+    transcriber = Transcriber(args.model, threads=args.threads, vad=args.vad)
+    print(f"{len(audios)} recordings, {audio_hours * 60:.1f} min of audio, model {args.model}")
+    one_by_one, seq_wall, seq_cpu = measure(lambda: [transcriber.transcribe(a) for a in audios])
+    batched, batch_wall, batch_cpu = measure(lambda: transcriber.transcribe_batch(audios, args.batch_size))
+
+    print(f"\n{'mode':>12}{'wall s':>9}{'CPU s':>9}{'audio-h/CPU-h':>15}{'x realtime':>12}{'segments':>10}")
+    for name, results, wall, cpu in (("one-by-one", one_by_one, seq_wall, seq_cpu),
+                                     (f"batch {args.batch_size}", batched, batch_wall, batch_cpu)):
+        segments = sum(len(r.get("segments", [])) for r in results)
+        print(f"{name:>12}{wall:>9.1f}{cpu:>9.1f}{audio_hours / (cpu / 3600):>15.1f}"
+              f"{audio_hours * 3600 / wall:>12.1f}{segments:>10}")
+    print(f"\nBatched: {seq_cpu / batch_cpu:.2f}x audio per CPU-hour, {seq_wall / batch_wall:.2f}x wall-clock")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Capture under server load: thread capture vs the capture process.
+
+Simulated devices run on a real-time clock with a bounded device buffer,
+like a sound card: a reader that comes back late finds the buffer overrun,
+gets a "data discontinuity" warning and loses the frames that didn't fit.
+While recording, --load threads keep the GIL busy with pure-Python work
+(standing in for request handling, job bookkeeping and report generation).
+Reports how much audio each mode kept and how many overruns it saw.
+
+Usage: python bench_capture.py --seconds 20 --load 4 --modes thread process
+"""
+import argparse
+import tempfile
+import threading
+import time
+import warnings
+from functools import partial
+import numpy as np
+from recorder import AudioRecorder
+
+class RealtimeDevice:
+    """A soundcard-like device whose buffer fills at `sample_rate` whether or not anyone reads."""
+
+    def __init__(self, name, sample_rate, buffer_frames):
+        self.name = name
+        self.sample_rate = sample_rate
+        self.buffer_frames = buffer_frames
+
+    def recorder(self, samplerate):
+        return self
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        self.position = 0
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def record(self, numframes):
+        available = int((time.perf_counter() - self.started) * self.sample_rate) - self.position
+        if available > self.buffer_frames:
+            warnings.warn("data discontinuity in recording", RuntimeWarning)
+            # Whatever didn't fit in the device buffer is gone
+            self.position += available - self.buffer_frames
+        elif available < numframes:
+            time.sleep((numframes - available) / self.sample_rate)
+        t = (self.position + np.arange(numframes)) / self.sample_rate
+        self.position += numframes
+        block = (0.1 * np.sin(2 * np.pi * 220 * t)).astype(np.float32)
+        return np.repeat(block[:, None], 2, axis=1)
+
+def open_devices(sample_rate, buffer_frames):
+    """Device opener for the capture process (module level, so it can be pickled)."""
+    return {name: RealtimeDevice(name, sample_rate, buffer_frames) for name in ("System Audio", "User Mic")}
+
+def gil_load(stop):
+    while not stop.is_set():
+        sum(i * i for i in range(20000))
+
+def run(mode, seconds, load, buffer_frames, output_dir):
+    recorder = AudioRecorder(output_dir=output_dir, capture=mode)
+    opener = partial(open_devices, recorder.sample_rate, buffer_frames)
+    devices = opener()
+    recorder._get_loopback_mic = lambda: devices["System Audio"]
+    recorder._get_user_mic = lambda: devices["User Mic"]
+    recorder.device_opener = opener
+
+    stop = threading.Event()
+    loaders = [threading.Thread(target=gil_load, args=(stop,), daemon=True) for _ in range(load)]
+    recorder.start_recording()
+    for source in recorder.source_ready.values():
+        source.wait()
+    started = time.perf_counter()
+    for t in loaders:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in loaders:
+        t.join()
+    recorder.stop_recording()
+    elapsed = time.perf_counter() - started
+    recorder.archive_thread.join()
+    return elapsed, recorder.capture_stats
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark audio capture under GIL load")
+    parser.add_argument("--seconds", type=float, default=20)
+    parser.add_argument("--load", type=int, default=4, help="Busy Python threads while recording")
+    parser.add_argument("--buffer-ms", type=float, default=50, help="Simulated device buffer")
+    parser.add_argument("--modes", nargs="+", default=["thread", "process"])
+    args = parser.parse_args()
+
+    buffer_frames = int(44100 * args.buffer_ms / 1000)
+    print(f"{args.seconds:g}s per run, {args.load} load threads, {args.buffer_ms:g} ms device buffer")
+    print(f"{'mode':>8}{'source':>14}{'kept %':>9}{'overruns':>10}{'ring full':>11}{'dropped':>10}")
+    for mode in args.modes:
+        with tempfile.TemporaryDirectory() as output_dir:
+            elapsed, stats = run(mode, args.seconds, args.load, buffer_frames, output_dir)
+        for source, s in stats.items():
+            # Audio kept vs what the device produced while the load ran (start-up and stop add a little)
+            kept = 100 * s["captured_frames"] / (elapsed * 44100)
+            print(f"{mode:>8}{source:>14}{kept:>9.1f}{s['device_overruns']:>10}{s['ring_overruns']:>11}"
+                  f"{s['dropped_frames']:>10}")
+
+if __name__ == "__main__":
+    main()
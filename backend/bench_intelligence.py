@@ -0,0 +1,73 @@
+"""Per-report latency of MeetingIntelligence, with and without the shared NLP cache.
+
+Usage: python bench_intelligence.py --words 1000 10000 100000 --runs 3
+
+"before" rebuilds the Tokenizer/Stemmer/LsaSummarizer/stop words on every
+report like the old generate_summary did; "after" uses the cached objects.
+"""
+import argparse
+import random
+import time
+from sumy.parsers.plaintext import PlaintextParser
+from sumy.nlp.tokenizers import Tokenizer
+from sumy.summarizers.lsa import LsaSummarizer
+from sumy.nlp.stemmers import Stemmer
+from sumy.utils import get_stop_words
+from intelligence import MeetingIntelligence
+
+VOCAB = (
+    "we will need to follow up on the budget and schedule a review next week "
+    "the team agreed that the release is going to slip unless we ensure testing "
+    "finishes on time customers asked about pricing support migration and the roadmap "
+    "marketing launch hiring onboarding security audit vendor contract invoice latency "
+    "dashboard metrics outage postmortem design document feedback demo quarter goals"
+).split()
+
+def synthetic_transcript(words, seed=0, extra_vocab=3000):
+    rng = random.Random(seed)
+    # Made-up words with a Zipf-like spread give a realistic vocabulary size
+    vocab = VOCAB + ["".join(rng.choice("bcdfghklmnprstvwaeiou") for _ in range(rng.randint(4, 9)))
+                     for _ in range(extra_vocab)]
+    weights = [1.0 / (rank + 1) for rank in range(len(vocab))]
+    out = []
+    while len(out) < words:
+        sentence = rng.choices(vocab, weights, k=rng.randint(6, 18))
+        sentence[0] = sentence[0].capitalize()
+        out.extend(sentence)
+        out[-1] += rng.choice([".", ".", ".", "?"])
+    return " ".join(out[:words]) + "."
+
+def summary_uncached(text, language="english", sentence_count=5):
+    parser = PlaintextParser.from_string(text, Tokenizer(language))
+    summarizer = LsaSummarizer(Stemmer(language))
+    summarizer.stop_words = get_stop_words(language)
+    return " ".join(str(s) for s in summarizer(parser.document, sentence_count))
+
+def best_of(runs, fn):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark report generation")
+    parser.add_argument("--words", nargs="+", type=int, default=[1000, 10000, 100000])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--summary-mode", default="auto", choices=["auto", "lsa", "chunked"])
+    args = parser.parse_args()
+
+    intelligence = MeetingIntelligence(offline=True, summary_mode=args.summary_mode)
+
+    print(f"{'words':>8}{'before (ms)':>14}{'after (ms)':>13}{'speedup':>9}")
+    for words in args.words:
+        text = synthetic_transcript(words)
+        before = best_of(args.runs, lambda: summary_uncached(text) + intelligence.extract_action_items(text))
+        after = best_of(args.runs, lambda: intelligence.generate_report(text, text))
+        print(f"{words:>8}{before * 1000:>14.1f}{after * 1000:>13.1f}{before / after:>8.2f}x")
+
+    intelligence.close()
+
+if __name__ == "__main__":
+    main()
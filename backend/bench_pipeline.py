@@ -0,0 +1,266 @@
+"""End-to-end pipeline benchmark on synthetic meetings, CPU-only and offline.
+
+Each run records a synthetic two-channel meeting (turn-taking speech-like
+tones and noise with silence gaps) through AudioRecorder with simulated
+devices, then times every stage after stop:
+
+    archive     stop -> compressed archive complete on disk
+    transcribe  Transcriber.transcribe on the archive (stub model by default)
+    diarize     channel energy + Local/Remote labels
+    report      MeetingIntelligence.generate_report
+    index       SearchIndex.index_meeting
+    upload      DriveManager.upload_file against an in-process fake Drive
+
+and reports latency percentiles, throughput (x real time) and peak RSS per
+stage, plus a JSON file to compare releases.
+
+Usage: python bench_pipeline.py --minutes 5 30 --runs 3 --output results.json
+       python bench_pipeline.py --model tiny   # real Whisper instead of the stub
+"""
+import argparse
+import json
+import os
+import platform
+import tempfile
+import threading
+import time
+from http.server import ThreadingHTTPServer
+import numpy as np
+import metrics
+from audio_utils import load_audio, WHISPER_SAMPLE_RATE
+from bench_archive import FakeDevice, speech_like
+from bench_intelligence import synthetic_transcript
+from diarization import label_segments
+from drive_sync import DriveManager
+from fake_drive import FakeDrive, make_handler
+from intelligence import MeetingIntelligence
+from recorder import AudioRecorder
+from search_index import SearchIndex
+from transcriber import Transcriber
+
+STAGES = ("archive", "transcribe", "diarize", "report", "index", "upload")
+
+def synthetic_meeting(seconds, sample_rate, seed=0):
+    """Two channels taking turns, with silence gaps and a little crosstalk."""
+    rng = np.random.default_rng(seed)
+    n = int(seconds * sample_rate)
+    system = np.zeros(n, dtype=np.float32)
+    mic = np.zeros(n, dtype=np.float32)
+    t = 0.0
+    while t < seconds:
+        turn, gap = rng.uniform(3, 15), rng.uniform(0.3, 3)
+        start, end = int(t * sample_rate), min(n, int((t + turn) * sample_rate))
+        speaker, other = (system, mic) if rng.random() < 0.5 else (mic, system)
+        voice = speech_like(end - start, sample_rate, rng)
+        speaker[start:end] += voice
+        # The other channel picks up a faint copy (speaker bleed into the mic)
+        other[start:end] += 0.05 * voice
+        t += turn + gap
+    system += 0.001 * rng.standard_normal(n).astype(np.float32)
+    mic += 0.001 * rng.standard_normal(n).astype(np.float32)
+    return system, mic
+
+class StubWhisperModel:
+    """Answers like whisper's model.transcribe, one segment per voiced 4s window.
+
+    `rtf` adds simulated decode time (seconds per second of audio).
+    """
+
+    def __init__(self, rtf=0.0, window_seconds=4.0):
+        self.rtf = rtf
+        self.window_seconds = window_seconds
+        self.words = synthetic_transcript(20000, seed=1).split()
+
+    def transcribe(self, audio, **options):
+        if isinstance(audio, str):
+            audio = load_audio(audio)
+        window = int(self.window_seconds * WHISPER_SAMPLE_RATE)
+        segments, cursor = [], 0
+        for start in range(0, len(audio), window):
+            chunk = audio[start:start + window]
+            if np.sqrt(np.mean(chunk ** 2)) < 0.01:
+                continue
+            count = 8 + len(segments) % 7
+            words = self.words[cursor:cursor + count] or ["okay"]
+            cursor = (cursor + count) % (len(self.words) - 20)
+            segments.append({
+                "id": len(segments),
+                "start": start / WHISPER_SAMPLE_RATE,
+                "end": min(len(audio), start + window) / WHISPER_SAMPLE_RATE,
+                "text": " " + " ".join(words),
+            })
+        time.sleep(len(audio) / WHISPER_SAMPLE_RATE * self.rtf)
+        return {"text": "".join(s["text"] for s in segments), "segments": segments}
+
+class StubTranscriber(Transcriber):
+    """Transcriber with the stub model, so the pipeline runs without Whisper."""
+
+    def __init__(self, vad=True, rtf=0.0):
+        self._init_state("stub", vad=vad)
+        self.model = StubWhisperModel(rtf)
+        self.load_seconds = self._load_seconds["stub"] = 0.0
+
+class PeakRSS:
+    """Samples this process's resident memory while a stage runs."""
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.peak = metrics.resident_memory_bytes()
+        self._stop = threading.Event()
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak or 0, metrics.resident_memory_bytes() or 0)
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak or 0, metrics.resident_memory_bytes() or 0)
+        return False
+
+def start_fake_drive(fail_rate):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(FakeDrive(fail_rate)))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}/"
+
+def run_once(seconds, seed, args, transcriber, intelligence, drive, workdir):
+    """One meeting through every stage -> {stage: (seconds, peak_rss)}."""
+    recorder = AudioRecorder(output_dir=workdir, archive_format=args.archive_format,
+                             encode_interval=max(0.5, 5.0 / args.capture_speed))
+    system, mic = synthetic_meeting(seconds, recorder.sample_rate, seed)
+    devices = {
+        "system": FakeDevice("Fake Loopback", seconds, recorder.sample_rate, args.capture_speed, seed, system),
+        "mic": FakeDevice("Fake Mic", seconds, recorder.sample_rate, args.capture_speed, seed, mic),
+    }
+    recorder._get_loopback_mic = lambda: devices["system"]
+    recorder._get_user_mic = lambda: devices["mic"]
+
+    recorder.start_recording()
+    while any(d.position < len(d.audio) for d in devices.values()):
+        time.sleep(0.05)
+
+    timings = {}
+    state = {}
+
+    def stage(name, fn):
+        with PeakRSS() as rss:
+            start = time.perf_counter()
+            state[name] = fn()
+            timings[name] = (time.perf_counter() - start, rss.peak)
+
+    def archive():
+        filename = recorder.stop_recording()
+        recorder.archive_thread.join()
+        return os.path.join(workdir, filename)
+
+    stage("archive", archive)
+    stage("transcribe", lambda: transcriber.transcribe(state["archive"]))
+
+    def diarize():
+        segments = label_segments(state["transcribe"]["segments"], recorder.get_channel_energy())
+        return segments, Transcriber.format_segments(segments)
+
+    stage("diarize", diarize)
+    segments, formatted = state["diarize"]
+    stage("report", lambda: intelligence.generate_report(state["transcribe"]["full_text"], formatted, segments))
+
+    report_path = os.path.splitext(state["archive"])[0] + ".txt"
+    with open(report_path, "w", encoding="utf-8") as f:
+        f.write(state["report"])
+
+    index = SearchIndex(os.path.join(workdir, "search.db"))
+    stage("index", lambda: index.index_meeting(state["archive"], segments, report_path=report_path))
+    index.close()
+
+    def upload():
+        result = drive.upload_file(report_path)
+        if args.upload_audio:
+            result = drive.upload_file(state["archive"])
+        return result
+
+    stage("upload", upload)
+    if "error" in state["upload"]:
+        print(f"Upload failed: {state['upload']['error']}")
+    return timings
+
+def summarize(seconds, runs):
+    """Percentiles/throughput/peak RSS per stage over all runs of one length."""
+    stages = {}
+    for name in STAGES + ("total",):
+        if name == "total":
+            latencies = [sum(r[s][0] for s in STAGES) for r in runs]
+            peaks = [max(r[s][1] or 0 for s in STAGES) for r in runs]
+        else:
+            latencies = [r[name][0] for r in runs]
+            peaks = [r[name][1] or 0 for r in runs]
+        p50, p90, p99 = np.percentile(latencies, [50, 90, 99])
+        stages[name] = {
+            "latency_seconds": {"p50": p50, "p90": p90, "p99": p99, "mean": float(np.mean(latencies)),
+                                "min": min(latencies), "max": max(latencies)},
+            # Seconds of meeting processed per second of wall time
+            "throughput_x_realtime": seconds / p50 if p50 > 0 else None,
+            "peak_rss_mb": max(peaks) / 1e6,
+        }
+    return stages
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the whole meeting pipeline on synthetic audio")
+    parser.add_argument("--minutes", nargs="+", type=float, default=[5])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--model", default="stub", help='"stub" or a Whisper model size such as "tiny"')
+    parser.add_argument("--backend", default="whisper")
+    parser.add_argument("--stub-rtf", type=float, default=0.0, help="Simulated decode cost of the stub model")
+    parser.add_argument("--no-vad", action="store_true")
+    parser.add_argument("--archive-format", default="flac")
+    parser.add_argument("--capture-speed", type=float, default=30, help="Simulated capture speed vs real time")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Share of fake Drive requests answered 503")
+    parser.add_argument("--upload-audio", action="store_true")
+    parser.add_argument("--output", default="bench_pipeline.json")
+    args = parser.parse_args()
+
+    if args.model == "stub":
+        transcriber = StubTranscriber(vad=not args.no_vad, rtf=args.stub_rtf)
+    else:
+        transcriber = Transcriber(args.model, backend=args.backend, vad=not args.no_vad)
+    intelligence = MeetingIntelligence(offline=True)
+    server, endpoint = start_fake_drive(args.fail_rate)
+
+    results = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "machine": {"platform": platform.platform(), "python": platform.python_version(),
+                    "cpus": os.cpu_count()},
+        "config": vars(args),
+        "meetings": [],
+    }
+    try:
+        for minutes in args.minutes:
+            seconds = minutes * 60
+            runs = []
+            for run in range(args.runs):
+                with tempfile.TemporaryDirectory() as workdir:
+                    drive = DriveManager(state_file=os.path.join(workdir, "drive_state.json"), api_endpoint=endpoint)
+                    runs.append(run_once(seconds, run, args, transcriber, intelligence, drive, workdir))
+            stages = summarize(seconds, runs)
+            results["meetings"].append({"minutes": minutes, "runs": args.runs, "stages": stages})
+
+            print(f"\n{minutes:g} min meeting, {args.runs} runs")
+            print(f"{'stage':>11}{'p50 s':>9}{'p90 s':>9}{'p99 s':>9}{'x realtime':>12}{'peak RSS MB':>13}")
+            for name, s in stages.items():
+                lat = s["latency_seconds"]
+                print(f"{name:>11}{lat['p50']:>9.3f}{lat['p90']:>9.3f}{lat['p99']:>9.3f}"
+                      f"{s['throughput_x_realtime'] or 0:>12.0f}{s['peak_rss_mb']:>13.0f}")
+    finally:
+        intelligence.close()
+        server.shutdown()
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+if __name__ == "__main__":
+    main()
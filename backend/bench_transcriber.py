@@ -0,0 +1,54 @@
+"""Real-time factor of each transcription backend on a fixed sample file.
+
+Usage: python bench_transcriber.py ../recordings/sample.wav --model base --threads 4
+
+RTF = processing time / audio duration (lower is better; < 1.0 is faster
+than real time).
+"""
+import argparse
+import time
+import soundfile as sf
+from transcriber import Transcriber, BACKENDS
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Whisper backends")
+    parser.add_argument("file", help="Sample audio file (same file for every backend)")
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument("--model", default="base")
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--beam-size", type=int, default=None)
+    parser.add_argument("--runs", type=int, default=1)
+    args = parser.parse_args()
+
+    duration = sf.info(args.file).duration
+    print(f"Sample: {args.file} ({duration:.1f}s)")
+
+    rows = []
+    for backend in args.backends:
+        try:
+            load_start = time.perf_counter()
+            transcriber = Transcriber(args.model, backend=backend, threads=args.threads, beam_size=args.beam_size)
+            load_time = time.perf_counter() - load_start
+        except ImportError as e:
+            print(f"Skipping {backend}: {e}")
+            continue
+
+        best = None
+        for _ in range(args.runs):
+            start = time.perf_counter()
+            result = transcriber.transcribe(args.file)
+            elapsed = time.perf_counter() - start
+            if "error" in result:
+                print(f"{backend} failed: {result['error']}")
+                break
+            best = elapsed if best is None else min(best, elapsed)
+
+        if best is not None:
+            rows.append((backend, load_time, best, best / duration, len(result["segments"])))
+
+    print(f"\n{'backend':<16}{'load (s)':>10}{'time (s)':>10}{'RTF':>8}{'segments':>10}")
+    for backend, load_time, elapsed, rtf, segments in rows:
+        print(f"{backend:<16}{load_time:>10.2f}{elapsed:>10.2f}{rtf:>8.3f}{segments:>10}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+"""Audio capture in its own process, handed over through shared-memory rings.
+
+In the server process, capture threads compete for the GIL with request
+handlers, job threads and NumPy work; when they wake up late, the device
+buffer overflows and audio is lost. Here each source is read by a thread in
+a separate capture process, which does nothing but record, downmix into a
+preallocated block and copy it into a lock-free single-producer ring. The
+recorder drains the rings every so often; the rings hold `ring_seconds` of
+audio, so a busy server only delays the copy instead of losing frames.
+
+Each ring counts what went wrong for its source: device overruns (the
+driver reported a discontinuity, i.e. the capture thread itself fell
+behind), ring overruns (the server didn't drain in time and a block was
+dropped) and failed device reads.
+"""
+import multiprocessing
+import threading
+import warnings
+import numpy as np
+from multiprocessing import shared_memory
+
+# int64 header fields at the start of each ring's shared block
+WRITE, READ, STATE, READ_ERRORS, RING_OVERRUNS, DEVICE_OVERRUNS = range(6)
+HEADER_FIELDS = 8
+NAME_BYTES = 128
+HEADER_BYTES = HEADER_FIELDS * 8 + NAME_BYTES
+
+# Source states
+STARTING, OPEN, UNAVAILABLE, CLOSED = range(4)
+
+class CaptureRing:
+    """Single-producer, single-consumer float32 ring buffer in shared memory.
+
+    The writer only moves WRITE and the reader only moves READ, and each
+    publishes its position after touching the samples, so neither needs a
+    lock. A block that doesn't fit is dropped and counted instead of
+    overwriting audio the reader hasn't taken yet.
+    """
+
+    def __init__(self, shm, capacity):
+        self.shm = shm
+        self.name = shm.name
+        self.capacity = capacity
+        self.header = np.ndarray((HEADER_FIELDS,), dtype=np.int64, buffer=shm.buf)
+        self._device_name = np.ndarray((NAME_BYTES,), dtype=np.uint8, buffer=shm.buf, offset=HEADER_FIELDS * 8)
+        self.samples = np.ndarray((capacity,), dtype=np.float32, buffer=shm.buf, offset=HEADER_BYTES)
+
+    @classmethod
+    def create(cls, capacity):
+        shm = shared_memory.SharedMemory(create=True, size=HEADER_BYTES + capacity * 4)
+        ring = cls(shm, capacity)
+        ring.header[:] = 0
+        return ring
+
+    @classmethod
+    def attach(cls, name, capacity):
+        return cls(shared_memory.SharedMemory(name=name), capacity)
+
+    # --- Writer (capture process) ---
+    def write(self, block):
+        n = len(block)
+        position = int(self.header[WRITE])
+        if position + n - int(self.header[READ]) > self.capacity:
+            self.header[RING_OVERRUNS] += 1
+            return False
+        start = position % self.capacity
+        first = min(n, self.capacity - start)
+        self.samples[start:start + first] = block[:first]
+        self.samples[:n - first] = block[first:]
+        self.header[WRITE] = position + n
+        return True
+
+    def set_state(self, state, device_name=None):
+        if device_name is not None:
+            encoded = device_name.encode("utf-8")[:NAME_BYTES - 1]
+            self._device_name[:] = 0
+            self._device_name[:len(encoded)] = np.frombuffer(encoded, dtype=np.uint8)
+        self.header[STATE] = state
+
+    # --- Reader (recorder) ---
+    def read(self):
+        """Copies out everything written since the last read."""
+        position, end = int(self.header[READ]), int(self.header[WRITE])
+        n = end - position
+        if n <= 0:
+            return np.zeros(0, dtype=np.float32)
+        start = position % self.capacity
+        first = min(n, self.capacity - start)
+        out = np.empty(n, dtype=np.float32)
+        out[:first] = self.samples[start:start + first]
+        out[first:] = self.samples[:n - first]
+        self.header[READ] = end
+        return out
+
+    @property
+    def state(self):
+        return int(self.header[STATE])
+
+    @property
+    def device_name(self):
+        return bytes(self._device_name).split(b"\0", 1)[0].decode("utf-8", "replace")
+
+    def counts(self):
+        return {
+            "read_errors": int(self.header[READ_ERRORS]),
+            "ring_overruns": int(self.header[RING_OVERRUNS]),
+            "device_overruns": int(self.header[DEVICE_OVERRUNS]),
+        }
+
+    def close(self, unlink=False):
+        # Views into the buffer must go before the mapping can be closed
+        self.header = self._device_name = self.samples = None
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+
+def downmix_into(data, out):
+    """Averages a [frames, channels] block into the preallocated `out`, without allocating.
+
+    Returns the filled view of `out`.
+    """
+    mono = out[:len(data)]
+    if data.shape[1] > 1:
+        np.mean(data, axis=1, out=mono)
+    else:
+        mono[:] = data[:, 0]
+    return mono
+
+# --- Device overruns ---
+# soundcard reports a device buffer overflow as a "data discontinuity"
+# RuntimeWarning from the thread that called record(); count those per source.
+_overrun_counter = threading.local()
+_hook_lock = threading.Lock()
+_hook_installed = False
+
+def watch_overruns(on_overrun):
+    """Calls `on_overrun()` for every discontinuity warning raised on this thread."""
+    global _hook_installed
+    with _hook_lock:
+        if not _hook_installed:
+            # Shown every time (the default shows a warning once), and ahead of any "ignore" filter
+            warnings.filterwarnings("always", message=".*discontinuity.*")
+            original = warnings.showwarning
+
+            def showwarning(message, category, filename, lineno, file=None, line=None):
+                counter = getattr(_overrun_counter, "callback", None)
+                if counter and "discontinuity" in str(message):
+                    counter()
+                else:
+                    original(message, category, filename, lineno, file, line)
+
+            warnings.showwarning = showwarning
+            _hook_installed = True
+    _overrun_counter.callback = on_overrun
+
+# --- Capture process ---
+def _capture_source(ring, device, sample_rate, block_size, stop):
+    if device is None:
+        ring.set_state(UNAVAILABLE)
+        return
+    block = np.empty(block_size, dtype=np.float32)
+    header = ring.header
+    watch_overruns(lambda: header.__setitem__(DEVICE_OVERRUNS, header[DEVICE_OVERRUNS] + 1))
+    try:
+        with device.recorder(samplerate=sample_rate) as recorder:
+            ring.set_state(OPEN, device.name)
+            while not stop.is_set():
+                try:
+                    data = recorder.record(numframes=block_size)
+                except Exception:
+                    header[READ_ERRORS] += 1
+                    continue
+                if len(data) > len(block):
+                    block = np.empty(len(data), dtype=np.float32)
+                ring.write(downmix_into(data, block))
+    except Exception as e:
+        print(f"Capture of {device.name} failed: {e}")
+        if ring.state != OPEN:
+            ring.set_state(UNAVAILABLE)
+            return
+    ring.set_state(CLOSED)
+
+def _capture_main(rings, open_devices, sample_rate, block_size, stop):
+    """Capture process entry point: one thread per source until `stop` is set."""
+    devices = open_devices()
+    attached = {name: CaptureRing.attach(shm_name, capacity) for name, (shm_name, capacity) in rings.items()}
+    threads = [
+        threading.Thread(target=_capture_source, args=(ring, devices.get(name), sample_rate, block_size, stop),
+                         name=f"capture-{name}")
+        for name, ring in attached.items()
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for ring in attached.values():
+        try:
+            ring.close()
+        except BufferError:
+            pass  # A view is still referenced; the mapping goes with the process
+
+class CaptureProcess:
+    """Runs the capture of several sources in a child process.
+
+    `open_devices` must be picklable (a module-level function or a
+    functools.partial of one); it runs in the child and returns
+    {source name: soundcard device or None}.
+    """
+
+    def __init__(self, sources, open_devices, sample_rate, block_size=1024, ring_seconds=30.0):
+        capacity = int(sample_rate * ring_seconds)
+        self.rings = {name: CaptureRing.create(capacity) for name in sources}
+        # Never fork a server full of threads (and audio client connections)
+        context = multiprocessing.get_context("spawn")
+        self._stop = context.Event()
+        self.process = context.Process(
+            target=_capture_main,
+            args=({name: (ring.name, capacity) for name, ring in self.rings.items()},
+                  open_devices, sample_rate, block_size, self._stop),
+            name="audio-capture",
+            daemon=True,
+        )
+
+    def start(self):
+        try:
+            self.process.start()
+        except Exception:
+            self.close()
+            raise
+
+    def stop(self, timeout=5.0):
+        """Stops capturing; everything recorded stays in the rings to be read."""
+        self._stop.set()
+        self.process.join(timeout)
+        if self.process.is_alive():
+            print("Capture process did not stop in time; terminating it")
+            self.process.terminate()
+            self.process.join()
+        if self.process.exitcode not in (0, None):
+            # It never got to report on its sources
+            for ring in self.rings.values():
+                if ring.state in (STARTING, OPEN):
+                    ring.set_state(UNAVAILABLE if ring.state == STARTING else CLOSED)
+
+    def close(self):
+        for ring in self.rings.values():
+            ring.close(unlink=True)
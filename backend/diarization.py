@@ -0,0 +1,79 @@
+import os
+import numpy as np
+
+# The loopback channel only carries the other participants, the mic mostly
+# carries the person at this machine, so whichever dominates a segment
+# tells us who spoke.
+LOCAL = "Local"
+REMOTE = "Remote"
+
+def energy_path(audio_path):
+    return os.path.splitext(audio_path)[0] + ".energy.npz"
+
+def windowed_rms(read, total, sample_rate, hop_seconds=0.1, block_hops=100):
+    """RMS envelope of one source, read block by block via read(start, end)."""
+    hop = int(sample_rate * hop_seconds)
+    n_hops = total // hop
+    rms = np.zeros(n_hops, dtype=np.float32)
+    block = hop * block_hops
+    for start in range(0, n_hops * hop, block):
+        end = min(start + block, n_hops * hop)
+        data = read(start, end)
+        data = np.pad(data, (0, (end - start) - len(data))).reshape(-1, hop)
+        rms[start // hop:end // hop] = np.sqrt(np.mean(data * data, axis=1))
+    return rms
+
+def save_energy(path, energy):
+    np.savez(path, hop_seconds=energy["hop_seconds"], system=energy["system"], mic=energy["mic"])
+
+def load_energy(path):
+    if not os.path.exists(path):
+        return None
+    with np.load(path) as data:
+        return {"hop_seconds": float(data["hop_seconds"]), "system": data["system"], "mic": data["mic"]}
+
+# A channel counts as active this far above its own noise floor (10th percentile)...
+ACTIVE_MARGIN_DB = 12.0
+# ...and never below this absolute level (about -55 dBFS, as in vad.py)
+ABSOLUTE_FLOOR_RMS = 10 ** (-55 / 20)
+
+def _normalize(rms):
+    """Gates a channel at its noise floor, then scales it by its active level.
+
+    The scale (mic gain vs. digital loopback level) comes from the active
+    frames only, so a mic that is mostly silent isn't scaled up until its
+    noise matches the other side's speech; gated frames are zero.
+    """
+    if not len(rms):
+        return rms
+    threshold = max(np.percentile(rms, 10) * 10 ** (ACTIVE_MARGIN_DB / 20), ABSOLUTE_FLOOR_RMS)
+    active = rms > threshold
+    if not active.any():
+        return np.zeros_like(rms)
+    ref = np.percentile(rms[active], 95)
+    return np.where(active, rms / ref, 0.0)
+
+def label_segments(segments, energy):
+    """Returns copies of the segments with "speaker" set to Local or Remote.
+
+    Mean energy per segment comes from prefix sums, so labelling costs one
+    vectorized pass regardless of how many segments there are.
+    """
+    if not segments:
+        return segments
+
+    hop = energy["hop_seconds"]
+    n = max(len(energy["system"]), len(energy["mic"]))
+    system = np.pad(_normalize(energy["system"]), (0, n - len(energy["system"])))
+    mic = np.pad(_normalize(energy["mic"]), (0, n - len(energy["mic"])))
+    sys_sum = np.concatenate([[0.0], np.cumsum(system ** 2)])
+    mic_sum = np.concatenate([[0.0], np.cumsum(mic ** 2)])
+
+    starts = np.array([float(s["start"]) for s in segments])
+    ends = np.array([float(s["end"]) for s in segments])
+    first = np.clip((starts / hop).astype(int), 0, n)
+    last = np.clip(np.ceil(ends / hop).astype(int), 0, n)
+    last = np.maximum(last, np.minimum(first + 1, n))
+
+    local = (mic_sum[last] - mic_sum[first]) > (sys_sum[last] - sys_sum[first])
+    return [dict(s, speaker=LOCAL if is_local else REMOTE) for s, is_local in zip(segments, local)]
@@ -1,82 +1,330 @@
 import os
-import datetime
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload
+import json
+import time
+import heapq
+import itertools
+import hashlib
+import queue
+import threading
+import mimetypes
+import metrics
 
 # If modifying these scopes, delete the file token.json.
 SCOPES = ['https://www.googleapis.com/auth/drive.file']
 
+# Files bigger than this go up in resumable chunks (must be a multiple of 256KB)
+CHUNK_SIZE = 5 * 1024 * 1024
+
+UPLOAD_BYTES = metrics.counter("drive_upload_bytes_total", "Bytes uploaded to Drive")
+UPLOAD_SECONDS = metrics.histogram("drive_upload_seconds", "Drive upload latency", ("kind",))
+UPLOAD_FAILURES = metrics.counter("drive_upload_failures_total", "Uploads that failed (before retrying)")
+QUEUE_LENGTH = metrics.gauge("drive_queue_length", "Queued uploads not finished yet")
+
+def file_md5(path, block_size=1024 * 1024):
+    """Hex MD5 of a file, as Drive reports it in md5Checksum."""
+    digest = hashlib.md5()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _is_not_found(error):
+    from googleapiclient.errors import HttpError
+    return isinstance(error, HttpError) and error.resp.status == 404
+
 class DriveManager:
-    def __init__(self, credentials_file="credentials.json"):
+    """Google Drive uploads for reports (and optionally audio).
+
+    The target folder ID is looked up once and persisted in drive_state.json.
+    Large files use resumable chunked uploads, and enqueue() hands uploads to
+    a background thread that retries with backoff, so a flaky network never
+    stalls transcription.
+
+    Pass api_endpoint (e.g. "http://127.0.0.1:8090/") to talk to a local
+    stand-in such as fake_drive.py instead of Google, without any auth.
+
+    With connect=False the constructor returns right away and connect()
+    (which may wait on a browser login) can run on another thread; uploads
+    queued in the meantime go out once it finishes.
+    """
+
+    def __init__(self, credentials_file="credentials.json", state_file="drive_state.json",
+                 api_endpoint=None, max_retries=5, connect=True):
         self.creds = None
         self.credentials_file = credentials_file
+        self.state_file = state_file
+        self.api_endpoint = api_endpoint
+        self.max_retries = max_retries
         self.service = None
-        
+        # Set once connect() has finished, whether or not it got a service
+        self.connected = threading.Event()
+
+        self._state = self._load_state()
+        self._state_lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._worker = None
+        # Jobs enqueue from several threads; only one of them may start the worker
+        self._worker_lock = threading.Lock()
+
+        if connect:
+            self.connect()
+
+    def connect(self):
+        """Authenticates and builds the Drive service (may open a browser on first run)."""
+        try:
+            if self.api_endpoint:
+                self.service = self._build_local_service(self.api_endpoint)
+            else:
+                self._authenticate()
+        finally:
+            self.connected.set()
+        return self.service is not None
+
+    def _authenticate(self):
+        # The Google client libraries are slow to import; load them on first use
+        from google.auth.transport.requests import Request
+        from google.oauth2.credentials import Credentials
+        from google_auth_oauthlib.flow import InstalledAppFlow
+        from googleapiclient.discovery import build
+
         # Check for token.json (cached auth)
         if os.path.exists('token.json'):
             self.creds = Credentials.from_authorized_user_file('token.json', SCOPES)
-            
+
         # If no valid token, user must login
         if not self.creds or not self.creds.valid:
             if self.creds and self.creds.expired and self.creds.refresh_token:
                 try:
                     self.creds.refresh(Request())
                 except:
-                    self.creds = None 
-            
+                    self.creds = None
+
             # If still no creds, we need to run the flow
             # For a headless backend, this might open a browser window on the server (machine)
             # Since this is a desktop app, it's fine.
-            if not self.creds and os.path.exists(credentials_file):
-                flow = InstalledAppFlow.from_client_secrets_file(credentials_file, SCOPES)
+            if not self.creds and os.path.exists(self.credentials_file):
+                flow = InstalledAppFlow.from_client_secrets_file(self.credentials_file, SCOPES)
                 self.creds = flow.run_local_server(port=0)
-                
+
                 # Save the credentials for the next run
                 with open('token.json', 'w') as token:
                     token.write(self.creds.to_json())
-        
+
         if self.creds:
             self.service = build('drive', 'v3', credentials=self.creds)
 
-    def upload_file(self, file_path, folder_name="Meeting_Intelligence_Logs"):
-        if not self.service:
-            return {"error": "Authentication failed. Check credentials.json"}
-            
-        filename = os.path.basename(file_path)
-        
-        # 1. Check if folder exists, create if not
-        folder_id = None
-        query = f"mimeType='application/vnd.google-apps.folder' and name='{folder_name}' and trashed=false"
-        results = self.service.files().list(q=query, spaces='drive', fields='files(id, name)').execute()
-        items = results.get('files', [])
-        
-        if not items:
-            folder_metadata = {
-                'name': folder_name,
-                'mimeType': 'application/vnd.google-apps.folder'
-            }
-            folder = self.service.files().create(body=folder_metadata, fields='id').execute()
-            folder_id = folder.get('id')
-        else:
-            folder_id = items[0]['id']
-            
-        # 2. Upload File
+    def _build_local_service(self, api_endpoint):
+        # Point the bundled discovery document at the local server; with
+        # client_options the library would keep https for upload URLs.
+        from googleapiclient.discovery import build_from_document
+        from googleapiclient.discovery_cache import get_static_doc
+        from googleapiclient.http import build_http
+        doc = json.loads(get_static_doc("drive", "v3"))
+        doc["rootUrl"] = api_endpoint if api_endpoint.endswith("/") else api_endpoint + "/"
+        # build_http() keeps 308 for resumable uploads instead of following it as a redirect
+        return build_from_document(doc, http=build_http())
+
+    # --- Folder ID cache ---
+    def _load_state(self):
+        if os.path.exists(self.state_file):
+            try:
+                with open(self.state_file, "r") as f:
+                    return json.load(f)
+            except Exception as e:
+                print(f"Could not read Drive state: {e}")
+        return {"folders": {}}
+
+    def _save_state(self):
+        with open(self.state_file, "w") as f:
+            json.dump(self._state, f, indent=2)
+
+    def get_folder_id(self, folder_name):
+        with self._state_lock:
+            folder_id = self._state["folders"].get(folder_name)
+            if folder_id:
+                return folder_id
+
+            # Check if folder exists, create if not
+            query = f"mimeType='application/vnd.google-apps.folder' and name='{folder_name}' and trashed=false"
+            results = self.service.files().list(q=query, spaces='drive', fields='files(id, name)').execute(
+                num_retries=self.max_retries)
+            items = results.get('files', [])
+
+            if not items:
+                folder_metadata = {
+                    'name': folder_name,
+                    'mimeType': 'application/vnd.google-apps.folder'
+                }
+                folder = self.service.files().create(body=folder_metadata, fields='id').execute(
+                    num_retries=self.max_retries)
+                folder_id = folder.get('id')
+            else:
+                folder_id = items[0]['id']
+
+            self._state["folders"][folder_name] = folder_id
+            self._save_state()
+            return folder_id
+
+    def _forget_folder(self, folder_name):
+        with self._state_lock:
+            self._state["folders"].pop(folder_name, None)
+            self._save_state()
+
+    # --- Uploads ---
+    def _upload(self, file_path, folder_id):
+        from googleapiclient.http import MediaFileUpload
         file_metadata = {
-            'name': filename,
+            'name': os.path.basename(file_path),
             'parents': [folder_id]
         }
-        media = MediaFileUpload(file_path, mimetype='text/plain')
-        
-        file = self.service.files().create(
+        mimetype = mimetypes.guess_type(file_path)[0] or 'application/octet-stream'
+        resumable = os.path.getsize(file_path) > CHUNK_SIZE
+        media = MediaFileUpload(file_path, mimetype=mimetype, chunksize=CHUNK_SIZE, resumable=resumable)
+
+        request = self.service.files().create(
             body=file_metadata,
             media_body=media,
             fields='id, webViewLink'
-        ).execute()
-        
+        )
+        if not resumable:
+            return request.execute(num_retries=self.max_retries)
+
+        # Each chunk is retried on its own; a dropped connection resumes
+        # from the last byte the server confirmed instead of starting over
+        response = None
+        while response is None:
+            status, response = request.next_chunk(num_retries=self.max_retries)
+            if status:
+                print(f"Uploading {file_metadata['name']}: {int(status.progress() * 100)}%")
+        return response
+
+    def upload_file(self, file_path, folder_name="Meeting_Intelligence_Logs"):
+        if not self.connected.is_set():
+            return {"error": "Still connecting to Drive"}
+        if not self.service:
+            return {"error": "Authentication failed. Check credentials.json"}
+
+        start = time.perf_counter()
+        try:
+            folder_id = self.get_folder_id(folder_name)
+            try:
+                file = self._upload(file_path, folder_id)
+            except Exception as e:
+                # The cached folder may have been deleted in Drive: look it up again once
+                if not _is_not_found(e):
+                    raise
+                self._forget_folder(folder_name)
+                file = self._upload(file_path, self.get_folder_id(folder_name))
+        except Exception as e:
+            print(f"Drive upload failed for {file_path}: {e}")
+            UPLOAD_FAILURES.inc()
+            return {"error": str(e)}
+
+        size = os.path.getsize(file_path)
+        UPLOAD_BYTES.inc(size)
+        UPLOAD_SECONDS.observe(time.perf_counter() - start, kind="resumable" if size > CHUNK_SIZE else "simple")
+
         return {
             "file_id": file.get('id'),
             "link": file.get('webViewLink')
         }
+
+    # --- Background queue ---
+    def enqueue(self, file_path, folder_name="Meeting_Intelligence_Logs", callback=None):
+        """Uploads in the background; callback(result) gets the upload_file() result."""
+        with self._worker_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._upload_worker, daemon=True)
+                self._worker.start()
+        QUEUE_LENGTH.inc()
+        # (path, folder, callback, attempt, not before)
+        self._queue.put((file_path, folder_name, callback, 0, 0.0))
+
+    def _existing_files(self, folder_name, paths):
+        """One list call for a whole batch -> {(name, md5Checksum): file} already in the folder."""
+        names = [os.path.basename(p).replace("'", "\\'") for p in paths]
+        name_clause = " or ".join(f"name='{n}'" for n in names)
+        query = f"'{self.get_folder_id(folder_name)}' in parents and trashed=false and ({name_clause})"
+        results = self.service.files().list(q=query, fields='files(id, name, md5Checksum, webViewLink)').execute(
+            num_retries=self.max_retries)
+        return {(f["name"], f.get("md5Checksum")): f for f in results.get("files", [])}
+
+    def _upload_worker(self, batch_size=20, attempts=6):
+        # Anything queued during startup waits for the login to finish
+        self.connected.wait()
+        # Failed uploads wait here for their retry time instead of blocking the queue
+        retries, order = [], itertools.count()
+        while True:
+            timeout = max(0.0, retries[0][0] - time.time()) if retries else None
+            batch = []
+            try:
+                batch.append(self._queue.get(timeout=timeout))
+            except queue.Empty:
+                pass
+            while retries and retries[0][0] <= time.time():
+                batch.append(heapq.heappop(retries)[2])
+            while len(batch) < batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            by_folder = {}
+            for item in batch:
+                by_folder.setdefault(item[1], []).append(item)
+
+            for folder_name, items in by_folder.items():
+                try:
+                    existing = self._existing_files(folder_name, [i[0] for i in items]) if self.service else {}
+                except Exception as e:
+                    print(f"Drive lookup failed, uploading without dedupe: {e}")
+                    existing = {}
+
+                for item in items:
+                    try:
+                        retry = self._process_item(item, existing, attempts)
+                    except Exception as e:
+                        # e.g. the file was moved away: report it and keep the worker alive
+                        print(f"Upload of {item[0]} failed: {e}")
+                        retry = None
+                        self._finish_item(item, {"error": str(e)})
+                    if retry:
+                        # The counter breaks ties, so items themselves are never compared
+                        heapq.heappush(retries, (retry[4], next(order), retry))
+
+    def _process_item(self, item, existing, attempts):
+        """Uploads one queued file -> the item to retry later, or None once it is finished."""
+        file_path, folder_name, callback, attempt, _ = item
+        if not os.path.exists(file_path):
+            # Moved or deleted since it was queued; retrying won't bring it back
+            self._finish_item(item, {"error": f"File not found: {file_path}"})
+            return None
+        # Same name and same MD5: already there (a changed file is uploaded again, whatever its size)
+        name = os.path.basename(file_path)
+        remote = None
+        if any(remote_name == name for remote_name, _ in existing):
+            remote = existing.get((name, file_md5(file_path)))
+        if remote:
+            self._finish_item(item, {"file_id": remote["id"], "link": remote.get("webViewLink")})
+            return None
+
+        # On top of per-request retries: ride out longer outages
+        result = self.upload_file(file_path, folder_name)
+        if "error" in result and self.service and attempt + 1 < attempts:
+            delay = min(2 ** attempt * 5, 300)
+            print(f"Retrying upload of {file_path} in {delay}s")
+            return (file_path, folder_name, callback, attempt + 1, time.time() + delay)
+        if "file_id" in result:
+            # The same file queued twice in one batch is only uploaded once
+            existing[(name, file_md5(file_path))] = {"id": result["file_id"], "webViewLink": result.get("link")}
+        self._finish_item(item, result)
+        return None
+
+    def _finish_item(self, item, result):
+        QUEUE_LENGTH.inc(-1)
+        callback = item[2]
+        if callback:
+            try:
+                callback(result)
+            except Exception as e:
+                print(f"Upload callback for {item[0]} failed: {e}")
@@ -0,0 +1,57 @@
+import asyncio
+import json
+import threading
+
+class EventHub:
+    """Fans server events out to Server-Sent Events subscribers.
+
+    publish() may be called from any thread (recorder, streaming and job
+    threads); delivery happens on the server's event loop. A subscriber that
+    falls too far behind is dropped, and its client reconnects and resyncs
+    from a fresh snapshot.
+    """
+
+    def __init__(self, queue_size=500):
+        self.queue_size = queue_size
+        self._subscribers = set()
+        self._loop = None
+        self._lock = threading.Lock()
+
+    def bind_loop(self, loop):
+        self._loop = loop
+
+    def subscribe(self):
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        with self._lock:
+            self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue):
+        with self._lock:
+            self._subscribers.discard(queue)
+
+    def is_subscribed(self, queue):
+        with self._lock:
+            return queue in self._subscribers
+
+    def publish(self, event, data):
+        if self._loop is None:
+            return
+        message = format_sse(event, data)
+        try:
+            self._loop.call_soon_threadsafe(self._fanout, message)
+        except RuntimeError:
+            # Loop already closed (server shutting down)
+            pass
+
+    def _fanout(self, message):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for queue in subscribers:
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                self.unsubscribe(queue)
+
+def format_sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
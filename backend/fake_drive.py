@@ -0,0 +1,167 @@
+"""Local stand-in for the Drive v3 API, for exercising DriveManager offline.
+
+Usage: python fake_drive.py --port 8090 --fail-rate 0.2
+Then:  DriveManager(api_endpoint="http://127.0.0.1:8090/")
+
+Supports what DriveManager uses: files.list (simple name/mimeType/parents
+queries), folder creation, multipart uploads and resumable chunked uploads,
+with size and md5Checksum on every file.
+--fail-rate answers that share of requests with 503 to exercise retries.
+"""
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import uuid
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+class FakeDrive:
+    def __init__(self, fail_rate=0.0):
+        self.fail_rate = fail_rate
+        self.files = {}
+        self.sessions = {}
+        self.lock = threading.Lock()
+
+    def create(self, metadata, content=b"", base_url=""):
+        file_id = uuid.uuid4().hex[:16]
+        entry = {
+            "id": file_id,
+            "name": metadata.get("name", "untitled"),
+            "mimeType": metadata.get("mimeType", "application/octet-stream"),
+            "parents": metadata.get("parents", []),
+            "size": str(len(content)),
+            "md5Checksum": hashlib.md5(content).hexdigest(),
+            "trashed": False,
+            "webViewLink": f"{base_url}/file/{file_id}",
+        }
+        with self.lock:
+            self.files[file_id] = dict(entry, content=content)
+        return entry
+
+    def _matches(self, entry, clause):
+        clause = clause.strip()
+        if clause.startswith("(") and clause.endswith(")"):
+            return any(self._matches(entry, c) for c in clause[1:-1].split(" or "))
+        m = re.fullmatch(r"(name|mimeType)\s*=\s*'(.*)'", clause)
+        if m:
+            return entry[m.group(1)] == m.group(2).replace("\\'", "'")
+        m = re.fullmatch(r"'(.*)'\s+in\s+parents", clause)
+        if m:
+            return m.group(1) in entry["parents"]
+        if clause == "trashed=false":
+            return not entry["trashed"]
+        return True
+
+    def list(self, query):
+        clauses = re.split(r"\s+and\s+", query) if query else []
+        with self.lock:
+            entries = list(self.files.values())
+        return [{k: v for k, v in e.items() if k != "content"}
+                for e in entries if all(self._matches(e, c) for c in clauses)]
+
+def make_handler(drive):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, fmt, *args):
+            pass
+
+        def _base_url(self):
+            return f"http://{self.headers.get('Host')}"
+
+        def _send(self, code, body=None, headers=None):
+            data = json.dumps(body).encode() if body is not None else b""
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _body(self):
+            return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+        def _flaky(self):
+            if random.random() < drive.fail_rate:
+                self._body()
+                self._send(503, {"error": {"code": 503, "message": "Injected failure"}})
+                return True
+            return False
+
+        def do_GET(self):
+            if self._flaky():
+                return
+            url = urlparse(self.path)
+            if url.path == "/drive/v3/files":
+                query = parse_qs(url.query).get("q", [""])[0]
+                return self._send(200, {"files": drive.list(query)})
+            self._send(404, {"error": {"code": 404, "message": "Not found"}})
+
+        def do_POST(self):
+            if self._flaky():
+                return
+            url = urlparse(self.path)
+            params = parse_qs(url.query)
+            body = self._body()
+
+            if url.path == "/drive/v3/files":
+                return self._send(200, drive.create(json.loads(body or b"{}"), base_url=self._base_url()))
+
+            if url.path == "/upload/drive/v3/files":
+                upload_type = params.get("uploadType", [""])[0]
+                if upload_type == "resumable":
+                    session = uuid.uuid4().hex
+                    drive.sessions[session] = {"metadata": json.loads(body or b"{}"), "data": bytearray()}
+                    location = f"{self._base_url()}/upload/drive/v3/files?uploadType=resumable&upload_id={session}"
+                    return self._send(200, {}, {"Location": location})
+                if upload_type == "multipart":
+                    raw = f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode() + body
+                    parts = list(BytesParser(policy=HTTP).parsebytes(raw).iter_parts())
+                    metadata = json.loads(parts[0].get_payload(decode=True))
+                    content = parts[1].get_payload(decode=True)
+                    return self._send(200, drive.create(metadata, content, self._base_url()))
+            self._send(404, {"error": {"code": 404, "message": "Not found"}})
+
+        def do_PUT(self):
+            if self._flaky():
+                return
+            params = parse_qs(urlparse(self.path).query)
+            session = drive.sessions.get(params.get("upload_id", [""])[0])
+            if session is None:
+                return self._send(404, {"error": {"code": 404, "message": "Unknown upload"}})
+
+            body = self._body()
+            # Content-Range: bytes START-END/TOTAL, or bytes */TOTAL for a status check
+            m = re.match(r"bytes (\d+)-(\d+)/(\d+|\*)", self.headers.get("Content-Range", ""))
+            if m:
+                start = int(m.group(1))
+                if start == len(session["data"]):
+                    session["data"].extend(body)
+                total = m.group(3)
+            else:
+                total = self.headers.get("Content-Range", "").rsplit("/", 1)[-1]
+
+            received = len(session["data"])
+            if total != "*" and received >= int(total):
+                return self._send(200, drive.create(session["metadata"], bytes(session["data"]), self._base_url()))
+            headers = {"Range": f"bytes=0-{received - 1}"} if received else {}
+            self._send(308, None, headers)
+
+    return Handler
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Google Drive API server")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), make_handler(FakeDrive(args.fail_rate)))
+    print(f"Fake Drive listening on http://127.0.0.1:{args.port}/")
+    server.serve_forever()
+
+if __name__ == "__main__":
+    main()
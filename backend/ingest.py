@@ -0,0 +1,274 @@
+"""Batch ingestion of existing recordings (old backlogs, files from other tools).
+
+Files go through the same JobManager pipeline as live recordings: Whisper on
+the worker processes, then the intelligence report, search index and
+(optionally) Drive. Reports and sidecars are written next to each file.
+
+Jobs are submitted longest first, so the worker pool packs them like LPT
+scheduling: every free worker takes the longest file left and the workers
+finish close together. Job state lives in jobs.json, so after a crash the
+same command resumes unfinished files and skips the ones already done.
+
+Files of similar length are handed to the workers a few at a time
+(--batch-files), and each worker decodes their 30s windows together in
+batches (Transcriber.transcribe_batch).
+
+Usage: python ingest.py ~/old_meetings --workers 4
+       python ingest.py a.mp3 b.wav --model small --no-summary
+       python ingest.py ~/backlog --models tiny,base --latency-target 600
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import time
+import uuid
+from jobs import ACTIVE_STATES, JobManager
+from result_cache import ResultCache
+from search_index import SearchIndex, segments_path
+from transcriber import default_memory_limit_mb
+
+AUDIO_EXTENSIONS = (".wav", ".flac", ".mp3", ".m4a", ".ogg", ".opus", ".webm", ".mp4", ".aac", ".wma")
+
+def find_audio_files(paths):
+    """Audio files among `paths`, searching directories recursively."""
+    files = set()
+    for path in paths:
+        path = os.path.abspath(os.path.expanduser(path))
+        if os.path.isdir(path):
+            for root, _dirs, names in os.walk(path):
+                files.update(os.path.join(root, n) for n in names if n.lower().endswith(AUDIO_EXTENSIONS))
+        elif os.path.isfile(path):
+            files.add(path)
+        else:
+            print(f"Skipping {path}: not found")
+    return sorted(files)
+
+def audio_duration(path):
+    """Length in seconds from the file header, or None if it can't be read."""
+    try:
+        import soundfile as sf
+        return sf.info(path).duration
+    except Exception:
+        pass
+    # Formats libsndfile doesn't read (m4a, webm, ...)
+    if shutil.which("ffprobe"):
+        try:
+            out = subprocess.run(
+                ["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "csv=p=0", path],
+                capture_output=True, text=True, timeout=30,
+            )
+            return float(out.stdout.strip())
+        except (OSError, ValueError, subprocess.SubprocessError):
+            pass
+    return None
+
+def plan_workers(durations, workers):
+    """Longest-first assignment of durations to the least loaded worker -> per-worker totals.
+
+    This is what the pool does on its own when jobs are submitted longest
+    first; the plan is only used to report the expected balance.
+    """
+    loads = [0.0] * max(1, workers)
+    for duration in sorted(durations, reverse=True):
+        loads[loads.index(min(loads))] += duration
+    return loads
+
+class IngestBatch:
+    """One ingestion request: which files it covers and how far along they are."""
+
+    def __init__(self, jobs, paths):
+        self.jobs = jobs
+        self.paths = list(paths)
+        self.id = uuid.uuid4().hex[:8]
+        self.started_at = time.time()
+        # True until every file has been found, measured and queued
+        self.scanning = True
+        self.error = None
+        # Absolute path -> job id of every file this batch waits for
+        self.files = {}
+        self.skipped = []
+        self.worker_loads = []
+
+    def submit(self):
+        """Queues every file not done yet; returns the batch progress.
+
+        Probing the lengths can take a while (ffprobe for some formats), so
+        the server runs this on a background thread and polls progress().
+        """
+        try:
+            self._submit()
+        except Exception as e:
+            print(f"Ingest batch {self.id} failed: {e}")
+            self.error = str(e)
+        finally:
+            self.scanning = False
+        return self.progress()
+
+    def _submit(self):
+        latest = {}
+        for job in self.jobs.list_jobs():  # newest first
+            latest.setdefault(job["file"], job)
+
+        todo, queued = [], []
+        for path in find_audio_files(self.paths):
+            job = latest.get(path)
+            # The segments sidecar is written with the report, also by the server's own jobs
+            if (job and job["status"] == "done") or (not job and os.path.exists(segments_path(path))):
+                self.skipped.append(path)
+            elif job and job["status"] in ACTIVE_STATES:
+                # Already queued, e.g. resumed after a crash
+                self.files[path] = job["id"]
+                queued.append(job.get("audio_seconds") or 0)
+            else:
+                todo.append((audio_duration(path), path, job))
+
+        # Unknown lengths go last
+        todo.sort(key=lambda item: item[0] or 0, reverse=True)
+        new = []
+        for duration, path, job in todo:
+            if job:
+                # Failed before: run it again (cached stages are skipped)
+                job = self.jobs.retry(job["id"])
+                if job is not None:
+                    self.files[path] = job["id"]
+                    queued.append(duration or 0)
+            else:
+                new.append((path, duration))
+        # Still longest first; each worker task decodes jobs.batch_files of them together
+        size = max(1, self.jobs.batch_files)
+        batches = [sum(d or 0 for _, d in new[i:i + size]) for i in range(0, len(new), size)]
+        self.worker_loads = plan_workers(queued + batches, self.jobs.workers)
+        for job in self.jobs.submit_batch(new):
+            self.files[job["file"]] = job["id"]
+
+    def progress(self):
+        """Per-file state plus totals; rtf is wall time over audio finished so far."""
+        files = []
+        done = failed = 0
+        audio_done = transcribe_seconds = 0.0
+        # Copied: the scan may still be adding files
+        for path, job_id in list(self.files.items()):
+            job = self.jobs.get(job_id) or {}
+            status = job.get("status", "unknown")
+            entry = {"file": path, "job_id": job_id, "status": status, "message": job.get("message"),
+                     "audio_seconds": job.get("audio_seconds"), "rtf": None}
+            if job.get("transcribe_seconds") and job.get("audio_seconds"):
+                entry["rtf"] = job["transcribe_seconds"] / job["audio_seconds"]
+            if status == "done":
+                done += 1
+                audio_done += job.get("audio_seconds") or 0
+                transcribe_seconds += job.get("transcribe_seconds") or 0
+            elif status == "failed":
+                failed += 1
+            files.append(entry)
+
+        elapsed = time.time() - self.started_at if self.started_at else 0.0
+        return {
+            "id": self.id,
+            "scanning": self.scanning,
+            "error": self.error,
+            "total": len(files),
+            "done": done,
+            "failed": failed,
+            "pending": len(files) - done - failed,
+            "skipped": len(self.skipped),
+            "audio_seconds_done": audio_done,
+            "elapsed_seconds": elapsed,
+            # Across all workers: below 1/workers means the pool keeps every core busy
+            "rtf": elapsed / audio_done if audio_done else None,
+            # Per worker, transcription only (cached results excluded)
+            "transcribe_rtf": transcribe_seconds / audio_done if audio_done and transcribe_seconds else None,
+            "worker_loads_seconds": self.worker_loads,
+            "files": files,
+        }
+
+    def is_finished(self):
+        return not self.scanning and all((self.jobs.get(job_id) or {}).get("status") not in ACTIVE_STATES
+                                         for job_id in list(self.files.values()))
+
+def _format_seconds(seconds):
+    return "?" if seconds is None else f"{seconds / 60:.1f} min"
+
+def main():
+    parser = argparse.ArgumentParser(description="Transcribe and summarize existing recordings in bulk")
+    parser.add_argument("paths", nargs="+", help="Audio files and/or directories (searched recursively)")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2),
+                        help="Parallel transcription processes (default: half the cores)")
+    parser.add_argument("--model", default="base")
+    parser.add_argument("--models", help='Sizes to pick from per file by backlog, fastest first, e.g. "tiny,base"')
+    parser.add_argument("--latency-target", type=float, default=900,
+                        help="With --models: seconds within which each file should be transcribed")
+    parser.add_argument("--backend", default="whisper")
+    parser.add_argument("--batch-files", type=int, default=4,
+                        help="Recordings each worker decodes together in shared batches (1: one at a time)")
+    parser.add_argument("--no-vad", action="store_true")
+    parser.add_argument("--no-summary", action="store_true", help="Transcripts only, no intelligence report")
+    parser.add_argument("--upload", action="store_true", help="Upload reports to Drive")
+    parser.add_argument("--recordings", default="../recordings",
+                        help="Server recordings folder, for the search index and result cache")
+    args = parser.parse_args()
+
+    # Own job store, so a running server's jobs.json is never written by two processes
+    state_dir = os.path.join(args.recordings, "ingest")
+    os.makedirs(state_dir, exist_ok=True)
+    models = [m.strip() for m in (args.models or "").split(",") if m.strip()]
+    jobs = JobManager(state_dir, workers=args.workers,
+                      transcriber_options={"model_size": args.model, "backend": args.backend, "vad": not args.no_vad,
+                                           "memory_limit_mb": default_memory_limit_mb(args.model, models, args.backend)})
+    jobs.batch_files = args.batch_files
+    jobs.search_index = SearchIndex(os.path.join(args.recordings, "search.db"))
+    jobs.result_cache = ResultCache(os.path.join(args.recordings, ".cache"))
+    if models:
+        from model_policy import ModelPolicy
+        # No idle time to upgrade in; the server does that for its own jobs
+        jobs.model_policy = ModelPolicy(models, latency_target=args.latency_target, upgrade=False)
+    if not args.no_summary:
+        from intelligence import MeetingIntelligence
+        jobs.intelligence = MeetingIntelligence()
+    if args.upload:
+        from drive_sync import DriveManager
+        jobs.drive_manager = DriveManager()
+
+    # Unfinished jobs from an interrupted run first, longest first
+    jobs.resume()
+    batch = IngestBatch(jobs, args.paths)
+    progress = batch.submit()
+    if progress["error"]:
+        print(f"Some files could not be queued: {progress['error']}")
+    print(f"{progress['total']} files to process, {progress['skipped']} already done; "
+          f"planned worker loads: {', '.join(_format_seconds(s) for s in progress['worker_loads_seconds'])}")
+
+    reported = set()
+    try:
+        while True:
+            finished = batch.is_finished()
+            progress = batch.progress()
+            for entry in progress["files"]:
+                if entry["status"] in ACTIVE_STATES or entry["file"] in reported:
+                    continue
+                reported.add(entry["file"])
+                rtf = f"RTF {entry['rtf']:.2f}" if entry["rtf"] else "cached"
+                total_rtf = f"{progress['rtf']:.3f}" if progress["rtf"] else "-"
+                print(f"[{len(reported)}/{progress['total']}] {entry['status']}: {os.path.basename(entry['file'])} "
+                      f"({_format_seconds(entry['audio_seconds'])}, {rtf}) | aggregate RTF {total_rtf}")
+            if finished:
+                break
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print("Interrupted; run the same command again to resume.")
+    finally:
+        jobs.shutdown()
+        if jobs.intelligence:
+            jobs.intelligence.close()
+        jobs.search_index.close()
+
+    print(f"Done {progress['done']}, failed {progress['failed']}, skipped {progress['skipped']}: "
+          f"{_format_seconds(progress['audio_seconds_done'])} of audio in {progress['elapsed_seconds']:.0f}s"
+          + (f", aggregate RTF {progress['rtf']:.3f}" if progress["rtf"] else ""))
+    for entry in progress["files"]:
+        if entry["status"] == "failed":
+            print(f"  failed: {entry['file']}: {entry['message']}")
+
+if __name__ == "__main__":
+    main()
@@ -1,64 +1,283 @@
-from sumy.parsers.plaintext import PlaintextParser
-from sumy.nlp.tokenizers import Tokenizer
-from sumy.summarizers.lsa import LsaSummarizer
-from sumy.nlp.stemmers import Stemmer
-from sumy.utils import get_stop_words
-import nltk
+import multiprocessing
 import re
+import threading
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import metrics
+
+DEFAULT_ACTION_KEYWORDS = (
+    "will", "going to", "task", "follow up", "deadline",
+    "schedule", "remind", "action", "todo", "ensure", "make sure"
+)
+
+NLTK_PACKAGES = [("tokenizers/punkt", "punkt"), ("tokenizers/punkt_tab", "punkt_tab")]
+
+# Tokenizer/summarizer per language, built once and shared by every report.
+# They are read-only after construction, so concurrent jobs can use them
+# without locking; the lock only guards building them.
+SUMMARY_SECONDS = metrics.histogram("intelligence_summary_seconds", "Summary generation time", ("mode",))
+ACTIONS_SECONDS = metrics.histogram("intelligence_actions_seconds", "Action-item extraction time")
+
+_nlp_cache = {}
+_nlp_lock = threading.Lock()
+_nltk_checked = False
+
+def ensure_nltk_data(offline=False):
+    """Makes sure the punkt tokenizer data is installed (checked once per process).
+
+    In offline mode a missing package raises LookupError right away instead
+    of starting a download.
+    """
+    global _nltk_checked
+    if _nltk_checked:
+        return
+    # NLTK and sumy take over a second to import; only pay for it when needed
+    import nltk
+    with _nlp_lock:
+        if _nltk_checked:
+            return
+        for resource, package in NLTK_PACKAGES:
+            try:
+                nltk.data.find(resource)
+            except LookupError:
+                if offline:
+                    raise LookupError(
+                        f"NLTK data '{package}' is missing and offline mode is on. "
+                        f"Install it with: python -m nltk.downloader {package}"
+                    )
+                nltk.download(package)
+        _nltk_checked = True
+
+def get_nlp_resources(language):
+    """Returns the shared (tokenizer, summarizer) pair for a language."""
+    resources = _nlp_cache.get(language)
+    if resources is None:
+        with _nlp_lock:
+            resources = _nlp_cache.get(language)
+            if resources is None:
+                from sumy.nlp.stemmers import Stemmer
+                from sumy.nlp.tokenizers import Tokenizer
+                from sumy.summarizers.lsa import LsaSummarizer
+                from sumy.utils import get_stop_words
+                summarizer = LsaSummarizer(Stemmer(language))
+                summarizer.stop_words = get_stop_words(language)
+                resources = (Tokenizer(language), summarizer)
+                _nlp_cache[language] = resources
+    return resources
+
+class ActionItemMatcher:
+    """Finds action-item sentences in one pass with a compiled regex.
+
+    All keywords go into a single word-boundary alternation, so "will" no
+    longer matches inside "goodwill" and the text is scanned once instead of
+    once per keyword per sentence. After a hit the scan resumes at the end of
+    that sentence, so extra keywords in the same sentence cost nothing.
+    """
+
+    # Same rule as the old re.split(r'(?<=[.!?]) +'), without the slow lookbehind
+    SENTENCE_END = re.compile(r'[.!?] +')
+
+    def __init__(self, keywords=DEFAULT_ACTION_KEYWORDS):
+        # Longest first so "follow up" wins over any shorter overlapping keyword
+        phrases = sorted({k.strip().lower() for k in keywords if k.strip()}, key=len, reverse=True)
+        if not phrases:
+            # An empty alternation would match every sentence
+            self.pattern = re.compile(r"(?!)")
+            return
+        alternation = "|".join(r"\s+".join(map(re.escape, p.split())) for p in phrases)
+        # Case-insensitive on the original text: lowercasing can change the
+        # length of some Unicode text and shift match offsets
+        self.pattern = re.compile(rf"\b(?:{alternation})\b", re.IGNORECASE)
+
+    def find(self, text, segments=None):
+        """Returns [{"text", "start", "speaker"}] for every matching sentence.
+
+        With `segments`, text is rebuilt from them and each item carries the
+        timestamp and speaker of the segment its sentence starts in.
+        """
+        offsets = []
+        if segments:
+            parts, pos = [], 0
+            for segment in segments:
+                part = segment["text"].strip()
+                offsets.append(pos)
+                parts.append(part)
+                pos += len(part) + 1
+            text = " ".join(parts)
+
+        # Sentence i spans [starts[i], ends[i])
+        boundaries = [(m.start() + 1, m.end()) for m in self.SENTENCE_END.finditer(text)]
+        starts = [0] + [b[1] for b in boundaries]
+        ends = [b[0] for b in boundaries] + [len(text)]
+
+        items = []
+        search = self.pattern.search
+        match = search(text)
+        while match:
+            index = bisect_right(starts, match.start()) - 1
+            sentence = text[starts[index]:ends[index]].strip()
+            if 10 < len(sentence) < 200: # Filter noise
+                item = {"text": sentence, "start": None, "speaker": None}
+                if segments:
+                    segment = segments[bisect_right(offsets, starts[index]) - 1]
+                    item["start"] = float(segment["start"])
+                    item["speaker"] = segment.get("speaker")
+                items.append(item)
+            match = search(text, ends[index])
+        return items
+
+def summarize_text(text, language, sentence_count):
+    """Plain LSA summary of one piece of text -> list of sentences.
+
+    Module-level so it can run on the summary process pool.
+    """
+    from sumy.parsers.plaintext import PlaintextParser
+    tokenizer, summarizer = get_nlp_resources(language)
+    parser = PlaintextParser.from_string(text, tokenizer)
+    return [str(sentence) for sentence in summarizer(parser.document, sentence_count)]
 
 class MeetingIntelligence:
-    def __init__(self, language="english"):
+    """Summary and action items for a transcript.
+
+    summary_mode="lsa" runs one LSA over the whole transcript. Its SVD grows
+    much faster than the transcript, so "chunked" instead summarizes ~5 minute
+    chunks in parallel on a process pool and then summarizes those summaries,
+    which keeps latency roughly linear in meeting length. "auto" picks
+    chunked above `chunk_threshold_words`.
+    """
+
+    def __init__(self, language="english", offline=False, summary_mode="auto",
+                 chunk_threshold_words=5000, chunk_seconds=300, chunk_sentences=150, summary_workers=None,
+                 action_keywords=DEFAULT_ACTION_KEYWORDS):
         self.language = language
-        # Ensure NLTK data is available
+        self.action_keywords = tuple(action_keywords)
+        self.action_matcher = ActionItemMatcher(action_keywords)
+        self.summary_mode = summary_mode
+        self.chunk_threshold_words = chunk_threshold_words
+        self.chunk_seconds = chunk_seconds
+        self.chunk_sentences = chunk_sentences
+        self.summary_workers = summary_workers
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        # Ensure NLTK data is available, then build the shared NLP objects
+        ensure_nltk_data(offline)
+        get_nlp_resources(language)
+
+    def settings(self):
+        """Everything that changes the report, for caching (worker count doesn't)."""
+        return {
+            "language": self.language,
+            "summary_mode": self.summary_mode,
+            "chunk_threshold_words": self.chunk_threshold_words,
+            "chunk_seconds": self.chunk_seconds,
+            "chunk_sentences": self.chunk_sentences,
+            "action_keywords": sorted(self.action_keywords),
+        }
+
+    def _get_pool(self):
+        with self._pool_lock:
+            if self._pool is None:
+                # Spawned, never forked: a fork of the multi-threaded server can inherit held locks
+                self._pool = ProcessPoolExecutor(max_workers=self.summary_workers,
+                                                 mp_context=multiprocessing.get_context("spawn"))
+            return self._pool
+
+    def _drop_pool(self, pool):
+        # A dead worker breaks the pool for good; the next _get_pool starts a new one
+        with self._pool_lock:
+            if self._pool is pool:
+                self._pool = None
+        pool.shutdown(wait=False)
+
+    def _summarize_chunks(self, chunks, per_chunk):
+        pool = self._get_pool()
         try:
-            nltk.data.find('tokenizers/punkt')
-        except LookupError:
-            nltk.download('punkt')
-            
+            futures = [pool.submit(summarize_text, chunk, self.language, per_chunk) for chunk in chunks]
+            return [f.result() for f in futures]
+        except BrokenProcessPool:
+            self._drop_pool(pool)
+            raise
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def _split_chunks(self, text, segments=None):
+        """Splits by time when segment timestamps exist, else by sentence count."""
+        if segments:
+            chunks, current, chunk_end = [], [], 0.0
+            for segment in segments:
+                start = float(segment["start"])
+                if start >= chunk_end and current:
+                    chunks.append(" ".join(current))
+                    current = []
+                current.append(segment["text"].strip())
+                # End of the time slot of the latest segment (a chunk may start past the first slot)
+                chunk_end = (start // self.chunk_seconds + 1) * self.chunk_seconds
+            if current:
+                chunks.append(" ".join(current))
+            return chunks
+
+        tokenizer, _ = get_nlp_resources(self.language)
+        sentences = tokenizer.to_sentences(text)
+        return [" ".join(sentences[i:i + self.chunk_sentences])
+                for i in range(0, len(sentences), self.chunk_sentences)]
+
+    def _chunked_summary(self, text, sentence_count, segments=None):
+        chunks = self._split_chunks(text, segments)
+        per_chunk = max(2, sentence_count // 2)
+        print(f"Summarizing {len(chunks)} chunks in parallel...")
         try:
-            nltk.data.find('tokenizers/punkt_tab')
-        except LookupError:
-             nltk.download('punkt_tab')
+            try:
+                chunk_summaries = self._summarize_chunks(chunks, per_chunk)
+            except BrokenProcessPool:
+                print("A summary worker died; retrying on a new pool")
+                chunk_summaries = self._summarize_chunks(chunks, per_chunk)
+        except Exception as e:
+            print(f"Summary pool failed ({e}), summarizing chunks in-process")
+            chunk_summaries = [summarize_text(chunk, self.language, per_chunk) for chunk in chunks]
 
-    def generate_summary(self, text, sentence_count=5):
+        # Reduce: the chunk summaries are small, so one LSA over them is cheap
+        combined = " ".join(" ".join(sentences) for sentences in chunk_summaries)
+        return summarize_text(combined, self.language, sentence_count)
+
+    def generate_summary(self, text, sentence_count=5, segments=None):
         if not text or len(text.split()) < 50:
             return "Transcript too short to summarize."
 
-        parser = PlaintextParser.from_string(text, Tokenizer(self.language))
-        stemmer = Stemmer(self.language)
-        summarizer = LsaSummarizer(stemmer)
-        summarizer.stop_words = get_stop_words(self.language)
+        mode = self.summary_mode
+        if mode == "auto":
+            mode = "chunked" if len(text.split()) > self.chunk_threshold_words else "lsa"
 
-        summary_sentences = summarizer(parser.document, sentence_count)
-        summary = " ".join([str(sentence) for sentence in summary_sentences])
+        with SUMMARY_SECONDS.time(mode=mode):
+            if mode == "chunked":
+                summary_sentences = self._chunked_summary(text, sentence_count, segments)
+            else:
+                summary_sentences = summarize_text(text, self.language, sentence_count)
+        summary = " ".join(summary_sentences)
         return summary
 
-    def extract_action_items(self, text):
-        action_keywords = [
-            "will", "going to", "task", "follow up", "deadline", 
-            "schedule", "remind", "action", "todo", "ensure", "make sure"
-        ]
-        
-        # Split into sentences (simple split to avoid complex dep)
-        sentences = re.split(r'(?<=[.!?]) +', text)
+    def extract_action_items(self, text, segments=None):
         action_items = []
-        
-        for sentence in sentences:
-            sentence_lower = sentence.lower()
-            if any(keyword in sentence_lower for keyword in action_keywords):
-                # Clean up and add
-                clean_sentence = sentence.strip()
-                if 10 < len(clean_sentence) < 200: # Filter noise
-                    action_items.append(f"- {clean_sentence}")
-                    
+        with ACTIONS_SECONDS.time():
+            items = self.action_matcher.find(text, segments)
+        for item in items:
+            if item["start"] is None:
+                action_items.append(f"- {item['text']}")
+            else:
+                speaker = f" {item['speaker']}:" if item["speaker"] else ""
+                action_items.append(f"- [{int(item['start'])}s]{speaker} {item['text']}")
+
         if not action_items:
             return "No explicit action items detected."
             
         return "\n".join(action_items)
 
-    def generate_report(self, transcript_text, formatted_text):
-        summary = self.generate_summary(transcript_text)
-        actions = self.extract_action_items(transcript_text)
+    def generate_report(self, transcript_text, formatted_text, segments=None):
+        summary = self.generate_summary(transcript_text, segments=segments)
+        actions = self.extract_action_items(transcript_text, segments)
         
         report = f"""# Meeting Intelligence Report
 
@@ -0,0 +1,733 @@
+import json
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import metrics
+from audio_utils import WHISPER_SAMPLE_RATE
+from diarization import energy_path, label_segments, load_energy, save_energy
+from result_cache import file_digest, text_digest
+from search_index import save_segments, segments_path
+
+ACTIVE_STATES = ("queued", "transcribing", "summarizing", "uploading")
+
+# prepare: energy sidecar + finishing the live stream; transcribe: includes waiting for a worker
+STAGE_SECONDS = metrics.histogram("job_stage_seconds", "Time spent per pipeline stage", ("stage",))
+JOBS_FINISHED = metrics.counter("jobs_finished_total", "Jobs that reached a final state", ("status",))
+BACKLOG_SECONDS = metrics.gauge("transcribe_backlog_audio_seconds", "Audio queued for or in transcription")
+
+# --- Transcription worker processes ---
+# Each worker loads its own Whisper model once, so transcription runs outside
+# the server process and never holds the server's GIL.
+_worker_transcriber = None
+
+def _init_worker(transcriber_options, threads):
+    global _worker_transcriber
+    from transcriber import Transcriber
+    options = dict(transcriber_options)
+    # Split the cores between workers instead of every process grabbing all of them
+    options["threads"] = options.get("threads") or threads
+    _worker_transcriber = Transcriber(**options)
+
+def _transcribe_in_worker(source, model_size=None):
+    # Stats travel back separately: the worker's own metrics stay in its process
+    return _worker_transcriber.transcribe(source, model_size, with_stats=True)
+
+def _transcribe_batch_in_worker(sources, model_size=None):
+    return _worker_transcriber.transcribe_batch(sources, model_size=model_size, with_stats=True)
+
+def _worker_ready():
+    # No-op task: returns once the worker's initializer has loaded the model
+    return _worker_transcriber is not None
+
+
+class JobManager:
+    """Per-recording processing jobs with a persistent queue.
+
+    Transcription runs on a process pool and the intelligence report on a
+    separate thread, so it overlaps with the next job's transcription. Drive
+    uploads go through the DriveManager's background queue and never hold up
+    the pipeline. Job state is saved to jobs.json next to the recordings and
+    unfinished jobs are picked up again on restart.
+
+    With a `model_policy` (model_policy.py) each job's Whisper model size is
+    picked from the backlog, and jobs that got a smaller model are
+    re-transcribed with the best one once the server has been idle for
+    `upgrade_idle_seconds`. The job stays "done" during the upgrade, and its
+    report, sidecars and index entry are replaced when the upgrade finishes.
+    """
+
+    def __init__(self, output_dir, workers=2, transcriber_options=None):
+        self.output_dir = output_dir
+        self.store_path = os.path.join(output_dir, "jobs.json")
+        self.workers = workers
+        self.transcriber_options = transcriber_options or {}
+        self.intelligence = None
+        # Cleared while the intelligence is still loading; reports wait for it
+        # instead of going out without a summary
+        self.intelligence_ready = threading.Event()
+        self.intelligence_ready.set()
+        self.drive_manager = None
+        self.search_index = None
+        # ResultCache for transcripts and reports (optional)
+        self.result_cache = None
+        # Also upload the recording itself, not just the report
+        self.upload_audio = False
+        # Called with a copy of the job after every state change
+        self.on_update = None
+        # ModelPolicy choosing the model size per job (optional; default: transcriber_options["model_size"])
+        self.model_policy = None
+        # Extra condition for idle-time upgrades, e.g. no recording in progress
+        self.idle_check = None
+        self.upgrade_idle_seconds = 60.0
+        # Recordings per worker task in submit_batch(), decoded together (Transcriber.transcribe_batch)
+        self.batch_files = 1
+
+        self.jobs = {}
+        self._lock = threading.Lock()
+        # Jobs handed to the process pool, in FIFO order; the first `workers` are running
+        self._inflight = []
+        # Audio length of each in-flight job (None if unknown), for the backlog estimate
+        self._inflight_audio = {}
+        # In-flight batch ids (one entry per worker task) -> the jobs they transcribe
+        self._batches = {}
+        self._transcribe_started = {}
+        self._upgrading = None
+        self._busy_at = time.monotonic()
+        self._closing = threading.Event()
+        # jobs.json is written by a background thread at most every save_interval seconds
+        self.save_interval = 0.5
+        self._dirty = threading.Event()
+        self._write_lock = threading.Lock()
+        # Threads still writing a job's archive WAV (not persisted)
+        self._archive_writers = {}
+        self._load()
+
+        self._pool_lock = threading.Lock()
+        self._transcribe_pool = self._new_transcribe_pool()
+        # Finishing a live stream (server's own model) and pulling audio out of
+        # the recorder happen in the server process, one job at a time
+        self._prepare_pool = ThreadPoolExecutor(max_workers=1)
+        # Saved files (ingest, resume, retry) are hashed for the result cache on their
+        # own thread, so a backlog never holds up a live recording's hand-over
+        self._file_prepare_pool = ThreadPoolExecutor(max_workers=1)
+        self._post_pool = ThreadPoolExecutor(max_workers=1)
+        threading.Thread(target=self._upgrade_loop, name="model-upgrades", daemon=True).start()
+        threading.Thread(target=self._save_loop, name="job-store", daemon=True).start()
+
+    # --- Worker pool ---
+    def _new_transcribe_pool(self):
+        threads = max(1, (os.cpu_count() or 1) // self.workers)
+        # Spawned, never forked: the server has recording/streaming threads and
+        # torch's thread pool running, and a fork can copy their held locks
+        return ProcessPoolExecutor(
+            max_workers=self.workers, initializer=_init_worker, initargs=(self.transcriber_options, threads),
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+
+    def _replace_pool(self, broken):
+        """A worker that died (e.g. killed loading a model) breaks the pool for good: start a new one."""
+        with self._pool_lock:
+            if self._transcribe_pool is broken and not self._closing.is_set():
+                print("A transcription worker died; starting a new worker pool")
+                broken.shutdown(wait=False)
+                self._transcribe_pool = self._new_transcribe_pool()
+            return self._transcribe_pool
+
+    def _submit_to_workers(self, fn, *args):
+        pool = self._transcribe_pool
+        try:
+            future = pool.submit(fn, *args)
+        except BrokenProcessPool:
+            pool = self._replace_pool(pool)
+            future = pool.submit(fn, *args)
+        # Added first, so the pool is replaced before the job's own callback runs
+        future.add_done_callback(lambda f: self._check_pool(pool, f))
+        return future
+
+    def _check_pool(self, pool, future):
+        if not future.cancelled() and isinstance(future.exception(), BrokenProcessPool):
+            self._replace_pool(pool)
+
+    def _submit_failed(self, claim, job_ids, error):
+        """Undoes the worker claim of a task that couldn't be submitted."""
+        self._release_worker(claim)
+        for job_id in job_ids:
+            if self._closing.is_set():
+                continue  # Still queued in jobs.json; resumed on the next start
+            print(f"Error processing {job_id}: {error}")
+            self._update(job_id, status="failed", message=f"Error: {error}")
+
+    # --- Persistence ---
+    def _load(self):
+        if not os.path.exists(self.store_path):
+            return
+        try:
+            with open(self.store_path, "r", encoding="utf-8") as f:
+                for job in json.load(f):
+                    if job.get("upgrade") == "running":
+                        # Interrupted: the old result is still in place
+                        job["upgrade"] = "pending"
+                    self.jobs[job["id"]] = job
+        except Exception as e:
+            print(f"Could not read job store: {e}")
+
+    def _save(self):
+        # Call with the lock held. Only marks the store dirty: rewriting it on
+        # every update would hold the lock for a full dump of every job
+        self._dirty.set()
+
+    def _save_loop(self):
+        while not self._closing.is_set():
+            self._dirty.wait()
+            # Collects the burst of updates a job makes as it moves through the stages
+            self._closing.wait(self.save_interval)
+            self._flush()
+
+    def _flush(self):
+        """Writes jobs.json if anything changed; only the snapshot is taken under the lock."""
+        with self._write_lock:
+            with self._lock:
+                if not self._dirty.is_set():
+                    return
+                self._dirty.clear()
+                jobs = [dict(job) for job in self.jobs.values()]
+            tmp_path = self.store_path + ".tmp"
+            try:
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(jobs, f, separators=(",", ":"))
+                os.replace(tmp_path, self.store_path)
+            except OSError as e:
+                print(f"Could not write job store: {e}")
+                self._dirty.set()
+
+    def _update(self, job_id, **fields):
+        with self._lock:
+            job = self.jobs[job_id]
+            if fields.get("status") in ("done", "failed") and job["status"] != fields["status"]:
+                JOBS_FINISHED.inc(status=fields["status"])
+            job.update(fields)
+            job["updated_at"] = time.time()
+            self._save()
+            job = dict(job)
+        if self.on_update:
+            self.on_update(job)
+        return job
+
+    # --- Public API ---
+    def submit(self, file_path, streamer=None, audio_loader=None, energy_loader=None, archive_writer=None,
+               audio_seconds=None, release_audio=None):
+        """Queues a recording.
+
+        `streamer` is the live StreamingTranscriber of the recording, and
+        `audio_loader` returns its 16kHz audio in memory; without either the
+        worker decodes `file_path` itself. `energy_loader` returns per-channel
+        energy for Local/Remote speaker labels (saved as a sidecar file).
+        `archive_writer` is the thread still writing `file_path`; audio
+        uploads wait for it. `audio_seconds` (the recording's length, if
+        known) orders resumed jobs. `release_audio` is called once the
+        loaders and the streamer are done with the in-memory recording.
+        """
+        job = self._create_job(file_path, audio_seconds, archive_writer)
+        live = streamer is not None or audio_loader is not None
+        pool = self._prepare_pool if live else self._file_prepare_pool
+        pool.submit(self._prepare, job["id"], streamer, audio_loader, energy_loader, release_audio)
+        return job
+
+    def submit_batch(self, files):
+        """Queues saved recordings, `batch_files` of them per worker task.
+
+        `files` is a list of (file_path, audio_seconds). Each task decodes
+        the windows of all its recordings in shared batches, which keeps a
+        worker's cores busier than one recording at a time; recordings of
+        similar length (e.g. sorted longest first) batch best. Returns the jobs.
+        """
+        jobs = [self._create_job(path, audio_seconds) for path, audio_seconds in files]
+        size = max(1, self.batch_files)
+        for first in range(0, len(jobs), size):
+            self._file_prepare_pool.submit(self._prepare_batch, [job["id"] for job in jobs[first:first + size]])
+        return jobs
+
+    def _create_job(self, file_path, audio_seconds=None, archive_writer=None):
+        job_id = uuid.uuid4().hex[:12]
+        now = time.time()
+        job = {
+            "id": job_id,
+            "file": file_path,
+            "status": "queued",
+            "message": "Queued for transcription",
+            "created_at": now,
+            "updated_at": now,
+            "report_path": None,
+            "drive_link": None,
+            "audio_link": None,
+            "audio_seconds": audio_seconds,
+        }
+        with self._lock:
+            self.jobs[job_id] = job
+            if archive_writer:
+                self._archive_writers[job_id] = archive_writer
+            self._save()
+        return dict(job)
+
+    def resume(self):
+        """Re-queues jobs that were still pending when the server stopped.
+
+        Longest recordings go first, so the workers finish close together
+        instead of one long file running on after the rest are done.
+        """
+        with self._lock:
+            pending = [j for j in self.jobs.values() if j["status"] in ACTIVE_STATES]
+        pending.sort(key=lambda j: j.get("audio_seconds") or 0, reverse=True)
+        for job_id in (j["id"] for j in pending):
+            print(f"Resuming job {job_id}")
+            self._file_prepare_pool.submit(self._prepare, job_id, None, None, None)
+
+    def retry(self, job_id):
+        """Runs a finished or failed job again from its saved recording.
+
+        Cached stages (see ResultCache) are skipped, so a failed upload or a
+        report with new summary settings doesn't mean another Whisper pass.
+        """
+        job = self.get(job_id)
+        if job is None or job["status"] in ACTIVE_STATES or job_id == self._upgrading:
+            return None
+        job = self._update(job_id, status="queued", message="Queued for reprocessing", drive_link=None)
+        self._file_prepare_pool.submit(self._prepare, job_id, None, None, None)
+        return job
+
+    def warm_up(self):
+        """Starts every transcription worker now so their models load before the first job.
+
+        Returns one future per worker, done when that worker is ready.
+        """
+        return [self._submit_to_workers(_worker_ready) for _ in range(self.workers)]
+
+    def get(self, job_id):
+        with self._lock:
+            job = self.jobs.get(job_id)
+            return dict(job) if job else None
+
+    def list_jobs(self):
+        with self._lock:
+            return sorted((dict(j) for j in self.jobs.values()), key=lambda j: j["created_at"], reverse=True)
+
+    def latest(self):
+        jobs = self.list_jobs()
+        return jobs[0] if jobs else None
+
+    def is_busy(self):
+        return any(j["status"] in ACTIVE_STATES for j in self.list_jobs())
+
+    def shutdown(self):
+        self._closing.set()
+        self._flush()
+        self._prepare_pool.shutdown(wait=False)
+        self._file_prepare_pool.shutdown(wait=False)
+        with self._pool_lock:
+            self._transcribe_pool.shutdown(wait=False, cancel_futures=True)
+        self._post_pool.shutdown(wait=False)
+
+    # --- Pipeline stages ---
+    def _prepare(self, job_id, streamer, audio_loader, energy_loader, release_audio=None):
+        try:
+            with STAGE_SECONDS.time(stage="prepare"):
+                audio = self._prepare_audio(job_id, streamer, audio_loader, energy_loader)
+        finally:
+            if release_audio:
+                release_audio()
+        if audio is not False:
+            self._start_transcription(job_id, audio)
+
+    def _prepare_batch(self, job_ids):
+        with STAGE_SECONDS.time(stage="prepare"):
+            # Recordings transcribed before come from the cache; the rest go to one worker
+            todo = [job_id for job_id in job_ids if self._prepare_audio(job_id, None, None, None) is not False]
+        if len(todo) == 1:
+            self._start_transcription(todo[0])
+        elif todo:
+            self._start_batch(todo)
+
+    def _prepare_audio(self, job_id, streamer, audio_loader, energy_loader):
+        """Audio for the worker (None: it reads the file), or False if no pass is needed."""
+        audio = None
+        try:
+            if not streamer and not audio_loader:
+                # Working from the saved file (resume/retry): it may have been transcribed before
+                cached = self._cached_transcript(job_id)
+                if cached is not None:
+                    self._post_pool.submit(self._post_process, job_id, cached, True)
+                    return False
+            if energy_loader:
+                save_energy(energy_path(self.get(job_id)["file"]), energy_loader())
+            if streamer:
+                self._update(job_id, status="transcribing", message="Transcribing the final stretch...")
+                result = streamer.finish()
+                if result is not None:
+                    self._update(job_id, **self._model_fields(streamer.transcriber.model_size))
+                    self._post_pool.submit(self._post_process, job_id, result)
+                    return False
+                # Streaming failed: fall back to a full pass
+            if audio_loader:
+                audio = audio_loader()
+        except Exception as e:
+            print(f"Error preparing {job_id}: {e}")
+        return audio
+
+    def _backlog_seconds(self):
+        """Queued and running audio, with unknown lengths estimated. Call with the lock held."""
+        default = self.model_policy.default_audio_seconds if self.model_policy else 0
+        return sum(default if seconds is None else seconds for seconds in self._inflight_audio.values())
+
+    def _model_fields(self, model_size):
+        """Job fields for a result from `model_size`: upgrade pending if the policy has a better model."""
+        policy = self.model_policy
+        return {"model": model_size, "upgrade": "pending" if policy and policy.upgradable(model_size) else None}
+
+    def _claim_worker(self, job_id, audio_seconds):
+        """Adds a job to the in-flight list -> (running now, backlog seconds ahead of it)."""
+        with self._lock:
+            backlog = self._backlog_seconds()
+            self._inflight.append(job_id)
+            self._inflight_audio[job_id] = audio_seconds
+            self._transcribe_started[job_id] = time.perf_counter()
+            BACKLOG_SECONDS.set(self._backlog_seconds())
+            return len(self._inflight) <= self.workers, backlog
+
+    def _release_worker(self, job_id):
+        with self._lock:
+            self._inflight.remove(job_id)
+            self._inflight_audio.pop(job_id, None)
+            self._batches.pop(job_id, None)
+            BACKLOG_SECONDS.set(self._backlog_seconds())
+            STAGE_SECONDS.observe(time.perf_counter() - self._transcribe_started.pop(job_id), stage="transcribe")
+            promoted = self._inflight[self.workers - 1] if len(self._inflight) >= self.workers else None
+            batch = self._batches.get(promoted)
+        if batch:
+            for batch_job in batch:
+                self._update(batch_job, status="transcribing", message=f"Transcribing (batch of {len(batch)})...")
+        elif promoted and promoted != self._upgrading:
+            self._update(promoted, status="transcribing", message="Transcribing...")
+
+    def _start_transcription(self, job_id, audio=None):
+        job = self.get(job_id)
+        audio_seconds = len(audio) / WHISPER_SAMPLE_RATE if audio is not None else job.get("audio_seconds")
+        running, backlog = self._claim_worker(job_id, audio_seconds)
+        model_size = None
+        if self.model_policy:
+            # Under a backlog a smaller model keeps the wait within the latency target
+            model_size = self.model_policy.choose(audio_seconds, backlog, self.workers)
+        if running:
+            self._update(job_id, status="transcribing", message="Transcribing...", model=model_size)
+        else:
+            self._update(job_id, status="queued", message="Waiting for a free transcription worker",
+                         model=model_size)
+        source = audio if audio is not None else job["file"]
+        try:
+            future = self._submit_to_workers(_transcribe_in_worker, source, model_size)
+        except Exception as e:
+            self._submit_failed(job_id, [job_id], e)
+            return
+        future.add_done_callback(lambda f: self._after_transcription(job_id, f))
+
+    def _start_batch(self, job_ids):
+        jobs = [self.get(job_id) for job_id in job_ids]
+        default = self.model_policy.default_audio_seconds if self.model_policy else 0
+        audio_seconds = sum(job.get("audio_seconds") or default for job in jobs)
+        # The batch occupies one worker and finishes as a whole: one in-flight entry for all of it
+        batch_id = "batch-" + uuid.uuid4().hex[:12]
+        with self._lock:
+            self._batches[batch_id] = list(job_ids)
+        running, backlog = self._claim_worker(batch_id, audio_seconds)
+        model_size = None
+        if self.model_policy:
+            model_size = self.model_policy.choose(audio_seconds, backlog, self.workers)
+        for job_id in job_ids:
+            if running:
+                self._update(job_id, status="transcribing", message=f"Transcribing (batch of {len(jobs)})...",
+                             model=model_size)
+            else:
+                self._update(job_id, status="queued", message="Waiting for a free transcription worker",
+                             model=model_size)
+        try:
+            future = self._submit_to_workers(_transcribe_batch_in_worker, [job["file"] for job in jobs], model_size)
+        except Exception as e:
+            self._submit_failed(batch_id, job_ids, e)
+            return
+        future.add_done_callback(lambda f: self._after_batch(batch_id, job_ids, f))
+
+    def _after_transcription(self, job_id, future):
+        self._release_worker(job_id)
+
+        try:
+            result, stats = future.result()
+        except Exception as e:
+            print(f"Error processing {job_id}: {e}")
+            self._update(job_id, status="failed", message=f"Error: {str(e)}")
+            return
+        self._transcribed(job_id, result, stats)
+
+    def _after_batch(self, batch_id, job_ids, future):
+        self._release_worker(batch_id)
+
+        try:
+            outcomes = future.result()
+        except Exception as e:
+            print(f"Error processing batch {', '.join(job_ids)}: {e}")
+            for job_id in job_ids:
+                self._update(job_id, status="failed", message=f"Error: {str(e)}")
+            return
+        for job_id, (result, stats) in zip(job_ids, outcomes):
+            self._transcribed(job_id, result, stats)
+
+    def _transcribed(self, job_id, result, stats):
+        if "error" in result:
+            self._update(job_id, status="failed", message=f"Transcription failed: {result['error']}")
+            return
+        self._record_stats(stats)
+        if stats:
+            self._update(job_id, audio_seconds=stats["audio_seconds"], transcribe_seconds=stats["elapsed"],
+                         **self._model_fields(stats["model"]))
+        self._post_pool.submit(self._post_process, job_id, result)
+
+    def _record_stats(self, stats):
+        if stats:
+            # The worker's own metrics stay in its process; record them here
+            from transcriber import record_stats
+            record_stats(stats)
+            if self.model_policy:
+                self.model_policy.observe(stats["model"], stats["audio_seconds"], stats["elapsed"])
+
+    # --- Idle-time model upgrades ---
+    def _upgrade_loop(self, interval=5.0):
+        while not self._closing.wait(interval):
+            try:
+                self._maybe_upgrade()
+            except Exception as e:
+                print(f"Model upgrade check failed: {e}")
+
+    def _maybe_upgrade(self):
+        policy = self.model_policy
+        if not policy or not policy.upgrade or self._upgrading:
+            return
+        if self.is_busy() or (self.idle_check and not self.idle_check()):
+            self._busy_at = time.monotonic()
+            return
+        if time.monotonic() - self._busy_at < self.upgrade_idle_seconds:
+            return
+        # Newest meetings first: they are the ones being read
+        for job in self.list_jobs():
+            if job["status"] == "done" and job.get("upgrade") == "pending" and os.path.exists(job["file"]):
+                self._start_upgrade(job["id"], policy.best)
+                return
+
+    def _start_upgrade(self, job_id, model_size):
+        job = self.get(job_id)
+        self._upgrading = job_id
+        self._update(job_id, upgrade="running")
+        print(f"Upgrading the transcript of {job_id} to the {model_size} model")
+        try:
+            cached = self._cached_transcript(job_id, model_size)
+        except Exception as e:
+            print(f"Upgrade of {job_id} failed: {e}")
+            self._update(job_id, upgrade="failed")
+            self._upgrading = None
+            return
+        if cached is not None:
+            self._post_pool.submit(self._post_process, job_id, cached, True, model_size)
+            return
+        self._claim_worker(job_id, job.get("audio_seconds"))
+        try:
+            future = self._submit_to_workers(_transcribe_in_worker, job["file"], model_size)
+        except Exception as e:
+            self._release_worker(job_id)
+            print(f"Upgrade of {job_id} failed: {e}")
+            self._update(job_id, upgrade="failed")
+            self._upgrading = None
+            return
+        future.add_done_callback(lambda f: self._after_upgrade(job_id, model_size, f))
+
+    def _after_upgrade(self, job_id, model_size, future):
+        self._release_worker(job_id)
+        try:
+            result, stats = future.result()
+        except Exception as e:
+            result, stats = {"error": str(e)}, None
+        self._record_stats(stats)
+        if stats and stats["model"] != model_size:
+            # The worker couldn't fit the model under its memory limit
+            result = {"error": f"{model_size} model not loaded"}
+        if "error" in result:
+            print(f"Upgrade of {job_id} failed: {result['error']}")
+            self._update(job_id, upgrade="failed")
+            self._upgrading = None
+            return
+        self._post_pool.submit(self._post_process, job_id, result, False, model_size)
+
+    def _post_process(self, job_id, result, from_cache=False, upgrade_model=None):
+        """Report, sidecars, index and upload for a transcript.
+
+        With `upgrade_model` the result replaces a finished job's transcript:
+        the job stays "done" and only the stored outputs change.
+        """
+        file_path = self.get(job_id)["file"]
+        report_start = time.perf_counter()
+
+        def progress(**fields):
+            if upgrade_model:
+                fields.pop("status", None)
+                fields.pop("message", None)
+            if fields:
+                self._update(job_id, **fields)
+
+        try:
+            if not from_cache:
+                self._store_transcript(job_id, result, upgrade_model)
+
+            energy = load_energy(energy_path(file_path))
+            if energy is not None:
+                from transcriber import Transcriber
+                segments = label_segments(result["segments"], energy)
+                result = dict(result, segments=segments, formatted_text=Transcriber.format_segments(segments))
+
+            if not self.intelligence_ready.is_set():
+                progress(status="summarizing", message="Waiting for the summarizer to load...")
+                self.intelligence_ready.wait()
+
+            # Generate Intelligent Report
+            if self.intelligence:
+                progress(status="summarizing", message="Generating Intelligence Report...")
+                full_report = self._generate_report(result)
+            else:
+                full_report = result["formatted_text"]
+
+            # Save to local file
+            txt_path = os.path.splitext(file_path)[0] + ".txt"
+            with open(txt_path, "w", encoding="utf-8") as f:
+                f.write(full_report)
+            progress(report_path=txt_path, message="Transcription & Intelligence Complete. Ready to Sync.")
+
+            # Keep the exact segments for reindexing, and make the meeting searchable
+            save_segments(segments_path(file_path), result["segments"])
+            if self.search_index:
+                try:
+                    self.search_index.index_meeting(file_path, result["segments"], report_path=txt_path)
+                except Exception as e:
+                    print(f"Search indexing failed for {job_id}: {e}")
+            STAGE_SECONDS.observe(time.perf_counter() - report_start, stage="report")
+
+            if upgrade_model:
+                self._finish_upgrade(job_id, upgrade_model, txt_path)
+                return
+
+            # Sync to Drive in the background; the job finishes when the report is up
+            if self.drive_manager:
+                self._update(job_id, status="uploading", message="Uploading to Drive...")
+                self.drive_manager.enqueue(txt_path, callback=lambda res: self._report_uploaded(job_id, res))
+                if self.upload_audio:
+                    self._enqueue_audio(job_id, file_path)
+            else:
+                self._update(job_id, status="done", message="Transcribed (Local Only - No Drive Credentials)")
+
+        except Exception as e:
+            print(f"Error processing {job_id}: {e}")
+            if upgrade_model:
+                self._update(job_id, upgrade="failed")
+                self._upgrading = None
+            else:
+                self._update(job_id, status="failed", message=f"Error: {str(e)}")
+
+    def _finish_upgrade(self, job_id, model_size, txt_path):
+        self._update(job_id, model=model_size, upgrade="done",
+                     message=f"Transcript upgraded to the {model_size} model")
+        self._upgrading = None
+        if self.drive_manager:
+            # Drive keeps the earlier report next to the new one (same name, different content)
+            self.drive_manager.enqueue(
+                txt_path, callback=lambda res: "link" in res and self._update(job_id, drive_link=res["link"])
+            )
+
+    def _report_uploaded(self, job_id, res):
+        if "link" in res:
+            self._update(job_id, status="done", drive_link=res["link"],
+                         message=f"Done! Saved to Drive: {res['link']}")
+        else:
+            self._update(job_id, status="done",
+                         message=f"Transcribed, but Drive Upload failed: {res.get('error')}")
+
+    def _wait_for_archive(self, job_id):
+        with self._lock:
+            writer = self._archive_writers.pop(job_id, None)
+        if writer:
+            writer.join()
+
+    def _enqueue_audio(self, job_id, file_path):
+        self._wait_for_archive(job_id)
+        # The archive only appears under its final name once fully written
+        if not os.path.exists(file_path):
+            print(f"Skipping audio upload for {job_id}: {file_path} was not saved")
+            return
+        self.drive_manager.enqueue(
+            file_path, callback=lambda res: self._update(job_id, audio_link=res.get("link"))
+        )
+
+    # --- Result cache ---
+    def _transcript_key(self, job_id, model_size=None):
+        job = self.get(job_id)
+        if not self.result_cache or not os.path.exists(job["file"]):
+            return None
+        digest = job.get("audio_sha256")
+        if not digest:
+            digest = file_digest(job["file"])
+            self._update(job_id, audio_sha256=digest)
+        # The thread count and memory limit change speed, not output
+        params = {k: v for k, v in self.transcriber_options.items() if k not in ("threads", "memory_limit_mb")}
+        model_size = model_size or job.get("model")
+        if model_size:
+            params["model_size"] = model_size
+        return self.result_cache.key("transcript", digest, params)
+
+    def _cached_transcript(self, job_id, model_size=None):
+        """Cached transcript from `model_size`; without one, the best model's or else the job's own."""
+        sizes = [model_size] if model_size else [self.model_policy and self.model_policy.best, None]
+        for size in dict.fromkeys(sizes):
+            key = self._transcript_key(job_id, size)
+            result = self.result_cache.get(key) if key else None
+            if result is not None:
+                print(f"Using cached transcript for {job_id}")
+                if size and not model_size:
+                    self._update(job_id, **self._model_fields(size))
+                return result
+        return None
+
+    def _store_transcript(self, job_id, result, model_size=None):
+        if not self.result_cache:
+            return
+        # Keyed by the archive's bytes, so wait until it is complete
+        self._wait_for_archive(job_id)
+        try:
+            key = self._transcript_key(job_id, model_size)
+            if key:
+                self.result_cache.put(key, result)
+        except Exception as e:
+            print(f"Could not cache transcript for {job_id}: {e}")
+
+    def _generate_report(self, result):
+        if not self.result_cache:
+            return self.intelligence.generate_report(
+                result["full_text"], result["formatted_text"], result.get("segments")
+            )
+        digest = text_digest(result["full_text"], result["formatted_text"], result.get("segments"))
+        key = self.result_cache.key("report", digest, self.intelligence.settings())
+        cached = self.result_cache.get(key)
+        if cached is not None:
+            print("Using cached intelligence report")
+            return cached["report"]
+        report = self.intelligence.generate_report(
+            result["full_text"], result["formatted_text"], result.get("segments")
+        )
+        self.result_cache.put(key, {"report": report})
+        return report
@@ -1,12 +1,25 @@
-from fastapi import FastAPI, BackgroundTasks, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
+from typing import List, Optional
 import uvicorn
 import os
-from recorder import AudioRecorder
-from transcriber import Transcriber
+import asyncio
+import threading
+import time
+from recorder import resolve_archive_format
+from sessions import SessionManager, ACTIVE_SESSION_STATES
+from transcriber import Transcriber, default_memory_limit_mb
 from drive_sync import DriveManager
 from intelligence import MeetingIntelligence
+from jobs import JobManager
+from model_policy import ModelPolicy
+from ingest import IngestBatch
+from search_index import SearchIndex
+from result_cache import ResultCache
+import metrics
+from events import EventHub, format_sse
 
 app = FastAPI()
 
@@ -19,137 +32,412 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+_started_at = time.perf_counter()
+
 # Global State
-recorder = AudioRecorder()
-transcriber = None # Load lazily or on startup
+# Output dir is ../recordings to avoid triggering uvicorn reload in ./backend
+RECORDINGS_DIR = os.path.abspath("../recordings")
+# ARCHIVE_FORMAT: wav, flac (lossless, about half the size) or opus (speech-grade, far smaller)
+ARCHIVE_FORMAT = resolve_archive_format(os.environ.get("ARCHIVE_FORMAT", "flac"))
+# CAPTURE_MODE: process (devices read in a separate process, safe from server load) or thread
+RECORDER_OPTIONS = {
+    "archive_format": ARCHIVE_FORMAT,
+    "capture": os.environ.get("CAPTURE_MODE", "process"),
+    "block_size": int(os.environ.get("CAPTURE_BLOCK_SIZE", "1024")),
+}
+# Each recording is a session with its own devices and recorder (see /sessions);
+# MAX_SESSIONS caps how many record at once on a shared capture host
+sessions = SessionManager(RECORDINGS_DIR, recorder_options=RECORDER_OPTIONS,
+                          max_sessions=int(os.environ.get("MAX_SESSIONS", "8")))
+transcriber = None # Loaded in the background after startup (see /ready)
 drive_manager = None 
 intelligence = None
-latest_file = None
 
+# Transcription worker processes (each loads its own Whisper model)
+TRANSCRIBE_WORKERS = int(os.environ.get("TRANSCRIBE_WORKERS", "2"))
+# WHISPER_MODELS: sizes to pick from per job, fastest first (e.g. "tiny,base,small"). Each job
+# gets the largest that finishes within TRANSCRIBE_LATENCY_TARGET seconds given the backlog;
+# WHISPER_UPGRADE=1 re-transcribes the rest with the largest when the server is idle
+WHISPER_MODELS = [size.strip() for size in os.environ.get("WHISPER_MODELS", "").split(",") if size.strip()]
+
+# Inference backend: "whisper" (PyTorch) or "faster-whisper" (CTranslate2 int8 on CPU)
+WHISPER_MODEL = os.environ.get("WHISPER_MODEL", "base")
+WHISPER_BACKEND = os.environ.get("WHISPER_BACKEND", "whisper")
+TRANSCRIBER_OPTIONS = {
+    "model_size": WHISPER_MODEL,
+    "backend": WHISPER_BACKEND,
+    "threads": int(os.environ.get("WHISPER_THREADS", "0")) or None,
+    "beam_size": int(os.environ.get("WHISPER_BEAM_SIZE", "0")) or None,
+    # Skip silence before decoding (energy VAD)
+    "vad": os.environ.get("WHISPER_VAD", "1") == "1",
+    # WHISPER_MEMORY_MB: model memory per process (each worker and the live transcriber load
+    # their own); other WHISPER_MODELS stay loaded while they fit next to the default model.
+    # Default: room for the default model and the largest other one
+    "memory_limit_mb": int(os.environ.get("WHISPER_MEMORY_MB", "0"))
+                       or default_memory_limit_mb(WHISPER_MODEL, WHISPER_MODELS, WHISPER_BACKEND),
+}
+jobs = None
+# Full-text index of all processed meetings (see /search)
+search_index = None
+# Batch ingestion requests by id (see /ingest); their progress is read from the jobs
+ingest_batches = {}
+# INGEST_DIRS: directories /ingest may read from (os.pathsep-separated; default: the recordings)
+INGEST_DIRS = [os.path.realpath(os.path.expanduser(d))
+               for d in os.environ.get("INGEST_DIRS", RECORDINGS_DIR).split(os.pathsep) if d]
+# Finished ingest batches kept for /ingest/{batch_id}; older ones are forgotten
+MAX_INGEST_BATCHES = 20
+
+# Server-push channel for the UI (see /events)
+events = EventHub()
+
+# Warm-up state per component (see /ready): pending -> loading -> ready, disabled or failed.
+# Recording needs none of them, so /start works while they load.
+components = {name: {"state": "pending"} for name in ("transcriber", "workers", "intelligence", "drive")}
+components["recorder"] = {"state": "ready"}
+# Without these the server can't transcribe; /ready stays 503 if one failed
+REQUIRED_COMPONENTS = ("transcriber", "workers")
+LOAD_SECONDS = metrics.gauge("startup_component_load_seconds", "Background warm-up time per component",
+                             ("component",))
+
+# The UI's own session (/start, /stop); recording and processing state live on the session and jobs
 class ProcessingStatus:
-    is_recording = False
-    is_processing = False
-    last_transcript = ""
-    status_message = "Ready"
+    session_id = None
 
 state = ProcessingStatus()
 
 @app.on_event("startup")
 async def startup_event():
-    # Load model on startup to avoid delay during request
-    global transcriber, drive_manager, intelligence
-    transcriber = Transcriber()
-    intelligence = MeetingIntelligence()
-    
-    # Initialize Drive Manager (might prompt browser login on first run)
-    # Initialize Drive Manager (might prompt browser login on first run)
+    # Only cheap setup here; models, NLP data and Drive auth load in the background
+    global drive_manager, jobs, search_index
+    events.bind_loop(asyncio.get_running_loop())
+    os.makedirs(RECORDINGS_DIR, exist_ok=True)
+
+    # DRIVE_API_ENDPOINT points it at a local stand-in (fake_drive.py) instead of Google
+    drive_manager = DriveManager(api_endpoint=os.environ.get("DRIVE_API_ENDPOINT") or None, connect=False)
+
+    search_index = SearchIndex(os.path.join(RECORDINGS_DIR, "search.db"))
+    jobs = JobManager(RECORDINGS_DIR, workers=TRANSCRIBE_WORKERS, transcriber_options=TRANSCRIBER_OPTIONS)
+    # Reports of resumed or early jobs wait until the summarizer has loaded
+    jobs.intelligence_ready.clear()
+    jobs.drive_manager = drive_manager
+    # UPLOAD_AUDIO=1: upload the WAV recordings to Drive as well as the reports
+    jobs.upload_audio = os.environ.get("UPLOAD_AUDIO") == "1"
+    # INGEST_BATCH_FILES: recordings per worker task for /ingest, decoded together
+    jobs.batch_files = int(os.environ.get("INGEST_BATCH_FILES", "4"))
+    jobs.search_index = search_index
+    # Transcripts and reports by content hash, so retries skip finished stages
+    jobs.result_cache = ResultCache(os.path.join(RECORDINGS_DIR, ".cache"),
+                                    max_bytes=int(os.environ.get("RESULT_CACHE_MB", "512")) * 1024 * 1024)
+    jobs.on_update = _publish_job
+    if WHISPER_MODELS:
+        jobs.model_policy = ModelPolicy(WHISPER_MODELS,
+                                        latency_target=float(os.environ.get("TRANSCRIBE_LATENCY_TARGET", "900")),
+                                        upgrade=os.environ.get("WHISPER_UPGRADE", "1") == "1")
+        # Upgrades wait until nothing is being recorded either
+        jobs.idle_check = lambda: not sessions.is_busy()
+    jobs.resume()
+    sessions.jobs = jobs
+    sessions.on_update = _publish_session
+    sessions.on_text = _publish_transcript
+
+    _warm_up("intelligence", _load_intelligence)
+    _warm_up("transcriber", _load_transcriber)
+    _warm_up("workers", _load_workers)
+    _warm_up("drive", _connect_drive)
+    print(f"Ready to record after {time.perf_counter() - _started_at:.2f}s; models are loading in the background")
+
+def _warm_up(name, load):
+    """Runs one component's loader on its own thread and records how it went.
+
+    `load` returns None when the component is ready, or a reason it is disabled.
+    """
+    def run():
+        _set_component(name, state="loading")
+        start = time.perf_counter()
+        try:
+            reason = load()
+        except Exception as e:
+            print(f"Warm-up of {name} failed: {e}")
+            _set_component(name, state="failed", error=str(e))
+            return
+        seconds = round(time.perf_counter() - start, 3)
+        LOAD_SECONDS.set(seconds, component=name)
+        if reason:
+            print(f"{name} disabled: {reason}")
+            _set_component(name, state="disabled", reason=reason, seconds=seconds)
+        else:
+            _set_component(name, state="ready", seconds=seconds)
+
+    threading.Thread(target=run, name=f"warm-up-{name}", daemon=True).start()
+
+def _set_component(name, **fields):
+    components[name] = fields
+    events.publish("component", {"name": name, **fields})
+
+def _load_transcriber():
+    # Used for live transcription; recordings started before it loads are transcribed after stop
+    global transcriber
+    transcriber = sessions.transcriber = Transcriber(**TRANSCRIBER_OPTIONS)
+
+def _load_workers():
+    # Runs alongside _load_transcriber importing torch; safe because the pool spawns
+    # its workers (see JobManager) instead of forking this half-initialized process
+    for future in jobs.warm_up():
+        future.result()
+
+def _load_intelligence():
+    global intelligence
+    try:
+        # NLTK_OFFLINE=1: fail fast on missing NLTK data instead of downloading it
+        intelligence = MeetingIntelligence(offline=os.environ.get("NLTK_OFFLINE") == "1")
+        jobs.intelligence = intelligence
+    except LookupError as e:
+        return str(e)
+    finally:
+        jobs.intelligence_ready.set()
+
+def _connect_drive():
+    # Might prompt a browser login on first run; uploads queue up until it's done
+    global drive_manager
+    connected = False
     try:
-        drive_manager = DriveManager()
-    except Exception as e:
-        print(f"Drive Auth Warning: {e}")
+        connected = drive_manager.connect()
+    finally:
+        if not connected:
+            # Jobs from now on stay local, like when there are no credentials
+            drive_manager = jobs.drive_manager = None
+    return None if connected else "No Drive credentials"
+
+def _ui_session():
+    return sessions.get(state.session_id) if state.session_id else None
+
+def _status_snapshot():
+    latest = jobs.latest() if jobs else None
+    session = _ui_session()
+    active = bool(session and session["status"] in ACTIVE_SESSION_STATES)
+    message = session["message"] if session else "Ready"
+    if latest and not active:
+        message = latest["message"]
+    return {
+        "is_recording": bool(session and session["status"] == "recording"),
+        # A stopping session is still handing its recording over to a job
+        "is_processing": (jobs.is_busy() if jobs else False) or (active and session["status"] == "stopping"),
+        "message": message,
+        "session_id": state.session_id,
+        "latest_job_id": latest["id"] if latest else None,
+        # Newest job with a finished report; fetch it from /jobs/{id}
+        "report_job_id": (_latest_report_job() or {}).get("id") if jobs else None,
+    }
+
+def _publish_status():
+    events.publish("status", _status_snapshot())
+
+def _publish_job(job):
+    events.publish("job", job)
+    _publish_status()
+
+def _publish_session(session):
+    events.publish("session", session)
+    if session["id"] == state.session_id:
+        _publish_status()
+
+def _publish_transcript(session_id, delta):
+    events.publish("session_transcript_delta", {"session_id": session_id, "text": delta})
+    # The UI follows its own session
+    if session_id == state.session_id:
+        events.publish("transcript_delta", {"text": delta})
+
+@app.on_event("shutdown")
+def shutdown_event():
+    # Recordings still running are saved and queued; the jobs resume on the next start
+    sessions.shutdown()
+    jobs.shutdown()
+    if intelligence:
+        intelligence.close()
+    search_index.close()
 
 @app.post("/start")
 def start_recording():
-    if state.is_recording:
+    """Starts the UI's session on the default devices."""
+    session = _ui_session()
+    if session and session["status"] == "recording":
         raise HTTPException(status_code=400, detail="Already recording")
-    
-    global latest_file
-    latest_filename = recorder.start_recording()
-    latest_file = os.path.join(recorder.output_dir, latest_filename)
-    
-    state.is_recording = True
-    state.status_message = "Recording in progress..."
-    return {"status": "started", "file": latest_filename}
+    try:
+        session = sessions.create()
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    state.session_id = session["id"]
+    _publish_status()
+    return {"status": "started", "session_id": session["id"], "file": session["file"]}
 
 @app.post("/stop")
-def stop_recording(background_tasks: BackgroundTasks):
-    if not state.is_recording:
+def stop_recording():
+    """Stops the UI's session; the recording is saved and queued in the background."""
+    session = sessions.stop(state.session_id) if state.session_id else None
+    if not session:
         raise HTTPException(status_code=400, detail="Not recording")
-    
-    saved_filename = recorder.stop_recording()
-    
-    # Update latest_file to point to the actual saved (mixed) file
-    # This fixes the bug where we processed the 'start' timestamp instead of 'end'
-    if saved_filename:
-        # Construct absolute path to the saved file
-        # output_dir is already absolute in recorder
-        global latest_file
-        latest_file = os.path.join(recorder.output_dir, saved_filename)
-        
-    state.is_recording = False
-    state.status_message = "Recording saved. Starting transcription..."
-    
-    # Trigger background transcription with the CORRECT file
-    if latest_file and os.path.exists(latest_file):
-        background_tasks.add_task(process_recording, latest_file)
-    else:
-        state.status_message = "Error: Recording file not found."
-        
-    return {"status": "stopped", "message": "Processing started in background"}
-
-def process_recording(file_path):
-    state.is_processing = True
+    return {"status": "stopped", "session_id": session["id"], "message": "Processing started in background"}
+
+class SessionRequest(BaseModel):
+    # Device names (or a unique part of them); omitted means the default device
+    system_device: Optional[str] = None
+    mic_device: Optional[str] = None
+
+@app.post("/sessions")
+def create_session(request: SessionRequest = None):
+    """Starts an independent recording session on its own device pair."""
+    request = request or SessionRequest()
     try:
-        print(f"Processing: {file_path}")
-        result = transcriber.transcribe(file_path)
-        
-        if "error" in result:
-             state.status_message = f"Transcription failed: {result['error']}"
-             return
-
-        # Generate Intelligent Report
-        if intelligence:
-            print("Generating Intelligence Report...")
-            full_report = intelligence.generate_report(result["full_text"], result["formatted_text"])
-        else:
-            full_report = result["formatted_text"]
-
-        state.last_transcript = full_report # Show report in UI preview too
-        state.status_message = "Transcription & Intelligence Complete. Ready to Sync."
-        
-        # Save to local file
-        txt_path = file_path.replace(".wav", ".txt")
-        with open(txt_path, "w", encoding="utf-8") as f:
-            f.write(full_report)
-            
-        # Sync to Drive
-        if drive_manager:
-            state.status_message = "Uploading to Drive..."
-            res = drive_manager.upload_file(txt_path)
-            if "link" in res:
-                state.status_message = f"Done! Saved to Drive: {res['link']}"
-            else:
-                state.status_message = f"Transcribed, but Drive Upload failed: {res.get('error')}"
-        else:
-             state.status_message = "Transcribed (Local Only - No Drive Credentials)"
-            
-    except Exception as e:
-        print(f"Error processing: {e}")
-        state.status_message = f"Error: {str(e)}"
-    finally:
-        state.is_processing = False
+        return sessions.create(system_device=request.system_device, mic_device=request.mic_device)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@app.get("/sessions")
+def list_sessions():
+    return {"sessions": sessions.list_sessions()}
+
+@app.get("/sessions/{session_id}")
+def get_session(session_id: str):
+    session = sessions.get(session_id)
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return session
+
+@app.post("/sessions/{session_id}/stop")
+def stop_session(session_id: str):
+    """Returns at once with status "stopping"; the session gets its job_id once queued."""
+    session = sessions.stop(session_id)
+    if not session:
+        raise HTTPException(status_code=409, detail="Session not found or not recording")
+    return session
+
+def _read_report(job):
+    if job and job.get("report_path") and os.path.exists(job["report_path"]):
+        with open(job["report_path"], "r", encoding="utf-8") as f:
+            return f.read()
+    return ""
+
+def _latest_report_job():
+    for job in jobs.list_jobs():
+        if job.get("report_path"):
+            return job
+    return None
 
 @app.post("/upload_last")
 def upload_last():
-    if not state.last_transcript:
+    job = _latest_report_job()
+    if not job:
         return {"message": "No transcript available to upload"}
     
-    if drive_manager and latest_file:
-        txt_path = latest_file.replace(".wav", ".txt")
-        if os.path.exists(txt_path):
-             res = drive_manager.upload_file(txt_path)
-             return {"message": "Uploaded", "link": res.get("link")}
+    if drive_manager and os.path.exists(job["report_path"]):
+        res = drive_manager.upload_file(job["report_path"])
+        return {"message": "Uploaded", "link": res.get("link")}
     
     return {"message": "Upload failed or not configured"}
 
+@app.get("/jobs")
+def list_jobs():
+    return {"jobs": jobs.list_jobs()}
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    job = jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    job["report"] = _read_report(job)
+    return job
+
+@app.post("/jobs/{job_id}/retry")
+def retry_job(job_id: str):
+    job = jobs.retry(job_id)
+    if not job:
+        raise HTTPException(status_code=409, detail="Job not found or still running")
+    return job
+
+class IngestRequest(BaseModel):
+    # Audio files and/or directories on this machine (searched recursively)
+    paths: List[str]
+
+def _ingest_allowed(path):
+    path = os.path.realpath(os.path.expanduser(path))
+    return any(os.path.commonpath([path, allowed]) == allowed for allowed in INGEST_DIRS)
+
+@app.post("/ingest")
+def ingest(request: IngestRequest):
+    """Queues existing recordings, longest first, skipping the ones already done.
+
+    Returns at once; the files are scanned in the background ("scanning" in
+    the progress until they are all queued).
+    """
+    denied = [path for path in request.paths if not _ingest_allowed(path)]
+    if denied:
+        raise HTTPException(status_code=403, detail=f"Outside INGEST_DIRS: {', '.join(denied)}")
+    finished = [batch_id for batch_id, b in ingest_batches.items() if b.is_finished()]
+    for batch_id in finished[:max(0, len(finished) - MAX_INGEST_BATCHES + 1)]:
+        del ingest_batches[batch_id]
+
+    batch = IngestBatch(jobs, request.paths)
+    ingest_batches[batch.id] = batch
+    threading.Thread(target=batch.submit, name=f"ingest-{batch.id}", daemon=True).start()
+    return batch.progress()
+
+@app.get("/ingest/{batch_id}")
+def ingest_progress(batch_id: str):
+    """Per-file status and RTF, plus the batch's aggregate RTF so far."""
+    batch = ingest_batches.get(batch_id)
+    if not batch:
+        raise HTTPException(status_code=404, detail="Ingest batch not found")
+    return batch.progress()
+
+@app.get("/search")
+def search(q: str, limit: int = 20, offset: int = 0, speaker: str = None):
+    """Ranked transcript segments matching `q`, hits wrapped in <mark></mark>."""
+    limit = max(1, min(limit, 100))
+    return {"query": q, "hits": search_index.search(q, limit=limit, offset=max(0, offset), speaker=speaker)}
+
 @app.get("/status")
 def get_status():
-    return {
-        "is_recording": state.is_recording,
-        "is_processing": state.is_processing,
-        "message": state.status_message,
-        "last_transcript": state.last_transcript if state.last_transcript else ""
-    }
+    # Lightweight: the report comes from /jobs/{id}, live text from /events
+    return _status_snapshot()
+
+@app.get("/ready")
+def get_ready():
+    """Warm-up state of each component; 503 while one is loading or a required one failed."""
+    snapshot = {name: dict(component) for name, component in components.items()}
+    failed = [name for name in REQUIRED_COMPONENTS if snapshot[name]["state"] == "failed"]
+    ready = not failed and all(c["state"] not in ("pending", "loading") for c in snapshot.values())
+    return JSONResponse({"ready": ready, "can_record": True, "failed": failed, "components": snapshot},
+                        status_code=200 if ready else 503)
+
+@app.get("/metrics")
+def get_metrics():
+    """Prometheus text exposition of the pipeline metrics (see metrics.py)."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/events")
+async def stream_events(request: Request):
+    """Server-Sent Events: status transitions, job updates and transcript deltas."""
+    queue = events.subscribe()
+
+    async def event_stream():
+        try:
+            # Snapshot first so a (re)connecting client starts in sync
+            yield format_sse("status", _status_snapshot())
+            session = sessions.session(state.session_id) if state.session_id else None
+            if session and session.status == "recording" and session.streamer and session.streamer.partial_text:
+                yield format_sse("transcript_delta", {"text": session.streamer.partial_text, "reset": True})
+            while events.is_subscribed(queue):
+                if await request.is_disconnected():
+                    break
+                try:
+                    yield await asyncio.wait_for(queue.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+        finally:
+            events.unsubscribe(queue)
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache"})
 
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
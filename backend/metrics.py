@@ -0,0 +1,174 @@
+"""Process-wide metrics in the Prometheus text format (served on /metrics).
+
+Modules declare what they measure at import time:
+
+    UPLOAD_SECONDS = metrics.histogram("drive_upload_seconds", "Drive upload latency")
+    UPLOAD_SECONDS.observe(1.2)
+
+Each process has its own registry; transcription worker processes send
+their numbers back with the job result instead (see jobs.py).
+"""
+import bisect
+import os
+import threading
+import time
+
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labels):
+            raise ValueError(f"{self.name} expects labels {self.labels}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labels)
+
+    def _format_labels(self, key, extra=()):
+        pairs = list(zip(self.labels, key)) + list(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+    def _samples(self):
+        with self._lock:
+            return [(self.name + self._format_labels(key), value) for key, value in self._values.items()]
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines += [f"{series} {_format_value(value)}" for series, value in self._samples()]
+        return "\n".join(lines)
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name, help_text, labels=(), function=None):
+        super().__init__(name, help_text, labels)
+        # Unlabelled gauges can be read on demand instead of set
+        self.function = function
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self):
+        if self.function:
+            try:
+                value = self.function()
+            except Exception:
+                return []
+            return [] if value is None else [(self.name, value)]
+        return super()._samples()
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._values[key] = (counts, total + value)
+
+    def time(self, **labels):
+        """Context manager that observes the duration of its block."""
+        return _Timer(self, labels)
+
+    def _samples(self):
+        samples = []
+        with self._lock:
+            values = {key: (list(counts), total) for key, (counts, total) in self._values.items()}
+        for key, (counts, total) in values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else _format_value(bound)
+                samples.append((f"{self.name}_bucket{self._format_labels(key, [('le', le)])}", cumulative))
+            samples.append((f"{self.name}_sum{self._format_labels(key)}", total))
+            samples.append((f"{self.name}_count{self._format_labels(key)}", cumulative))
+        return samples
+
+class _Timer:
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.start
+        self.histogram.observe(self.elapsed, **self.labels)
+        return False
+
+def _register(cls, name, *args, **kwargs):
+    with _registry_lock:
+        # Same name returns the existing metric, so re-imports don't clash
+        if name not in _registry:
+            _registry[name] = cls(name, *args, **kwargs)
+        return _registry[name]
+
+def counter(name, help_text, labels=()):
+    return _register(Counter, name, help_text, labels)
+
+def gauge(name, help_text, labels=(), function=None):
+    return _register(Gauge, name, help_text, labels, function=function)
+
+def histogram(name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+    return _register(Histogram, name, help_text, labels, buckets=buckets)
+
+def render():
+    with _registry_lock:
+        metrics = list(_registry.values())
+    return "\n".join(m.render() for m in metrics) + "\n"
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_value(value):
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+def resident_memory_bytes():
+    """Current RSS of this process, or None where it can't be read cheaply."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        return None
+
+gauge("process_resident_memory_bytes", "Resident memory size in bytes", function=resident_memory_bytes)
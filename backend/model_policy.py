@@ -0,0 +1,73 @@
+"""Picks the Whisper model size per job from the transcription backlog.
+
+Each job gets the largest model that still finishes within the latency
+target, counting the queued audio ahead of it, so a backlog degrades to
+fast small-model transcripts instead of falling hours behind. Jobs that
+ran below the best model can be re-transcribed with it later, when the
+server is idle (see JobManager.model_policy).
+
+Speeds are real-time factors per worker, starting from rough CPU figures
+and replaced by measurements as jobs finish.
+"""
+import threading
+import metrics
+from transcriber import model_family
+
+# Processing seconds per audio second on one CPU worker (openai-whisper, VAD on)
+DEFAULT_RTF = {"tiny": 0.05, "base": 0.1, "small": 0.3, "medium": 0.8, "large": 1.6}
+
+MODEL_CHOICES = metrics.counter("transcriber_model_choices_total", "Model sizes picked for jobs", ("model",))
+ESTIMATED_RTF = metrics.gauge("transcriber_estimated_rtf", "Measured real-time factor per model", ("model",))
+
+class ModelPolicy:
+    """Chooses among `sizes` (fastest first) to meet `latency_target` seconds per job.
+
+    `default_audio_seconds` stands in for jobs of unknown length.
+    `upgrade` enables the idle-time re-transcription with the best model.
+    """
+
+    def __init__(self, sizes, latency_target=900.0, upgrade=True, default_audio_seconds=600.0):
+        if not sizes:
+            raise ValueError("ModelPolicy needs at least one model size")
+        self.sizes = list(sizes)
+        self.latency_target = latency_target
+        self.upgrade = upgrade
+        self.default_audio_seconds = default_audio_seconds
+        self._rtf = {size: DEFAULT_RTF.get(model_family(size), DEFAULT_RTF["large"]) for size in self.sizes}
+        self._lock = threading.Lock()
+
+    @property
+    def best(self):
+        return self.sizes[-1]
+
+    def rtf(self, model_size):
+        with self._lock:
+            return self._rtf.get(model_size)
+
+    def estimate(self, model_size, audio_seconds, backlog_seconds, workers):
+        """Seconds until a job is transcribed with `model_size`, behind `backlog_seconds` of queued audio."""
+        rtf = self.rtf(model_size)
+        return (backlog_seconds / max(1, workers) + audio_seconds) * rtf
+
+    def choose(self, audio_seconds, backlog_seconds, workers):
+        """Largest model meeting the latency target, else the fastest."""
+        audio_seconds = audio_seconds or self.default_audio_seconds
+        chosen = self.sizes[0]
+        for size in reversed(self.sizes):
+            if self.estimate(size, audio_seconds, backlog_seconds, workers) <= self.latency_target:
+                chosen = size
+                break
+        MODEL_CHOICES.inc(model=chosen)
+        return chosen
+
+    def observe(self, model_size, audio_seconds, elapsed):
+        """Folds a finished transcription's speed into the estimate for its model."""
+        if model_size not in self._rtf or not audio_seconds or audio_seconds <= 0:
+            return
+        with self._lock:
+            # Moving average: follows load changes without jumping on one odd job
+            self._rtf[model_size] = 0.7 * self._rtf[model_size] + 0.3 * (elapsed / audio_seconds)
+            ESTIMATED_RTF.set(self._rtf[model_size], model=model_size)
+
+    def upgradable(self, model_size):
+        return self.upgrade and model_size is not None and model_size != self.best
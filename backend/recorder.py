@@ -4,103 +4,349 @@ import numpy as np
 import threading
 import os
 import time
+from functools import partial
+import metrics
+from audio_buffer import SpillBuffer
+from capture_process import CaptureProcess, OPEN, STARTING, downmix_into, watch_overruns
+from audio_utils import resample_range, StreamingResampler, WHISPER_SAMPLE_RATE
+from diarization import windowed_rms
+
+# Archive formats: (soundfile format, subtype, extension, sample rate; None = capture rate)
+ARCHIVE_FORMATS = {
+    "wav": ("WAV", "PCM_16", ".wav", None),
+    "flac": ("FLAC", "PCM_16", ".flac", None),
+    # Opus only takes 8/12/16/24/48kHz; 16kHz is what Whisper reads anyway
+    "opus": ("OGG", "OPUS", ".opus", WHISPER_SAMPLE_RATE),
+}
+
+CAPTURED_FRAMES = metrics.counter("recorder_captured_frames_total", "Frames captured", ("source",))
+DROPPED_FRAMES = metrics.counter(
+    "recorder_dropped_frames_total", "Frames lost to failed device reads or a full capture ring", ("source",)
+)
+OVERRUNS = metrics.counter(
+    "recorder_overruns_total", "Capture overruns: device buffer discontinuities or a full capture ring",
+    ("source", "kind"),
+)
+BUFFER_FRAMES = metrics.gauge("recorder_buffer_frames", "Frames held by recordings in progress", ("source",))
+ARCHIVE_TAIL_SECONDS = metrics.histogram(
+    "recorder_archive_tail_seconds", "Time from stop until the archive is complete", ("format",)
+)
+
+CAPTURE_MODES = ("thread", "process")
+
+def resolve_archive_format(name):
+    """Validates an archive format name, falling back to FLAC without Opus support."""
+    name = name.lower()
+    if name not in ARCHIVE_FORMATS:
+        raise ValueError(f"Unknown archive format '{name}'. Choose from: {', '.join(ARCHIVE_FORMATS)}")
+    if name == "opus" and "OPUS" not in sf.available_subtypes("OGG"):
+        print("This libsndfile build has no Opus encoder, archiving as FLAC instead.")
+        return "flac"
+    return name
+
+def _named_device(name, include_loopback):
+    try:
+        return sc.get_microphone(name, include_loopback=include_loopback)
+    except Exception as e:
+        print(f"Device '{name}' not found: {e}")
+        return None
+
+def find_loopback(name=None):
+    """Finds system output (what you hear), or the device called `name`."""
+    if name:
+        return _named_device(name, include_loopback=True)
+    try:
+        default_speaker = sc.default_speaker()
+        mics = sc.all_microphones(include_loopback=True)
+        for mic in mics:
+            if mic.name == default_speaker.name and mic.isloopback:
+                return mic
+        for mic in mics:
+            if mic.isloopback:
+                return mic
+        return sc.default_microphone()
+    except:
+        return sc.default_microphone()
+
+def find_user_mic(name=None):
+    """Finds user input (physical microphone), avoiding Stereo Mix, or the device called `name`."""
+    if name:
+        return _named_device(name, include_loopback=False)
+    try:
+        default = sc.default_microphone()
+        # If default is Stereo Mix (which catches system audio), switch to real mic
+        if "Stereo Mix" in default.name:
+            all_mics = sc.all_microphones(include_loopback=False)
+            for mic in all_mics:
+                if "Microphone" in mic.name and "Stereo Mix" not in mic.name:
+                    print(f"Switched Mic from {default.name} to {mic.name}")
+                    return mic
+        return default
+    except:
+        print("Error finding default mic")
+        return None
+
+def find_devices(system_device=None, mic_device=None):
+    """Both capture devices by source name; also runs inside the capture process."""
+    return {"System Audio": find_loopback(system_device), "User Mic": find_user_mic(mic_device)}
 
 class AudioRecorder:
-    def __init__(self, output_dir="../recordings", sample_rate=44100):
+    """Records the system output and the microphone into one mixed archive.
+
+    Every recorder owns its capture threads, buffers and output file, so
+    several can record at once (see sessions.py). `system_device` and
+    `mic_device` pick devices by (part of) their name instead of the
+    defaults, and `tag` is added to file names so concurrent recordings
+    never collide.
+
+    capture="thread" reads the devices on threads of this process.
+    capture="process" reads them in a separate process (capture_process.py)
+    that hands the audio over through shared memory, so a busy server can't
+    make the capture miss device deadlines.
+    """
+
+    def __init__(self, output_dir="../recordings", sample_rate=44100, archive_format="wav", encode_interval=5.0,
+                 system_device=None, mic_device=None, tag=None, capture="thread", block_size=1024):
+        if capture not in CAPTURE_MODES:
+            raise ValueError(f"Unknown capture mode '{capture}'. Choose from: {', '.join(CAPTURE_MODES)}")
         # 44.1kHz is more compatible with Windows microphones than 16kHz
         # Output dir is now ../recordings to avoid triggering uvicorn reload in ./backend
         self.output_dir = os.path.abspath(output_dir)
         self.sample_rate = sample_rate
+        self.archive_format = resolve_archive_format(archive_format)
+        # How often the archive encoder catches up with the capture (seconds)
+        self.encode_interval = encode_interval
+        self.system_device = system_device
+        self.mic_device = mic_device
+        self.tag = tag
+        self.capture = capture
         self.is_recording = False
-        self.frames_system = []
-        self.frames_mic = []
+        # One disk-backed float32 buffer per source (see audio_buffer.py)
+        self.frames_system = SpillBuffer()
+        self.frames_mic = SpillBuffer()
         self.threads = []
+        # Frames requested per record() call (1024: ~23ms at 44.1kHz)
+        self.block_size = block_size
+        # Capture threads update the shared metrics about once a second, not per block
+        self.metrics_interval = 1.0
+        # Process capture: how much audio the shared rings hold, and how often they are drained
+        self.ring_seconds = 30.0
+        self.drain_interval = 0.1
+        # Seconds the capture process gets to open the devices before capture moves to threads
+        self.capture_start_timeout = 15.0
+        # Picklable callable returning {source name: device}, run in the capture
+        # process (default: find_devices with system_device/mic_device)
+        self.device_opener = None
+        # Per-source counts of the current recording (captured/dropped frames, overruns)
+        self.capture_stats = {}
+        # Sources whose device actually opened (a missing mic never appends frames)
+        self.live_sources = set()
+        # Set per source once its device opened or failed to
+        self.source_ready = {}
+        # Buffers of the last stopped recording, kept for the in-memory handoff
+        self.last_buffers = []
+        self.last_sources = {}
+        self.archive_thread = None
         
         if not os.path.exists(output_dir):
             os.makedirs(output_dir)
 
+    def _filename(self):
+        suffix = f"_{self.tag}" if self.tag else ""
+        return f"meeting_{int(time.time())}{suffix}{ARCHIVE_FORMATS[self.archive_format][2]}"
+
     def _get_loopback_mic(self):
         """Finds system output (what you hear)."""
-        try:
-            default_speaker = sc.default_speaker()
-            mics = sc.all_microphones(include_loopback=True)
-            for mic in mics:
-                if mic.name == default_speaker.name and mic.isloopback:
-                    return mic
-            for mic in mics:
-                if mic.isloopback:
-                    return mic
-            return sc.default_microphone()
-        except:
-            return sc.default_microphone()
+        return find_loopback(self.system_device)
 
     def _get_user_mic(self):
         """Finds user input (physical microphone), avoiding Stereo Mix."""
-        try:
-            default = sc.default_microphone()
-            # If default is Stereo Mix (which catches system audio), switch to real mic
-            if "Stereo Mix" in default.name:
-                all_mics = sc.all_microphones(include_loopback=False)
-                for mic in all_mics:
-                    if "Microphone" in mic.name and "Stereo Mix" not in mic.name:
-                        print(f"Switched Mic from {default.name} to {mic.name}")
-                        return mic
-            return default
-        except:
-            print("Error finding default mic")
-            return None
+        return find_user_mic(self.mic_device)
 
     def _record_stream(self, source, frame_storage, source_name):
         """Generic recording loop for a specific source."""
+        ready = self.source_ready[source_name]
         if not source:
             print(f"Source {source_name} not available.")
+            ready.set()
             return
 
         print(f"Started recording: {source_name} ({source.name})")
+        dropped = 0
+        # Counted locally and flushed now and then: the metrics are shared by
+        # every recorder in the process and each update takes a lock
+        captured = unflushed_dropped = 0
+        flush_every = self.sample_rate * self.metrics_interval
+        # Downmix target, reused for every block
+        block = np.empty(self.block_size, dtype=np.float32)
+        overruns = [0]
+        watch_overruns(lambda: overruns.__setitem__(0, overruns[0] + 1))
         try:
             with source.recorder(samplerate=self.sample_rate) as recorder:
+                self.live_sources.add(source_name)
+                ready.set()
                 while self.is_recording:
                     try:
                         # Record chunks (blocksize)
-                        data = recorder.record(numframes=1024)
+                        data = recorder.record(numframes=self.block_size)
+                        if len(data) > len(block):
+                            block = np.empty(len(data), dtype=np.float32)
                         # soundcard returns [samples, channels]. We want mono for mixing.
-                        if data.shape[1] > 1:
-                            data = np.mean(data, axis=1)
-                        else:
-                            data = data.flatten()
-                            
-                        frame_storage.append(data)
+                        frame_storage.append(downmix_into(data, block))
+                        captured += len(data)
                     except Exception as loop_err:
-                        # If one chunk fails, don't crash the thread, just log
-                        # print(f"Frame drop in {source_name}: {loop_err}")
-                        pass
+                        # If one chunk fails, don't crash the thread, but count the gap
+                        dropped += 1
+                        unflushed_dropped += self.block_size
+                        if dropped == 1 or dropped % 100 == 0:
+                            print(f"Frame drop in {source_name}: {loop_err} ({dropped} blocks so far)")
+                    if captured + unflushed_dropped >= flush_every:
+                        self._flush_metrics(source_name, captured, unflushed_dropped, device_overruns=overruns[0])
+                        captured = unflushed_dropped = overruns[0] = 0
         except Exception as e:
             print(f"Critical error recording {source_name}: {e}")
+        finally:
+            self._flush_metrics(source_name, captured, unflushed_dropped, device_overruns=overruns[0])
+            # The buffer is handed off now (or released): it no longer grows
+            BUFFER_FRAMES.inc(-len(frame_storage), source=source_name)
+            ready.set()
+
+    def _flush_metrics(self, source_name, captured, dropped, device_overruns=0, ring_overruns=0):
+        stats = self.capture_stats.setdefault(
+            source_name, {"captured_frames": 0, "dropped_frames": 0, "device_overruns": 0, "ring_overruns": 0}
+        )
+        stats["captured_frames"] += captured
+        stats["dropped_frames"] += dropped
+        stats["device_overruns"] += device_overruns
+        stats["ring_overruns"] += ring_overruns
+        if captured:
+            CAPTURED_FRAMES.inc(captured, source=source_name)
+            BUFFER_FRAMES.inc(captured, source=source_name)
+        if dropped:
+            DROPPED_FRAMES.inc(dropped, source=source_name)
+        if device_overruns:
+            OVERRUNS.inc(device_overruns, source=source_name, kind="device")
+        if ring_overruns:
+            OVERRUNS.inc(ring_overruns, source=source_name, kind="ring")
+
+    def _drain_capture_process(self):
+        """Process capture: moves audio from the capture process's rings into the spill buffers."""
+        storage = {"System Audio": self.frames_system, "User Mic": self.frames_mic}
+        opener = self.device_opener or partial(find_devices, self.system_device, self.mic_device)
+        try:
+            capture = CaptureProcess(list(storage), opener, self.sample_rate, self.block_size, self.ring_seconds)
+            capture.start()
+        except Exception as e:
+            print(f"Could not start the capture process ({e}); capturing on threads instead")
+            self._capture_on_threads(storage)
+            return
+
+        reported = {name: {"read_errors": 0, "ring_overruns": 0, "device_overruns": 0} for name in storage}
+        started = time.monotonic()
+        failure = None
+        try:
+            while True:
+                recording = self.is_recording
+                if recording:
+                    failure = self._capture_failure(capture, started)
+                if not recording or failure:
+                    # Stop first so the final read gets everything the devices delivered
+                    # (a child that already failed gets little time before it is terminated)
+                    capture.stop(timeout=1.0 if failure else 5.0)
+                for name, frames in storage.items():
+                    ring = capture.rings[name]
+                    if ring.state == OPEN and name not in self.live_sources:
+                        print(f"Started recording: {name} ({ring.device_name}) in the capture process")
+                        self.live_sources.add(name)
+                    if ring.state != STARTING:
+                        self.source_ready[name].set()
+                    data = ring.read()
+                    if len(data):
+                        frames.append(data)
+                    counts = ring.counts()
+                    new = {key: counts[key] - reported[name][key] for key in counts}
+                    reported[name] = counts
+                    lost_blocks = new["read_errors"] + new["ring_overruns"]
+                    if lost_blocks:
+                        print(f"Frame drop in {name}: {new['read_errors']} failed reads, "
+                              f"{new['ring_overruns']} blocks lost to a full ring")
+                    self._flush_metrics(name, len(data), lost_blocks * self.block_size,
+                                        device_overruns=new["device_overruns"], ring_overruns=new["ring_overruns"])
+                if not recording or failure:
+                    break
+                time.sleep(self.drain_interval)
+        finally:
+            # Already stopped unless the loop raised; the child must be gone before the rings are unlinked
+            capture.stop()
+            capture.close()
+            fallback = failure is not None and self.is_recording
+            if not fallback:
+                for name, frames in storage.items():
+                    BUFFER_FRAMES.inc(-len(frames), source=name)
+                    self.source_ready[name].set()
+        if fallback:
+            # The same buffers carry on; the threads hand them off (and set source_ready) when they stop
+            print(f"{failure}; capturing on threads instead")
+            self._capture_on_threads(storage)
+
+    def _capture_failure(self, capture, started):
+        """Why process capture can't go on (None while it is fine)."""
+        states = [ring.state for ring in capture.rings.values()]
+        # With no device at all the child exits on its own, leaving every source UNAVAILABLE
+        if not capture.process.is_alive() and any(state in (STARTING, OPEN) for state in states):
+            return f"The capture process exited (code {capture.process.exitcode})"
+        if STARTING in states and time.monotonic() - started > self.capture_start_timeout:
+            return f"The capture process did not open the devices within {self.capture_start_timeout:g}s"
+        return None
+
+    def _capture_on_threads(self, storage):
+        devices = {"System Audio": self._get_loopback_mic(), "User Mic": self._get_user_mic()}
+        threads = [threading.Thread(target=self._record_stream, args=(devices[name], frames, name))
+                   for name, frames in storage.items()]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
 
     def start_recording(self):
         if self.is_recording:
             return "Already recording"
         
         self.is_recording = True
-        self.frames_system = []
-        self.frames_mic = []
+        self.frames_system = SpillBuffer(chunk_samples=self.sample_rate * 10)
+        self.frames_mic = SpillBuffer(chunk_samples=self.sample_rate * 10)
         self.threads = []
+        self.live_sources = set()
+        self.source_ready = {"System Audio": threading.Event(), "User Mic": threading.Event()}
+        self.capture_stats = {}
         
-        filename = f"meeting_{int(time.time())}.wav"
-        
-        # Thread 1: System Audio
-        sys_mic = self._get_loopback_mic()
-        t1 = threading.Thread(target=self._record_stream, args=(sys_mic, self.frames_system, "System Audio"))
-        self.threads.append(t1)
+        filename = self._filename()
+
+        # The archive is encoded while recording; stop only has the tail left
+        self._archive = {"captured": threading.Event(), "path": None}
+        self.archive_thread = threading.Thread(
+            target=self._encode_archive,
+            args=(os.path.join(self.output_dir, filename + ".part"), self.archive_format, self._archive),
+        )
         
-        # Thread 2: User Microphone
-        user_mic = self._get_user_mic()
-        t2 = threading.Thread(target=self._record_stream, args=(user_mic, self.frames_mic, "User Mic"))
-        self.threads.append(t2)
+        if self.capture == "process":
+            # One thread here only moves audio out of the capture process
+            self.threads.append(threading.Thread(target=self._drain_capture_process))
+        else:
+            # Thread 1: System Audio
+            sys_mic = self._get_loopback_mic()
+            t1 = threading.Thread(target=self._record_stream, args=(sys_mic, self.frames_system, "System Audio"))
+            self.threads.append(t1)
+
+            # Thread 2: User Microphone
+            user_mic = self._get_user_mic()
+            t2 = threading.Thread(target=self._record_stream, args=(user_mic, self.frames_mic, "User Mic"))
+            self.threads.append(t2)
         
         # Start both
         for t in self.threads:
             t.start()
+        self.archive_thread.start()
             
         return filename
 
@@ -109,58 +355,153 @@ class AudioRecorder:
             return "Not recording"
             
         self.is_recording = False
-        # Wait for threads to finish
+        # Wait for threads to finish (the capture process gets longer to shut down)
         for t in self.threads:
             try:
-                t.join(timeout=2.0) # Don't block forever if thread hangs
+                t.join(timeout=2.0 if self.capture == "thread" else 8.0) # Don't block forever if thread hangs
             except:
                 pass
             
+        self.last_buffers = self._live_buffers()
+        self.last_sources = {"system": self.frames_system, "mic": self.frames_mic}
         return self._save_mixed_audio()
 
+    def _live_buffers(self):
+        buffers = []
+        if "System Audio" in self.live_sources:
+            buffers.append(self.frames_system)
+        if "User Mic" in self.live_sources:
+            buffers.append(self.frames_mic)
+        if not self.is_recording:
+            # If one source never produced audio, use the other on its own
+            buffers = [b for b in buffers if len(b)]
+        return buffers
+
+    def available_samples(self, buffers=None):
+        """Number of mixed samples that can be read with read_mixed().
+
+        Pass `buffers` (e.g. self.last_buffers) to read a stopped recording.
+        """
+        live = buffers is None
+        buffers = self._live_buffers() if live else buffers
+        if not buffers:
+            return 0
+        lengths = [len(b) for b in buffers]
+        # While recording, only hand out audio both sources have reached.
+        # After stop, the shorter source is zero-padded like the saved file.
+        return min(lengths) if live and self.is_recording else max(lengths)
+
+    def read_mixed(self, start, end, buffers=None):
+        """Returns mixed mono audio for samples [start, end) at self.sample_rate.
+
+        Safe to call while recording; only the requested range is copied.
+        """
+        buffers = self._live_buffers() if buffers is None else buffers
+        if not buffers or end <= start:
+            return np.zeros(0, dtype=np.float32)
+
+        mixed = np.zeros(end - start, dtype=np.float32)
+        for frames in buffers:
+            data = frames.read(start, end)
+            mixed[:len(data)] += data
+        mixed /= len(buffers)
+        return mixed
+
+    def get_whisper_audio(self, buffers=None):
+        """The mixed recording as 16kHz float32, ready for Transcriber.
+
+        Resampled block by block from the spill buffers, so transcription
+        skips the WAV write/read and the FFmpeg decode entirely.
+        """
+        buffers = self.last_buffers if buffers is None else buffers
+        total = self.available_samples(buffers)
+        return resample_range(lambda start, end: self.read_mixed(start, end, buffers), total, self.sample_rate)
+
+    def release_buffers(self):
+        """Frees the last recording's spill buffers and their temp files.
+
+        Call once the job has taken its audio; the buffers are closed in the
+        background as soon as the archive encoder has finished with them.
+        """
+        buffers = (self.frames_system, self.frames_mic)
+        archive_thread = self.archive_thread
+        self.last_buffers, self.last_sources = [], {}
+
+        def close():
+            if archive_thread:
+                archive_thread.join()
+            for frames in buffers:
+                frames.close()
+
+        threading.Thread(target=close, daemon=True).start()
+
+    def get_channel_energy(self, sources=None, hop_seconds=0.1):
+        """Per-source RMS envelopes of a stopped recording, for speaker labels.
+
+        The channels are never mixed here, so we still know which audio came
+        from the loopback (remote) and which from the mic (local).
+        """
+        sources = self.last_sources if sources is None else sources
+        energy = {"hop_seconds": hop_seconds}
+        for name, frames in sources.items():
+            energy[name] = windowed_rms(frames.read, len(frames), self.sample_rate, hop_seconds)
+        return energy
+
     def _save_mixed_audio(self):
-        """Mixes the two streams and saves to file."""
-        filename = f"meeting_{int(time.time())}.wav"
-        filepath = os.path.join(self.output_dir, filename)
-        
+        """Hands the finished recording to the archive encoder.
+
+        Returns the filename straight away; the encoder has kept up during
+        capture and only finishes the tail in the background, and
+        transcription does not need the file (see get_whisper_audio), so stop
+        never waits on disk.
+        """
+        filename = self._filename()
+
+        sys_len, mic_len = len(self.frames_system), len(self.frames_mic)
+        print(f"Mixing Audio - System Frames: {sys_len}, Mic Frames: {mic_len}")
+
+        if sys_len == 0 and mic_len == 0:
+            print("No audio recorded from either source.")
+            filename = None
+        else:
+            self._archive["path"] = os.path.join(self.output_dir, filename)
+        self._archive["buffers"] = self.last_buffers
+        self._archive["stopped_at"] = time.perf_counter()
+        self._archive["captured"].set()
+        return filename
+
+    def _encode_archive(self, partial, archive_format, archive):
+        """Mixes the two streams and encodes them to file while recording.
+
+        Mixing happens block by block straight from the spill buffers into the
+        encoder, so it never builds full-length concatenated/padded copies.
+        The file is written under a temporary name and renamed once complete,
+        so readers (transcription, Drive uploads) never pick up a partial one.
+        """
+        file_format, subtype, _, archive_rate = ARCHIVE_FORMATS[archive_format]
+        rate = archive_rate or self.sample_rate
+        resampler = StreamingResampler(self.sample_rate, rate, block_seconds=self.encode_interval)
         try:
-            # Convert lists to arrays
-            if not self.frames_system and not self.frames_mic:
-                print("No audio recorded from either source.")
-                return None
-
-            # Handle empty streams (e.g. if mic failed)
-            sys_audio = np.concatenate(self.frames_system) if self.frames_system else np.array([])
-            mic_audio = np.concatenate(self.frames_mic) if self.frames_mic else np.array([])
-            
-            print(f"Mixing Audio - System Frames: {len(sys_audio)}, Mic Frames: {len(mic_audio)}")
-            
-            # If one is empty, use the other
-            if len(sys_audio) == 0 and len(mic_audio) == 0:
-                 return None
-            elif len(sys_audio) == 0:
-                 mixed_audio = mic_audio
-            elif len(mic_audio) == 0:
-                 mixed_audio = sys_audio
+            with sf.SoundFile(partial, mode="w", samplerate=rate, channels=1,
+                              format=file_format, subtype=subtype) as out:
+                captured = archive["captured"]
+                while not captured.wait(self.encode_interval):
+                    # Only mix once every source has opened (or given up), so
+                    # the mix written now matches the one after stop
+                    if self.is_recording and all(e.is_set() for e in self.source_ready.values()):
+                        out.write(resampler.process(self.read_mixed, self.available_samples()))
+
+                buffers = archive["buffers"]
+                if archive["path"]:
+                    total = self.available_samples(buffers)
+                    out.write(resampler.process(lambda a, b: self.read_mixed(a, b, buffers), total, final=True))
+
+            if archive["path"]:
+                os.replace(partial, archive["path"])
+                ARCHIVE_TAIL_SECONDS.observe(time.perf_counter() - archive["stopped_at"], format=archive_format)
+                print(f"Mixed recording saved to {archive['path']}")
             else:
-                # Pad to equal length
-                max_len = max(len(sys_audio), len(mic_audio))
-                
-                if len(sys_audio) < max_len:
-                    pad_width = max_len - len(sys_audio)
-                    sys_audio = np.pad(sys_audio, (0, pad_width))
-                    
-                if len(mic_audio) < max_len:
-                    pad_width = max_len - len(mic_audio)
-                    mic_audio = np.pad(mic_audio, (0, pad_width))
-                    
-                # Mix (Average)
-                mixed_audio = (sys_audio + mic_audio) / 2.0
-            
-            sf.write(file=filepath, data=mixed_audio, samplerate=self.sample_rate)
-            print(f"Mixed recording saved to {filepath}")
-            return filename
-            
+                os.remove(partial)
+
         except Exception as e:
             print(f"Error saving audio: {e}")
-            return None
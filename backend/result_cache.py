@@ -0,0 +1,94 @@
+import hashlib
+import json
+import os
+import threading
+
+class ResultCache:
+    """On-disk cache for expensive pipeline results (transcripts, reports).
+
+    Entries are addressed by content: the hash of the input (audio file
+    bytes or transcript text) plus every setting that changes the output, so
+    a retry or a report regenerated with the same settings is a lookup, and
+    changing a setting simply misses. Least recently used entries are
+    evicted once the cache grows past `max_bytes`.
+    """
+
+    def __init__(self, cache_dir, max_bytes=512 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def key(kind, content_digest, params):
+        """Cache key for `kind` ("transcript", "report") of some content under `params`."""
+        blob = json.dumps([kind, content_digest, params], sort_keys=True, default=str)
+        return f"{kind}-{hashlib.sha256(blob.encode('utf-8')).hexdigest()[:32]}"
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + ".json")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                value = json.load(f)
+        except (OSError, ValueError):
+            return None
+        # mtime doubles as the last-used time for LRU eviction
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return value
+
+    def put(self, key, value):
+        path = self._path(key)
+        partial = f"{path}.{threading.get_ident()}.tmp"
+        with open(partial, "w", encoding="utf-8") as f:
+            json.dump(value, f, default=_to_builtin)
+        os.replace(partial, path)
+        self._evict()
+
+    def _evict(self):
+        with self._lock:
+            entries = []
+            for name in os.listdir(self.cache_dir):
+                if not name.endswith(".json"):
+                    continue
+                try:
+                    stat = os.stat(os.path.join(self.cache_dir, name))
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, name))
+
+            total = sum(size for _, size, _ in entries)
+            for _, size, name in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(os.path.join(self.cache_dir, name))
+                    total -= size
+                except OSError:
+                    pass
+
+def _to_builtin(value):
+    # NumPy scalars/arrays that slipped into a result
+    return value.tolist() if hasattr(value, "tolist") else str(value)
+
+def file_digest(path, block_size=1024 * 1024):
+    """SHA-256 of a file's bytes, read in blocks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def text_digest(*parts):
+    """SHA-256 over strings and JSON-serialisable values (NumPy values converted as in put())."""
+    digest = hashlib.sha256()
+    for part in parts:
+        data = part if isinstance(part, str) else json.dumps(part, sort_keys=True, default=_to_builtin)
+        digest.update(data.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
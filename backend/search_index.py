@@ -0,0 +1,245 @@
+"""Full-text search over past meeting transcripts (SQLite FTS5).
+
+Every processed meeting's segments are stored with their timestamps and
+speaker labels; /search ranks matching segments with BM25 and highlights
+the hits. Rebuild the index from an existing recordings folder with:
+
+    python search_index.py --reindex ../recordings
+"""
+import argparse
+import html
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meetings (
+    id INTEGER PRIMARY KEY,
+    name TEXT UNIQUE NOT NULL,
+    report_path TEXT,
+    recorded_at REAL,
+    indexed_at REAL
+);
+CREATE TABLE IF NOT EXISTS segments (
+    id INTEGER PRIMARY KEY,
+    meeting_id INTEGER NOT NULL REFERENCES meetings(id) ON DELETE CASCADE,
+    start_time REAL,
+    end_time REAL,
+    speaker TEXT,
+    text TEXT
+);
+CREATE INDEX IF NOT EXISTS segments_meeting ON segments(meeting_id);
+CREATE INDEX IF NOT EXISTS meetings_recorded ON meetings(recorded_at);
+-- External-content index: the text lives once, in `segments`
+CREATE VIRTUAL TABLE IF NOT EXISTS segments_fts USING fts5(
+    text, content='segments', content_rowid='id', tokenize='porter unicode61'
+);
+CREATE TRIGGER IF NOT EXISTS segments_ai AFTER INSERT ON segments BEGIN
+    INSERT INTO segments_fts(rowid, text) VALUES (new.id, new.text);
+END;
+CREATE TRIGGER IF NOT EXISTS segments_ad AFTER DELETE ON segments BEGIN
+    INSERT INTO segments_fts(segments_fts, rowid, text) VALUES ('delete', old.id, old.text);
+END;
+"""
+
+# BM25 costs a few microseconds per matching segment, so very common terms
+# are ranked among the matches of the most recent meetings only
+MAX_RANKED = 5000
+# Private-use characters marking hits until the text is HTML-escaped
+HIT_START, HIT_END = "\ue000", "\ue001"
+
+# "[12s] **Local:** text" lines of the report's transcript section
+REPORT_LINE = re.compile(r"^\[(\d+)s\] \*\*(.+?):\*\* (.*)$")
+MEETING_TIME = re.compile(r"meeting_(\d+)")
+
+def segments_path(audio_path):
+    """Sidecar with the exact segments of a processed recording."""
+    return os.path.splitext(audio_path)[0] + ".segments.json"
+
+def save_segments(path, segments):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(segments, f)
+
+def parse_report(text):
+    """Recovers segments from a report's transcript lines (whole seconds only)."""
+    segments = []
+    for line in text.splitlines():
+        m = REPORT_LINE.match(line.strip())
+        if m:
+            segments.append({"start": float(m.group(1)), "speaker": m.group(2), "text": m.group(3)})
+    # Reports don't store end times: a segment runs until the next one starts
+    for current, following in zip(segments, segments[1:]):
+        current["end"] = max(current["start"], following["start"])
+    if segments:
+        segments[-1]["end"] = segments[-1]["start"]
+    return segments
+
+def to_match_query(query):
+    """Turns free text into an FTS5 query: every word must match, last one as a prefix.
+
+    Quoting each word keeps user input like "follow-up" or "Q3?" from being
+    read as FTS5 syntax.
+    """
+    words = re.findall(r"\w+", query)
+    if not words:
+        return None
+    terms = [f'"{w}"' for w in words]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+class SearchIndex:
+    def __init__(self, db_path):
+        self.db_path = db_path
+        # Shared by the job threads (writes) and request handlers (reads)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA foreign_keys=ON")
+            self._conn.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _index(self, name, report_path, segments, recorded_at):
+        self._conn.execute("DELETE FROM meetings WHERE name = ?", (name,))
+        meeting_id = self._conn.execute(
+            "INSERT INTO meetings (name, report_path, recorded_at, indexed_at) VALUES (?, ?, ?, ?)",
+            (name, report_path, recorded_at, time.time()),
+        ).lastrowid
+        self._conn.executemany(
+            "INSERT INTO segments (meeting_id, start_time, end_time, speaker, text) VALUES (?, ?, ?, ?, ?)",
+            [(meeting_id, float(s["start"]), float(s.get("end", s["start"])), s.get("speaker"), s["text"].strip())
+             for s in segments if s["text"].strip()],
+        )
+
+    def index_meeting(self, audio_path, segments, report_path=None):
+        """Adds (or replaces) one meeting's segments."""
+        name = os.path.splitext(os.path.basename(audio_path))[0]
+        with self._lock, self._conn:
+            self._index(name, report_path, segments, _recorded_at(audio_path, name))
+
+    def reindex(self, recordings_dir):
+        """Rebuilds the index from every report in `recordings_dir`.
+
+        Uses the .segments.json sidecar where there is one and falls back to
+        parsing the report's transcript lines. Runs as a single transaction.
+        """
+        count = 0
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM meetings")
+            for filename in sorted(os.listdir(recordings_dir)):
+                if not filename.endswith(".txt"):
+                    continue
+                report_path = os.path.join(recordings_dir, filename)
+                name = filename[:-len(".txt")]
+                sidecar = segments_path(report_path)
+                try:
+                    if os.path.exists(sidecar):
+                        with open(sidecar, encoding="utf-8") as f:
+                            segments = json.load(f)
+                    else:
+                        with open(report_path, encoding="utf-8") as f:
+                            segments = parse_report(f.read())
+                except (OSError, ValueError) as e:
+                    print(f"Skipping {filename}: {e}")
+                    continue
+                self._index(name, report_path, segments, _recorded_at(report_path, name))
+                count += 1
+            self._conn.execute("INSERT INTO segments_fts(segments_fts) VALUES ('optimize')")
+        return count
+
+    def search(self, query, limit=20, offset=0, speaker=None):
+        """Best-matching segments first.
+
+        "text" is HTML-escaped, with hits wrapped in <mark></mark>, so it can
+        be rendered as HTML as is.
+        """
+        match = to_match_query(query)
+        if match is None:
+            return []
+
+        # The speaker filter sits inside the ranked query so a page is never cut short
+        where, params = "segments_fts MATCH ?", [match]
+        if speaker:
+            where += " AND s.speaker = ?"
+            params.append(speaker)
+        # Recording time of the meeting where the most recent MAX_RANKED matches begin
+        # (not segment ids: a reindex renumbers old meetings after new ones)
+        cutoff_sql = f"""
+            SELECT COALESCE(m.recorded_at, 0) AS recorded FROM segments_fts
+            JOIN segments s ON s.id = segments_fts.rowid
+            JOIN meetings m ON m.id = s.meeting_id
+            WHERE {where} ORDER BY recorded DESC LIMIT 1 OFFSET ?
+        """
+        sql = f"""
+            SELECT m.name, m.report_path, m.recorded_at, s.start_time, s.end_time, s.speaker,
+                   highlight(segments_fts, 0, ?, ?) AS highlighted, segments_fts.rank AS score
+            FROM segments_fts
+            JOIN segments s ON s.id = segments_fts.rowid
+            JOIN meetings m ON m.id = s.meeting_id
+            WHERE {where} AND COALESCE(m.recorded_at, 0) >= ?
+            ORDER BY segments_fts.rank LIMIT ? OFFSET ?
+        """
+
+        with self._lock:
+            cutoff = self._conn.execute(cutoff_sql, params + [MAX_RANKED - 1]).fetchone()
+            rows = self._conn.execute(
+                sql, [HIT_START, HIT_END] + params + [cutoff[0] if cutoff else 0, limit, offset]
+            ).fetchall()
+        return [
+            {
+                "meeting": row["name"],
+                "report_path": row["report_path"],
+                "recorded_at": row["recorded_at"],
+                "start": row["start_time"],
+                "end": row["end_time"],
+                "speaker": row["speaker"],
+                "text": _escape_highlight(row["highlighted"]),
+                # bm25() is negative; flip it so higher means more relevant
+                "score": -row["score"],
+            }
+            for row in rows
+        ]
+
+    def stats(self):
+        with self._lock:
+            meetings = self._conn.execute("SELECT COUNT(*) FROM meetings").fetchone()[0]
+            segments = self._conn.execute("SELECT COUNT(*) FROM segments").fetchone()[0]
+        return {"meetings": meetings, "segments": segments}
+
+def _escape_highlight(text):
+    # Escape the transcript text first, then turn the hit markers into tags
+    return html.escape(text).replace(HIT_START, "<mark>").replace(HIT_END, "</mark>")
+
+def _recorded_at(path, name):
+    m = MEETING_TIME.search(name)
+    if m:
+        return float(m.group(1))
+    return os.path.getmtime(path) if os.path.exists(path) else None
+
+def main():
+    parser = argparse.ArgumentParser(description="Meeting transcript search index")
+    parser.add_argument("--db", default=None, help="Index file (default: <recordings>/search.db)")
+    parser.add_argument("--reindex", metavar="RECORDINGS_DIR", help="Rebuild the index from a recordings folder")
+    parser.add_argument("query", nargs="*", help="Search the index")
+    args = parser.parse_args()
+
+    recordings_dir = args.reindex or "../recordings"
+    index = SearchIndex(args.db or os.path.join(recordings_dir, "search.db"))
+    if args.reindex:
+        start = time.perf_counter()
+        count = index.reindex(args.reindex)
+        print(f"Indexed {count} meetings in {time.perf_counter() - start:.2f}s: {index.stats()}")
+    if args.query:
+        for hit in index.search(" ".join(args.query)):
+            print(f"{hit['meeting']} [{int(hit['start'])}s] {hit['speaker']}: {hit['text']}")
+    index.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+import os
+import threading
+import time
+import uuid
+from functools import partial
+from recorder import AudioRecorder
+from streaming import StreamingTranscriber
+
+# Sessions still capturing or handing their recording over to a job
+ACTIVE_SESSION_STATES = ("recording", "stopping")
+
+class RecordingSession:
+    """One recording: its own AudioRecorder (device threads, buffers, output file)."""
+
+    def __init__(self, session_id, recorder, devices):
+        self.id = session_id
+        self.recorder = recorder
+        self.devices = devices
+        self.streamer = None
+        self.status = "recording"
+        self.message = "Recording in progress..."
+        self.file = None
+        self.job_id = None
+        self.created_at = time.time()
+        self.stopped_at = None
+        self.finished = threading.Event()
+        # Capture stats of a released session (its recorder is gone by then)
+        self.capture = None
+
+    def release(self):
+        """Drops the recorder and streamer once the job has what it needs, keeping only the stats."""
+        recorder = self.recorder
+        if recorder is None:
+            return
+        self.capture = {"mode": recorder.capture, "sources": dict(recorder.capture_stats)}
+        recorder.release_buffers()
+        self.recorder = self.streamer = None
+
+    def snapshot(self):
+        recorder = self.recorder
+        return {
+            "id": self.id,
+            "status": self.status,
+            "message": self.message,
+            "system_device": self.devices[0],
+            "mic_device": self.devices[1],
+            "file": self.file,
+            "job_id": self.job_id,
+            "created_at": self.created_at,
+            "stopped_at": self.stopped_at,
+            # Per source: captured/dropped frames and device/ring overruns
+            "capture": self.capture if recorder is None else
+                       {"mode": recorder.capture, "sources": dict(recorder.capture_stats)},
+        }
+
+class SessionManager:
+    """Concurrent recording sessions for hosts that capture several device pairs.
+
+    Sessions share nothing while capturing: each has its own recorder, and
+    the only lock here guards the session table. Stopping hands the
+    recording over on a separate thread (join the capture threads, finish
+    the archive tail, queue the job), so stop() returns immediately; the
+    session reports the job id once it is queued.
+    """
+
+    def __init__(self, output_dir, recorder_options=None, max_sessions=8, max_finished=50):
+        self.output_dir = output_dir
+        self.recorder_options = recorder_options or {}
+        self.max_sessions = max_sessions
+        # Finished sessions kept for listing; older ones are forgotten (their jobs remain)
+        self.max_finished = max_finished
+        self.jobs = None
+        # Shared live-transcription model (optional); sessions started without it are transcribed after stop
+        self.transcriber = None
+        # Called with (session snapshot) after every state change
+        self.on_update = None
+        # Called with (session_id, text delta) for live transcript updates
+        self.on_text = None
+
+        self.sessions = {}
+        self._lock = threading.Lock()
+
+    def create(self, system_device=None, mic_device=None):
+        """Starts a new session; raises ValueError if a device is already in use."""
+        devices = (system_device, mic_device)
+        session_id = uuid.uuid4().hex[:8]
+        with self._lock:
+            active = [s for s in self.sessions.values() if s.status in ACTIVE_SESSION_STATES]
+            if len(active) >= self.max_sessions:
+                raise ValueError(f"Already running {len(active)} sessions (limit {self.max_sessions})")
+            # None means the default device; two sessions can't both capture the same one
+            taken = [f"{role} {name or 'default'}" for i, (role, name) in enumerate(zip(("system", "mic"), devices))
+                     if any(s.status == "recording" and s.devices[i] == name for s in active)]
+            if taken:
+                raise ValueError(f"Device already recording in another session: {', '.join(taken)}")
+            recorder = AudioRecorder(self.output_dir, system_device=system_device, mic_device=mic_device,
+                                     tag=session_id, **self.recorder_options)
+            session = RecordingSession(session_id, recorder, devices)
+            # Started under the lock so a concurrent stop never sees a half-started session
+            session.file = recorder.start_recording()
+            # Transcribe while the meeting runs so only the tail is left at stop
+            if self.transcriber:
+                session.streamer = StreamingTranscriber(
+                    self.transcriber, recorder,
+                    on_text=lambda delta: self.on_text and self.on_text(session_id, delta),
+                )
+                session.streamer.start()
+            self.sessions[session_id] = session
+        self._publish(session)
+        return session.snapshot()
+
+    def stop(self, session_id):
+        """Stops capturing and queues the recording in the background.
+
+        Returns the session (status "stopping"), or None if it isn't recording.
+        """
+        with self._lock:
+            session = self.sessions.get(session_id)
+            if session is None or session.status != "recording":
+                return None
+            session.status = "stopping"
+            session.message = "Saving recording..."
+            session.stopped_at = time.time()
+        threading.Thread(target=self._finish, args=(session,), name=f"session-{session_id}-stop",
+                         daemon=True).start()
+        self._publish(session)
+        return session.snapshot()
+
+    def _finish(self, session):
+        recorder = session.recorder
+        try:
+            saved_filename = recorder.stop_recording()
+            if not saved_filename:
+                if session.streamer:
+                    # Nothing to transcribe; this just ends its thread
+                    session.streamer.finish()
+                session.release()
+                session.status, session.message = "empty", "Error: No audio was recorded."
+                return
+
+            # Point at the actual saved (mixed) file; its name carries the stop time
+            session.file = saved_filename
+            # The archive is still being written in the background; the job takes the audio from memory
+            audio_loader = partial(recorder.get_whisper_audio, recorder.last_buffers)
+            energy_loader = partial(recorder.get_channel_energy, recorder.last_sources)
+            job = self.jobs.submit(os.path.join(recorder.output_dir, saved_filename), streamer=session.streamer,
+                                   audio_loader=audio_loader, energy_loader=energy_loader,
+                                   archive_writer=recorder.archive_thread, release_audio=session.release)
+            session.job_id = job["id"]
+            session.status, session.message = "stopped", "Recording saved. Starting transcription..."
+        except Exception as e:
+            print(f"Error stopping session {session.id}: {e}")
+            session.release()
+            session.status, session.message = "failed", f"Error: {e}"
+        finally:
+            session.finished.set()
+            self._prune()
+            self._publish(session)
+
+    def _prune(self):
+        with self._lock:
+            finished = sorted((s for s in self.sessions.values() if s.finished.is_set()),
+                              key=lambda s: s.created_at)
+            for session in finished[:max(0, len(finished) - self.max_finished)]:
+                del self.sessions[session.id]
+
+    def get(self, session_id):
+        with self._lock:
+            session = self.sessions.get(session_id)
+        return session.snapshot() if session else None
+
+    def session(self, session_id):
+        """The RecordingSession object itself (live recorder and streamer)."""
+        with self._lock:
+            return self.sessions.get(session_id)
+
+    def list_sessions(self):
+        with self._lock:
+            sessions = list(self.sessions.values())
+        return sorted((s.snapshot() for s in sessions), key=lambda s: s["created_at"], reverse=True)
+
+    def is_busy(self):
+        with self._lock:
+            return any(s.status in ACTIVE_SESSION_STATES for s in self.sessions.values())
+
+    def shutdown(self):
+        """Stops every session still recording and waits for their hand-over."""
+        with self._lock:
+            recording = [s.id for s in self.sessions.values() if s.status == "recording"]
+        for session_id in recording:
+            self.stop(session_id)
+        with self._lock:
+            stopping = [s for s in self.sessions.values() if s.status == "stopping"]
+        for session in stopping:
+            session.finished.wait(timeout=10)
+
+    def _publish(self, session):
+        if self.on_update:
+            self.on_update(session.snapshot())
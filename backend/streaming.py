@@ -0,0 +1,114 @@
+import threading
+from audio_utils import resample, WHISPER_SAMPLE_RATE
+
+class StreamingTranscriber:
+    """Transcribes a live AudioRecorder in fixed-size windows while it records.
+
+    Windows overlap: segments that end inside the overlap zone are not
+    committed yet, and the next window restarts at the end of the last
+    committed segment, so words cut at a window edge are decoded again with
+    full context. When recording stops only the tail is left to process.
+    """
+
+    def __init__(self, transcriber, recorder, chunk_seconds=30.0, overlap_seconds=3.0, poll_interval=1.0,
+                 on_text=None):
+        self.transcriber = transcriber
+        self.recorder = recorder
+        self.chunk_seconds = chunk_seconds
+        self.overlap_seconds = overlap_seconds
+        self.poll_interval = poll_interval
+        # Called with each newly committed piece of formatted transcript
+        self.on_text = on_text
+
+        self.segments = []
+        self.partial_text = ""
+        # Heuristic speaker label and end time so far (see Transcriber.format_segments)
+        self._format_carry = {}
+        self.failed = False
+        self._cursor = 0.0          # start of the next window (seconds)
+        self._committed_until = 0.0  # end of the last committed segment
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _available_seconds(self):
+        return self.recorder.available_samples() / self.recorder.sample_rate
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            if self._available_seconds() - self._cursor >= self.chunk_seconds:
+                if not self._process_window(self._cursor + self.chunk_seconds, final=False):
+                    return
+            else:
+                self._stop_event.wait(self.poll_interval)
+
+    def _process_window(self, window_end, final):
+        sr = self.recorder.sample_rate
+        window_start = self._cursor
+        audio = self.recorder.read_mixed(int(window_start * sr), int(window_end * sr))
+        if len(audio) == 0:
+            return True
+
+        audio = resample(audio, sr, WHISPER_SAMPLE_RATE)
+        result = self.transcriber.transcribe_array(audio, offset=window_start)
+        if "error" in result:
+            print(f"Streaming transcription failed: {result['error']}")
+            self.failed = True
+            return False
+
+        # Drop anything already committed from the previous window's overlap
+        fresh = [s for s in result["segments"] if s["end"] > self._committed_until + 0.05]
+
+        limit = window_end - self.overlap_seconds
+        if final:
+            kept = fresh
+        else:
+            kept = [s for s in fresh if s["end"] <= limit]
+            if not kept:
+                # One run-on segment spanning the window: accept the cut
+                kept = [s for s in fresh if s["start"] < limit]
+
+        if kept:
+            self.segments.extend(kept)
+            self._committed_until = kept[-1]["end"]
+            # Formatting only depends on earlier segments, so only the new ones are formatted
+            delta = self.transcriber.format_segments(kept, self._format_carry)
+            self.partial_text += delta
+            if self.on_text:
+                self.on_text(delta)
+            print(f"Streaming: committed {len(kept)} segments up to {self._committed_until:.1f}s")
+
+        next_start = self._committed_until if kept else limit
+        if next_start <= window_start + self.overlap_seconds:
+            next_start = limit
+        self._cursor = next_start
+        return True
+
+    def finish(self):
+        """Stops the background loop and transcribes whatever is left.
+
+        Call after recorder.stop_recording(). Returns a result dict in the
+        same shape as Transcriber.transcribe, or None if streaming failed.
+        """
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join()
+        if self.failed:
+            return None
+
+        total = self._available_seconds()
+        while total - self._cursor > self.chunk_seconds:
+            if not self._process_window(self._cursor + self.chunk_seconds, final=False):
+                return None
+        if total - self._cursor > 0.1:
+            if not self._process_window(total, final=True):
+                return None
+
+        return {
+            "full_text": "".join(s["text"] for s in self.segments),
+            "formatted_text": self.partial_text,
+            "segments": self.segments,
+        }
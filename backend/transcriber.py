@@ -1,69 +1,573 @@
-import whisper
+import gc
 import os
-import torch
+import shutil
+import threading
+import time
 import warnings
+from collections import OrderedDict
+from functools import lru_cache
+import numpy as np
+import metrics
+from audio_utils import load_audio, WHISPER_SAMPLE_RATE
+from vad import detect_speech, extract_regions, remap_times
 
 # Suppress FP16 warning for CPU if CUDA not available
 warnings.filterwarnings("ignore")
 
+BACKENDS = ("whisper", "faster-whisper")
+
+LOAD_SECONDS = metrics.gauge("transcriber_model_load_seconds", "Time to load the model", ("backend", "model"))
+RUN_SECONDS = metrics.histogram("transcriber_run_seconds", "Wall time per transcription call", ("backend",))
+AUDIO_SECONDS = metrics.counter("transcriber_audio_seconds_total", "Audio transcribed", ("backend",))
+REALTIME_FACTOR = metrics.histogram(
+    "transcriber_realtime_factor", "Processing time / audio duration", ("backend",),
+    buckets=(0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1, 1.5, 2, 4),
+)
+SEGMENTS_PER_SECOND = metrics.histogram(
+    "transcriber_segments_per_second", "Segments produced per second of processing", ("backend",),
+    buckets=(0.1, 0.25, 0.5, 1, 2, 5, 10, 25, 50),
+)
+
+# Rough resident size of a loaded model (PyTorch fp32), used until a load has been measured
+MODEL_MEMORY_MB = {"tiny": 200, "base": 350, "small": 1000, "medium": 2800, "large": 5500}
+# CTranslate2 int8 weights take roughly this share of that
+INT8_MEMORY_SHARE = 0.4
+
+def model_family(model_size):
+    """"base.en" -> "base", "large-v3" -> "large"."""
+    return model_size.split(".")[0].split("-")[0]
+
+def estimated_memory_mb(model_size, backend="whisper"):
+    """Rough resident size of `model_size` on `backend`, before any load is measured."""
+    estimate = MODEL_MEMORY_MB.get(model_family(model_size), MODEL_MEMORY_MB["large"])
+    return estimate * INT8_MEMORY_SHARE if backend == "faster-whisper" else estimate
+
+def default_memory_limit_mb(model_size, sizes=(), backend="whisper"):
+    """Model memory limit per process: the default model plus the largest of `sizes`, a quarter over the estimates."""
+    extra = max((estimated_memory_mb(size, backend) for size in sizes if size != model_size), default=0)
+    return int(1.25 * (estimated_memory_mb(model_size, backend) + extra))
+
+def record_stats(stats):
+    """Feeds a transcription's stats (see Transcriber.transcribe) into the metrics.
+
+    Worker processes return their stats with the result, and the server
+    records them here, since each process has its own metrics.
+    """
+    backend = stats["backend"]
+    if stats.get("load_seconds") is not None:
+        LOAD_SECONDS.set(stats["load_seconds"], backend=backend, model=stats["model"])
+    RUN_SECONDS.observe(stats["elapsed"], backend=backend)
+    if stats["audio_seconds"] > 0:
+        AUDIO_SECONDS.inc(stats["audio_seconds"], backend=backend)
+        REALTIME_FACTOR.observe(stats["elapsed"] / stats["audio_seconds"], backend=backend)
+    if stats["elapsed"] > 0:
+        SEGMENTS_PER_SECOND.observe(stats["segments"] / stats["elapsed"], backend=backend)
+
+def _audio_seconds(source, segments):
+    if not isinstance(source, str):
+        return len(source) / WHISPER_SAMPLE_RATE
+    try:
+        import soundfile as sf
+        return sf.info(source).duration
+    except Exception:
+        # Formats only FFmpeg reads: the transcript's end is close enough
+        return float(segments[-1]["end"]) if segments else 0.0
+
+# Whisper's encoder input: 30s mel windows
+WINDOW_SECONDS = 30.0
+# Window edges move back to the quietest 20ms frame in this stretch, so words aren't cut
+CUT_SEARCH_SECONDS = 5.0
+# Decoding fallbacks, as in whisper.transcribe
+TEMPERATURES = (0.0, 0.2, 0.4, 0.6, 0.8, 1.0)
+COMPRESSION_RATIO_THRESHOLD = 2.4
+LOGPROB_THRESHOLD = -1.0
+NO_SPEECH_THRESHOLD = 0.6
+
+def split_windows(audio, sample_rate=WHISPER_SAMPLE_RATE, window_seconds=WINDOW_SECONDS,
+                  search_seconds=CUT_SEARCH_SECONDS):
+    """Cuts audio into windows of at most `window_seconds` -> [(start, end)] in samples.
+
+    Each cut is placed at the quietest frame of the window's last
+    `search_seconds`, since windows are decoded independently.
+    """
+    window, search = int(window_seconds * sample_rate), int(search_seconds * sample_rate)
+    frame = sample_rate // 50
+    bounds, start = [], 0
+    while len(audio) - start > window:
+        tail = audio[start + window - search:start + window]
+        frames = tail[:len(tail) // frame * frame].reshape(-1, frame)
+        quietest = int(np.argmin(np.mean(frames * frames, axis=1)))
+        end = start + window - search + quietest * frame
+        bounds.append((start, end))
+        start = end
+    if len(audio) > start:
+        bounds.append((start, len(audio)))
+    return bounds
+
+def segments_from_tokens(tokens, tokenizer, offset, duration):
+    """Whisper tokens with timestamps for one window -> segments on the source timeline.
+
+    Segments are delimited by timestamp tokens (<|t0|> text <|t1|>); text
+    without an opening timestamp starts where the previous segment ended,
+    and text after the last timestamp runs to the end of the window.
+    """
+    begin = tokenizer.timestamp_begin
+    segments, text_tokens, start = [], [], 0.0
+
+    def close(end):
+        text = tokenizer.decode(text_tokens)
+        if text.strip():
+            segments.append({"start": offset + min(start, duration), "end": offset + min(end, duration),
+                             "text": text})
+
+    for token in tokens:
+        if token < begin:
+            text_tokens.append(token)
+            continue
+        seconds = (token - begin) * 0.02
+        if text_tokens:
+            close(seconds)
+            text_tokens = []
+        start = seconds
+    if text_tokens:
+        close(duration)
+    return segments
+
+@lru_cache(maxsize=None)
+def ffmpeg_available():
+    # PATH lookup once per process instead of on every job
+    return shutil.which("ffmpeg") is not None
+
 class Transcriber:
-    def __init__(self, model_size="base"):
-        print(f"Loading Whisper model: {model_size}...")
-        # Check if CUDA (GPU) is available, otherwise use CPU
-        device = "cuda" if torch.cuda.is_available() else "cpu"
-        print(f"Using device: {device}")
-        
-        self.model = whisper.load_model(model_size, device=device)
+    """Whisper transcription with a pluggable inference backend.
+
+    backend="whisper" is the reference openai-whisper (PyTorch) model.
+    backend="faster-whisper" runs the same weights through CTranslate2 with
+    int8 quantization by default, which is much faster on CPU-only machines.
+    Both return the same full_text/formatted_text/segments result.
+
+    With vad=True only the speech regions are decoded (see vad.py), which
+    saves time on silence and stops Whisper hallucinating text there.
+
+    transcribe_batch() takes several recordings at once and decodes their
+    30s windows together in batches, which keeps the CPU's vector units far
+    busier than one window at a time.
+    """
+
+    def __init__(self, model_size="base", backend="whisper", threads=None, beam_size=None,
+                 compute_type="int8", vad=False, memory_limit_mb=None):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown transcription backend: {backend}")
+
+        self._init_state(model_size, backend, threads, beam_size, compute_type, vad, memory_limit_mb)
+        if backend == "whisper" and threads:
+            import torch
+            torch.set_num_threads(threads)
+        self.model = self._load_model(model_size)
+        self.load_seconds = self._load_seconds[model_size]
+
+    def _init_state(self, model_size, backend="whisper", threads=None, beam_size=None, compute_type="int8",
+                    vad=False, memory_limit_mb=None):
+        """Everything but the model itself (subclasses bringing their own model call this)."""
+        self.model_size = model_size
+        self.backend = backend
+        self.threads = threads
+        self.beam_size = beam_size
+        self.compute_type = compute_type
+        self.vad = vad
+        # Other sizes asked for with transcribe(model_size=...) are loaded on demand
+        # and kept while they fit in memory_limit_mb (with the default model), least
+        # recently used evicted first
+        self.memory_limit_mb = memory_limit_mb
+        self._pool = OrderedDict()
+        self._memory_mb = {}
+        self._load_seconds = {}
+        # All loading so far; taken out of the elapsed time of calls that load a model
+        self._loading_seconds = 0.0
+        # The streaming thread and the post-stop pass can share one model
+        self._lock = threading.Lock()
+
+    def _load_model(self, model_size):
+        print(f"Loading Whisper model: {model_size} ({self.backend})...")
+        load_start = time.perf_counter()
+        rss_before = metrics.resident_memory_bytes()
+
+        if self.backend == "faster-whisper":
+            from faster_whisper import WhisperModel
+            # cpu_threads=0 lets CTranslate2 pick its own default
+            model = WhisperModel(model_size, device="cpu", compute_type=self.compute_type,
+                                 cpu_threads=self.threads or 0)
+            print(f"Using device: cpu ({self.compute_type})")
+        else:
+            import torch
+            import whisper
+            # Check if CUDA (GPU) is available, otherwise use CPU
+            device = "cuda" if torch.cuda.is_available() else "cpu"
+            print(f"Using device: {device}")
+            model = whisper.load_model(model_size, device=device)
+
+        self._load_seconds[model_size] = time.perf_counter() - load_start
+        self._loading_seconds += self._load_seconds[model_size]
+        LOAD_SECONDS.set(self._load_seconds[model_size], backend=self.backend, model=model_size)
+        rss_after = metrics.resident_memory_bytes()
+        if rss_before and rss_after and rss_after > rss_before:
+            self._memory_mb[model_size] = (rss_after - rss_before) / 1e6
         print("Model loaded successfully.")
+        return model
+
+    def model_memory_mb(self, model_size):
+        """Measured (or estimated) resident size of `model_size`."""
+        if model_size in self._memory_mb:
+            return self._memory_mb[model_size]
+        return estimated_memory_mb(model_size, self.backend)
+
+    def resident_models(self):
+        return [self.model_size] + list(self._pool)
+
+    def _model_for(self, model_size):
+        """Loaded model for `model_size` -> (model, size used). Call with the lock held.
+
+        Falls back to the default model if `model_size` can't fit under the
+        memory limit even after evicting every other pooled model.
+        """
+        if model_size in (None, self.model_size):
+            return self.model, self.model_size
+        if model_size in self._pool:
+            self._pool.move_to_end(model_size)
+            return self._pool[model_size], model_size
+
+        needed = self.model_memory_mb(model_size)
+        if self.memory_limit_mb:
+            def resident():
+                return sum(self.model_memory_mb(size) for size in self.resident_models())
+
+            while self._pool and resident() + needed > self.memory_limit_mb:
+                evicted, _model = self._pool.popitem(last=False)
+                print(f"Unloading Whisper model {evicted} (model memory limit {self.memory_limit_mb} MB)")
+                del _model
+                gc.collect()
+            if resident() + needed > self.memory_limit_mb:
+                print(f"Whisper model {model_size} doesn't fit in {self.memory_limit_mb} MB; "
+                      f"using {self.model_size}")
+                return self.model, self.model_size
+        self._pool[model_size] = self._load_model(model_size)
+        return self._pool[model_size], model_size
+
+    def _run_model(self, audio, model_size=None):
+        """Runs the backend on a file path or 16kHz array -> (text, segments, model size used)."""
+        with self._lock:
+            model, model_size = self._model_for(model_size)
+            if self.backend == "faster-whisper":
+                segments, _info = model.transcribe(audio, beam_size=self.beam_size or 5)
+                # Segments are a lazy generator; decoding happens while iterating
+                segments = [
+                    {"id": s.id, "start": s.start, "end": s.end, "text": s.text}
+                    for s in segments
+                ]
+                return "".join(s["text"] for s in segments), segments, model_size
+
+            options = {"fp16": False}
+            if self.beam_size:
+                options["beam_size"] = self.beam_size
+            result = model.transcribe(audio, **options)
+            return result["text"], result["segments"], model_size
+
+    def _run_speech_only(self, audio, model_size=None):
+        """Runs the model on the speech regions of a 16kHz array.
+
+        Timestamps are mapped back onto the original timeline.
+        """
+        regions = detect_speech(audio, WHISPER_SAMPLE_RATE)
+        if not regions:
+            print("VAD: no speech detected")
+            return "", [], model_size or self.model_size
+
+        speech, mapping = extract_regions(audio, regions)
+        print(f"VAD: decoding {len(speech) / WHISPER_SAMPLE_RATE:.1f}s of {len(audio) / WHISPER_SAMPLE_RATE:.1f}s")
+        text, segments, model_size = self._run_model(speech, model_size)
+        if not segments:
+            return text, segments, model_size
+
+        starts = remap_times([s["start"] for s in segments], mapping, WHISPER_SAMPLE_RATE)
+        ends = remap_times([s["end"] for s in segments], mapping, WHISPER_SAMPLE_RATE, is_end=True)
+        segments = [dict(s, start=float(a), end=float(b)) for s, a, b in zip(segments, starts, ends)]
+        return text, segments, model_size
+
+    def transcribe(self, source, model_size=None, with_stats=False):
+        """Transcribes a file path, or a 16kHz float32 array handed over in memory.
+
+        `model_size` picks another model than the default for this call (see
+        _model_for). With `with_stats` the return value is (result, stats),
+        where stats (None on error) records timing and which model ran; the
+        result itself is the same either way.
+        """
+        result, stats = self._transcribe(source, model_size)
+        return (result, stats) if with_stats else result
 
-    def transcribe(self, file_path):
-        if not os.path.exists(file_path):
-            return {"error": "File not found"}
-        
-        print(f"Transcribing {file_path}...")
-        
-        # Check if FFmpeg is available
-        import shutil
-        if not shutil.which("ffmpeg"):
-            print("ERROR: FFmpeg not found in system PATH.")
-            return {"error": "FFmpeg not detected. Please install FFmpeg."}
+    def _transcribe(self, source, model_size):
+        in_memory = not isinstance(source, str)
+        if in_memory:
+            print(f"Transcribing {len(source) / WHISPER_SAMPLE_RATE:.1f}s of in-memory audio...")
+        else:
+            if not os.path.exists(source):
+                return {"error": "File not found"}, None
+
+            print(f"Transcribing {source}...")
+
+            # openai-whisper decodes files through the FFmpeg binary
+            # (faster-whisper bundles its own decoder via PyAV, VAD reads with soundfile).
+            # Without FFmpeg, our own WAV/FLAC/Opus archives still decode through soundfile.
+            if self.backend == "whisper" and not self.vad and not ffmpeg_available():
+                try:
+                    source, in_memory = load_audio(source), True
+                except Exception:
+                    print("ERROR: FFmpeg not found in system PATH.")
+                    return {"error": "FFmpeg not detected. Please install FFmpeg."}, None
 
         # Transcribe with timestamps
+        start, loading = time.perf_counter(), self._loading_seconds
+        try:
+            if self.vad:
+                audio = source if in_memory else load_audio(source)
+                text, segments, model_size = self._run_speech_only(audio, model_size)
+            else:
+                text, segments, model_size = self._run_model(source, model_size)
+            print(f"DEBUG RAW TEXT: '{text}'")
+        except Exception as e:
+            print(f"Transcription Error: {e}")
+            return {"error": str(e)}, None
+
+        stats = self._stats(source, segments, self._elapsed(start, loading), model_size)
+        return {
+            "full_text": text,
+            "formatted_text": self.format_segments(segments),
+            "segments": segments,
+        }, stats
+
+    def transcribe_batch(self, sources, batch_size=8, model_size=None, with_stats=False):
+        """Transcribes several file paths and/or 16kHz arrays, batching their windows.
+
+        Every recording (or long recording) is cut into windows of up to
+        30s (see split_windows), and windows from all sources are decoded
+        `batch_size` at a time. Segments are mapped back to their source
+        and offset. Returns one result per source, in order, in the same
+        format as transcribe() (or {"error": ...} for that source); with
+        `with_stats`, one (result, stats) pair per source.
+        """
+        if self.backend == "faster-whisper":
+            outcomes = self._transcribe_batch_faster_whisper(sources, batch_size, model_size)
+        else:
+            outcomes = self._transcribe_batch(sources, batch_size, model_size)
+        return outcomes if with_stats else [result for result, _stats in outcomes]
+
+    def _transcribe_batch(self, sources, batch_size, model_size):
+        results, audios = [None] * len(sources), {}
+        for i, source in enumerate(sources):
+            if isinstance(source, str) and not os.path.exists(source):
+                results[i] = {"error": "File not found"}, None
+                continue
+            try:
+                audios[i] = load_audio(source) if isinstance(source, str) else source
+            except Exception as e:
+                print(f"Could not read {source}: {e}")
+                results[i] = {"error": str(e)}, None
+
+        # Speech-only timelines (with VAD) and their windows, for every source
+        windows, mappings = [], {}
+        for i, audio in audios.items():
+            if self.vad:
+                regions = detect_speech(audio, WHISPER_SAMPLE_RATE)
+                if not regions:
+                    continue
+                audio, mappings[i] = extract_regions(audio, regions)
+            windows.extend((i, audio[start:end], start / WHISPER_SAMPLE_RATE) for start, end in split_windows(audio))
+        total_seconds = sum(len(a) for a in audios.values()) / WHISPER_SAMPLE_RATE
+        print(f"Batch: {len(windows)} windows from {len(audios)} recordings ({total_seconds:.1f}s of audio)")
+
+        start, loading = time.perf_counter(), self._loading_seconds
+        segments = {i: [] for i in audios}
         try:
-            result = self.model.transcribe(file_path, fp16=False)
-            print(f"DEBUG RAW TEXT: '{result['text']}'")
+            with self._lock:
+                model, model_size = self._model_for(model_size)
+                tokenizer = self._tokenizer(model)
+                for first in range(0, len(windows), batch_size):
+                    batch = windows[first:first + batch_size]
+                    decoded = self._decode_windows(model, [chunk for _, chunk, _ in batch])
+                    for (i, chunk, offset), tokens in zip(batch, decoded):
+                        segments[i].extend(segments_from_tokens(
+                            tokens, tokenizer, offset, len(chunk) / WHISPER_SAMPLE_RATE))
+        except Exception as e:
+            print(f"Transcription Error: {e}")
+            return [result or ({"error": str(e)}, None) for result in results]
+        elapsed = self._elapsed(start, loading)
+
+        for i, audio in audios.items():
+            file_segments = segments[i]
+            if i in mappings and file_segments:
+                starts = remap_times([s["start"] for s in file_segments], mappings[i], WHISPER_SAMPLE_RATE)
+                ends = remap_times([s["end"] for s in file_segments], mappings[i], WHISPER_SAMPLE_RATE, is_end=True)
+                file_segments = [dict(s, start=float(a), end=float(b))
+                                 for s, a, b in zip(file_segments, starts, ends)]
+            file_segments = [dict(s, id=n) for n, s in enumerate(file_segments)]
+            # Decode time is shared, so each file is charged its share of the audio
+            share = len(audio) / WHISPER_SAMPLE_RATE / total_seconds if total_seconds else 0.0
+            results[i] = {
+                "full_text": "".join(s["text"] for s in file_segments),
+                "formatted_text": self.format_segments(file_segments),
+                "segments": file_segments,
+            }, self._stats(audio, file_segments, elapsed * share, model_size)
+        return results
+
+    def _tokenizer(self, model):
+        from whisper.tokenizer import get_tokenizer
+        return get_tokenizer(model.is_multilingual, num_languages=getattr(model, "num_languages", 99))
+
+    def _decode_windows(self, model, chunks):
+        """Decodes windows in one batched pass -> token list per window (empty if silent).
+
+        Windows that look like a failed decode (repetitive or unlikely text)
+        are decoded again at the next temperature, as whisper.transcribe does.
+        """
+        import torch
+        import whisper
+
+        n_mels = model.dims.n_mels
+        mel = torch.stack([whisper.log_mel_spectrogram(whisper.pad_or_trim(torch.from_numpy(chunk)), n_mels)
+                           for chunk in chunks]).to(model.device)
+        tokens, pending = [None] * len(chunks), list(range(len(chunks)))
+        for temperature in TEMPERATURES:
+            options = whisper.DecodingOptions(
+                temperature=temperature, fp16=False,
+                beam_size=self.beam_size if temperature == 0 else None,
+                best_of=5 if temperature > 0 else None,
+            )
+            retry = []
+            for index, result in zip(pending, whisper.decode(model, mel[pending], options)):
+                if result.no_speech_prob > NO_SPEECH_THRESHOLD and result.avg_logprob < LOGPROB_THRESHOLD:
+                    tokens[index] = []
+                    continue
+                tokens[index] = result.tokens
+                if (result.compression_ratio > COMPRESSION_RATIO_THRESHOLD
+                        or result.avg_logprob < LOGPROB_THRESHOLD):
+                    retry.append(index)
+            pending = retry
+            if not pending:
+                break
+        return tokens
+
+    def _transcribe_batch_faster_whisper(self, sources, batch_size, model_size):
+        """faster-whisper batches the windows of one recording at a time (BatchedInferencePipeline)."""
+        try:
+            from faster_whisper import BatchedInferencePipeline
+        except ImportError:
+            # Older faster-whisper: no batched decoding
+            return [self._transcribe(source, model_size) for source in sources]
+
+        results = []
+        for source in sources:
+            if isinstance(source, str) and not os.path.exists(source):
+                results.append(({"error": "File not found"}, None))
+                continue
+            start, loading = time.perf_counter(), self._loading_seconds
+            try:
+                with self._lock:
+                    model, used = self._model_for(model_size)
+                    raw, _info = BatchedInferencePipeline(model=model).transcribe(
+                        source, batch_size=batch_size, beam_size=self.beam_size or 5, vad_filter=self.vad)
+                    segments = [{"id": s.id, "start": s.start, "end": s.end, "text": s.text} for s in raw]
+            except Exception as e:
+                print(f"Transcription Error: {e}")
+                results.append(({"error": str(e)}, None))
+                continue
+            results.append(({
+                "full_text": "".join(s["text"] for s in segments),
+                "formatted_text": self.format_segments(segments),
+                "segments": segments,
+            }, self._stats(source, segments, self._elapsed(start, loading), used)))
+        return results
+
+    def _elapsed(self, start, loading):
+        """Seconds since `start`, minus models loaded on demand since then: stats time the decode only."""
+        return time.perf_counter() - start - (self._loading_seconds - loading)
+
+    def _stats(self, source, segments, elapsed, model_size=None):
+        model_size = model_size or self.model_size
+        stats = {
+            "backend": self.backend,
+            "model": model_size,
+            "load_seconds": self._load_seconds.get(model_size),
+            "elapsed": elapsed,
+            "audio_seconds": _audio_seconds(source, segments),
+            "segments": len(segments),
+        }
+        record_stats(stats)
+        return stats
+
+    def transcribe_array(self, audio, offset=0.0):
+        """Transcribes a 16kHz float32 chunk already in memory.
+
+        Segment timestamps are shifted by `offset` seconds so chunks of a
+        longer recording line up with the original timeline.
+        """
+        start = time.perf_counter()
+        try:
+            if self.vad:
+                text, raw_segments, _model = self._run_speech_only(audio)
+            else:
+                text, raw_segments, _model = self._run_model(audio)
         except Exception as e:
             print(f"Transcription Error: {e}")
             return {"error": str(e)}
-        
-        # Format the segments
-        # We can simulate diarization (Speaker X) if needed later, 
-        # Format the segments with Heuristic Speaker Labels
-        # Logic: If gap between segments > 1.0s, assume speaker change or pause.
+
+        segments = []
+        for segment in raw_segments:
+            segments.append({
+                "start": float(segment["start"]) + offset,
+                "end": float(segment["end"]) + offset,
+                "text": segment["text"],
+            })
+        self._stats(audio, segments, time.perf_counter() - start)
+        return {"full_text": text, "segments": segments}
+
+    @staticmethod
+    def format_segments(segments, carry=None):
+        """Segments -> "[12s] **Speaker:** text" lines.
+
+        `carry` (a dict, updated in place) continues the heuristic labels
+        across calls, so a growing transcript can be formatted piece by
+        piece: passing the same dict with each batch of new segments gives
+        the same text as formatting them all at once.
+        """
+        # Segments labelled from per-channel energy (diarization.py) use that
+        if segments and all("speaker" in s for s in segments):
+            return "".join(
+                f"[{int(float(s['start']))}s] **{s['speaker']}:** {s['text'].strip()}\n" for s in segments
+            )
+
+        # Otherwise fall back to heuristic labels
+        # Logic: If gap between segments > 0.5s, assume speaker change or pause.
         # Use simple toggling A/B for visual distinction.
+        carry = {} if carry is None else carry
         formatted_text = ""
-        current_speaker = "Speaker A"
-        last_end_time = 0
-        
-        for segment in result["segments"]:
+        current_speaker = carry.get("speaker", "Speaker A")
+        last_end_time = carry.get("end", 0)
+
+        for segment in segments:
             start = float(segment["start"])
             end = float(segment["end"])
             text = segment["text"].strip()
-            
+
             # If gap is significant OR previous text was a question (Q&A), switch speaker
             gap = start - last_end_time
             is_question = text.endswith("?")
             print(f"Gap: {gap:.2f}s | Question: {is_question} | Current: {current_speaker}")
-            
+
             if (gap > 0.5) or (is_question):
                 current_speaker = "Speaker B" if current_speaker == "Speaker A" else "Speaker A"
                 print(f"--> SWITCHED to {current_speaker}")
-            
+
             formatted_text += f"[{int(start)}s] **{current_speaker}:** {text}\n"
             last_end_time = end
-            
-        return {
-            "full_text": result["text"],
-            "formatted_text": formatted_text,
-            "segments": result["segments"]
-        }
+
+        carry.update(speaker=current_speaker, end=last_end_time)
+        return formatted_text
@@ -0,0 +1,75 @@
+import numpy as np
+
+def detect_speech(audio, sample_rate=16000, frame_ms=30, margin_db=12.0, floor_db=-55.0,
+                  min_speech_ms=250, min_silence_ms=600, pad_ms=200):
+    """Energy-based voice activity detection, fully vectorized.
+
+    Frames whose RMS is `margin_db` above the estimated noise floor (10th
+    percentile of frame energy) count as speech. Short gaps are bridged, short
+    blips dropped and regions padded so words are not clipped.
+    Returns a list of (start_sample, end_sample) tuples.
+    """
+    frame_len = int(sample_rate * frame_ms / 1000)
+    n_frames = len(audio) // frame_len
+    if n_frames == 0:
+        return []
+
+    frames = np.asarray(audio[:n_frames * frame_len], dtype=np.float32).reshape(n_frames, frame_len)
+    rms = np.sqrt(np.mean(frames * frames, axis=1) + 1e-12)
+    db = 20 * np.log10(rms)
+
+    threshold = max(np.percentile(db, 10) + margin_db, floor_db)
+    speech = db > threshold
+
+    # Run boundaries: starts/ends of consecutive speech frames
+    edges = np.diff(np.concatenate([[0], speech.astype(np.int8), [0]]))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    if len(starts) == 0:
+        return []
+
+    # Bridge gaps shorter than min_silence
+    min_gap = int(min_silence_ms / frame_ms)
+    keep = np.concatenate([[True], (starts[1:] - ends[:-1]) >= min_gap])
+    # Each merged region ends where the last run of its group ends
+    ends = ends[np.concatenate([np.flatnonzero(keep)[1:] - 1, [len(ends) - 1]])]
+    starts = starts[keep]
+
+    # Drop blips shorter than min_speech
+    long_enough = (ends - starts) >= int(min_speech_ms / frame_ms)
+    starts, ends = starts[long_enough], ends[long_enough]
+    if len(starts) == 0:
+        return []
+
+    # Pad, convert to samples and merge regions the padding made overlap
+    pad = int(sample_rate * pad_ms / 1000)
+    starts = np.maximum(starts * frame_len - pad, 0)
+    ends = np.minimum(ends * frame_len + pad, len(audio))
+    regions = [[starts[0], ends[0]]]
+    for s, e in zip(starts[1:], ends[1:]):
+        if s <= regions[-1][1]:
+            regions[-1][1] = e
+        else:
+            regions.append([s, e])
+    return [(int(s), int(e)) for s, e in regions]
+
+def extract_regions(audio, regions):
+    """Concatenates the speech regions.
+
+    Returns (speech_audio, mapping) where mapping is a pair of arrays
+    (concat_starts, orig_starts) in samples, used by remap_times().
+    """
+    lengths = np.array([e - s for s, e in regions])
+    concat_starts = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+    orig_starts = np.array([s for s, _ in regions])
+    speech = np.concatenate([audio[s:e] for s, e in regions])
+    return speech, (concat_starts, orig_starts)
+
+def remap_times(times, mapping, sample_rate=16000, is_end=False):
+    """Maps times (seconds) on the speech-only timeline back to the original."""
+    concat_starts, orig_starts = mapping
+    samples = np.asarray(times, dtype=np.float64) * sample_rate
+    # An end time sitting exactly on a junction belongs to the earlier region
+    side = "left" if is_end else "right"
+    idx = np.clip(np.searchsorted(concat_starts, samples, side=side) - 1, 0, len(concat_starts) - 1)
+    return (orig_starts[idx] + (samples - concat_starts[idx])) / sample_rate
@@ -1,4 +1,4 @@
-import { useState, useEffect } from 'react'
+import { useState, useEffect, useRef } from 'react'
 import axios from 'axios'
 import './index.css'
 
@@ -12,6 +12,9 @@ function App() {
     last_transcript: ""
   });
 
+  const [liveTranscript, setLiveTranscript] = useState("");
+  const reportJobId = useRef(null);
+
   const [meetingLink, setMeetingLink] = useState("");
   const [activeTab, setActiveTab] = useState("summary");
   const [parsedReport, setParsedReport] = useState({
@@ -20,9 +23,31 @@ function App() {
     transcript: "Waiting for recording..."
   });
 
+  // Server push instead of polling: status changes and transcript deltas arrive
+  // as they happen; the full report is fetched once per finished job.
   useEffect(() => {
-    const interval = setInterval(fetchStatus, 2000);
-    return () => clearInterval(interval);
+    const source = new EventSource(`${API_URL}/events`);
+
+    source.addEventListener("status", (e) => {
+      const data = JSON.parse(e.data);
+      setStatus(prev => ({ ...prev, ...data }));
+      if (data.report_job_id && data.report_job_id !== reportJobId.current) {
+        reportJobId.current = data.report_job_id;
+        fetchReport(data.report_job_id);
+      }
+    });
+
+    source.addEventListener("transcript_delta", (e) => {
+      const data = JSON.parse(e.data);
+      setLiveTranscript(prev => data.reset ? data.text : prev + data.text);
+    });
+
+    source.onerror = (err) => {
+      // EventSource reconnects on its own and gets a fresh snapshot
+      console.error("Event stream error:", err);
+    };
+
+    return () => source.close();
   }, []);
 
   // Parse the raw markdown into sections when it changes
@@ -50,16 +75,12 @@ function App() {
     }
   }, [status.last_transcript, status.is_processing]);
 
-  const fetchStatus = async () => {
+  const fetchReport = async (jobId) => {
     try {
-      const res = await axios.get(`${API_URL}/status`);
-      setStatus(prev => ({
-        ...res.data,
-        // Only update message if it changed to avoid jitter
-        message: res.data.message
-      }));
+      const res = await axios.get(`${API_URL}/jobs/${jobId}`);
+      setStatus(prev => ({ ...prev, last_transcript: res.data.report }));
     } catch (err) {
-      console.error("Error fetching status:", err);
+      console.error("Error fetching report:", err);
     }
   };
 
@@ -75,6 +96,7 @@ function App() {
 
     try {
       await axios.post(`${API_URL}/start`);
+      setLiveTranscript("");
     } catch (err) {
       alert("Failed to start: " + (err.response?.data?.detail || err.message));
     }
@@ -167,7 +189,9 @@ function App() {
           </div>
 
           <div className="tab-content">
-            {status.last_transcript ? (
+            {status.is_recording && liveTranscript ? (
+              <pre>{liveTranscript}</pre>
+            ) : status.last_transcript ? (
               <>
                 {activeTab === 'summary' && (
                   <div className="markdown-body">